@@ -16,6 +16,8 @@ Upon the first request, all necessary tables are created if they do not already
 Modules Imported:
 - `routes`: Handles the routing and view logic.
 - `models`: Defines the database models.
+- `commands`: Registers the maintenance commands with the Flask CLI.
+- `api`: Serves the read-only streaming JSON API.
 
 The application can be run directly if this module is executed as the main program.
 """
@@ -38,7 +40,7 @@ def create_table():
     """
     db.create_all()
 
-from app import routes, models
+from app import routes, models, commands, api
 
 if __name__ == "main":
     app.run()
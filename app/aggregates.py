@@ -0,0 +1,132 @@
+"""
+This module maintains the per job title and department review summaries.
+
+`JobTitleSummary` rows hold running totals (review count, rating, hourly pay and
+recommendation sums) so that averages can be read without scanning `Reviews`.
+The totals are adjusted inside the same transaction that adds or deletes a review,
+and `rebuild_summaries` recomputes them from scratch for backfills and drift repair.
+
+Key Components:
+- `record_review_added`: Folds a freshly flushed review into its summary row.
+- `record_reviews_added`: Folds a batch of bulk inserted reviews into their summary rows.
+- `record_review_removed`: Takes a review out of its summary row before it is deleted.
+- `rebuild_summaries`: Recomputes every summary row with a single grouped query.
+"""
+from sqlalchemy import func, insert as generic_insert
+
+from app import db
+from app.dialects import conflict_insert
+from app.models import Reviews, JobTitleSummary
+
+
+def review_totals(review_id):
+    """
+    Reads the grouping key and the summed columns of a review as stored in the database
+    """
+    return db.session.query(Reviews.job_title, Reviews.department, Reviews.rating,
+                            Reviews.hourly_pay, Reviews.recommendation).filter(Reviews.id == review_id).one()
+
+
+def upsert_statement(values, increments):
+    """
+    Builds an insert that adds `increments` to the existing summary row on conflict.
+    Returns None on databases without ON CONFLICT support.
+    """
+    table = JobTitleSummary.__table__
+    statement = conflict_insert(table)
+    if statement is None:
+        return None
+    statement = statement.values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=[table.c.job_title, table.c.department],
+        set_={column: table.c[column] + statement.excluded[column] for column in increments})
+
+
+def record_review_added(review):
+    """
+    Adds a review to its summary row. The review must be flushed, and the caller commits.
+    """
+    totals = review_totals(review.id)
+    increments = {
+        'review_count': 1,
+        'rating_total': totals.rating,
+        'hourly_pay_total': totals.hourly_pay,
+        'recommendation_total': totals.recommendation,
+    }
+    statement = upsert_statement(dict(job_title=totals.job_title, department=totals.department, **increments),
+                                 increments)
+    if statement is not None:
+        db.session.execute(statement)
+        return
+    # Fallback for databases without an upsert, update first and insert when nothing matched
+    updated = JobTitleSummary.query.filter_by(job_title=totals.job_title, department=totals.department).update(
+        {getattr(JobTitleSummary, column): getattr(JobTitleSummary, column) + amount
+         for column, amount in increments.items()}, synchronize_session=False)
+    if not updated:
+        db.session.execute(generic_insert(JobTitleSummary.__table__).values(
+            job_title=totals.job_title, department=totals.department, **increments))
+
+
+def record_reviews_added(rows):
+    """
+    Adds a batch of inserted review rows (dicts of column values) to their summary rows with one
+    upsert per group. The caller commits.
+    """
+    groups = {}
+    for row in rows:
+        totals = groups.setdefault((row['job_title'], row['department']), [0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += int(row['rating'])
+        totals[2] += int(row['hourly_pay'])
+        totals[3] += int(row['recommendation'])
+    values = [dict(job_title=job_title, department=department, review_count=count, rating_total=rating,
+                   hourly_pay_total=hourly_pay, recommendation_total=recommendation)
+              for (job_title, department), (count, rating, hourly_pay, recommendation) in groups.items()]
+    if not values:
+        return
+    increments = ('review_count', 'rating_total', 'hourly_pay_total', 'recommendation_total')
+    table = JobTitleSummary.__table__
+    statement = conflict_insert(table)
+    if statement is not None:
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.job_title, table.c.department],
+            set_={column: table.c[column] + statement.excluded[column] for column in increments}), values)
+        return
+    for group in values:
+        updated = JobTitleSummary.query.filter_by(job_title=group['job_title'], department=group['department']).update(
+            {getattr(JobTitleSummary, column): getattr(JobTitleSummary, column) + group[column]
+             for column in increments}, synchronize_session=False)
+        if not updated:
+            db.session.execute(generic_insert(table).values(**group))
+
+
+def record_review_removed(review):
+    """
+    Removes a review from its summary row. Call it before the review is deleted, the caller commits.
+    """
+    totals = review_totals(review.id)
+    group = JobTitleSummary.query.filter_by(job_title=totals.job_title, department=totals.department)
+    group.update({
+        JobTitleSummary.review_count: JobTitleSummary.review_count - 1,
+        JobTitleSummary.rating_total: JobTitleSummary.rating_total - totals.rating,
+        JobTitleSummary.hourly_pay_total: JobTitleSummary.hourly_pay_total - totals.hourly_pay,
+        JobTitleSummary.recommendation_total: JobTitleSummary.recommendation_total - totals.recommendation,
+    }, synchronize_session=False)
+    group.filter(JobTitleSummary.review_count <= 0).delete(synchronize_session=False)
+
+
+def rebuild_summaries():
+    """
+    Recomputes all summary rows from `Reviews` in one transaction and returns the number of groups
+    """
+    JobTitleSummary.query.delete(synchronize_session=False)
+    grouped = db.session.query(
+        Reviews.job_title, Reviews.department, func.count(Reviews.id),
+        func.coalesce(func.sum(Reviews.rating), 0), func.coalesce(func.sum(Reviews.hourly_pay), 0),
+        func.coalesce(func.sum(Reviews.recommendation), 0),
+    ).group_by(Reviews.job_title, Reviews.department)
+    db.session.execute(generic_insert(JobTitleSummary.__table__).from_select(
+        ['job_title', 'department', 'review_count', 'rating_total', 'hourly_pay_total', 'recommendation_total'],
+        grouped.statement))
+    db.session.commit()
+    return JobTitleSummary.query.count()
@@ -0,0 +1,199 @@
+"""
+This module provides a read-only JSON API over the reviews, jobs and applications.
+
+Responses are streamed row by row instead of being built in memory, so pulling a whole
+table costs the worker one batch of rows at a time. Only the selected columns are read
+from the database and serialized.
+
+Query parameters (all optional):
+- `fields`: Comma separated list of the columns to return, defaults to every exposed column.
+- `limit`: Maximum number of rows to return, defaults to all remaining rows.
+- `after`: Cursor returned by a previous call, the rows following it are returned.
+- `format`: `ndjson` (one object per line) or `json` (a single document), defaults to `ndjson`.
+
+An NDJSON response ends with a `{"next_cursor": ...}` line when `limit` cut it short,
+a JSON response always carries `items` and `next_cursor`.
+
+Routes:
+- `/api/reviews`: Every review.
+- `/api/jobs`: Every job, employers only see the jobs they posted.
+- `/api/applications`: Applications visible to the caller (own applications, applications
+  to an employer's jobs, or everything for admins).
+- `/api/jobs/search`: One page of job postings matching `q`, ranked by relevance, with
+  highlighted snippets (paged with `after`/`before` and `per_page` instead of the parameters above).
+"""
+import json
+from datetime import datetime
+
+from flask import Response, jsonify, request, session, stream_with_context
+
+from app import app
+from app.models import Reviews, Job, Application
+from app.pagination import decode_values, encode_cursor, DEFAULT_PER_PAGE
+from app.search import search_jobs
+
+API_BATCH_SIZE = 500
+
+
+class ApiError(Exception):
+    """A client error which is reported as a JSON body with the given status code"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    """
+    Reports API errors as JSON instead of an HTML page
+    """
+    return jsonify(error=error.message), error.status
+
+
+def exposed_columns(model):
+    """
+    Returns the columns of a model by name, in table order
+    """
+    return {column.key: getattr(model, column.key) for column in model.__table__.columns}
+
+
+REVIEW_FIELDS = exposed_columns(Reviews)
+JOB_FIELDS = exposed_columns(Job)
+APPLICATION_FIELDS = exposed_columns(Application)
+
+
+def selected_fields(fields):
+    """
+    Reads the `fields` query parameter, unknown field names are rejected
+    """
+    requested = request.args.get('fields')
+    if not requested:
+        return list(fields)
+    names = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in names if name not in fields]
+    if unknown or not names:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(fields)}")
+    return list(dict.fromkeys(names))
+
+
+def json_value(value):
+    """
+    Converts a column value into something `json.dumps` understands
+    """
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream_rows(query, key_column, fields):
+    """
+    Streams the rows of `query` in primary key order as NDJSON or JSON.
+    Rows are fetched `API_BATCH_SIZE` at a time and only the selected columns are loaded.
+    """
+    names = selected_fields(fields)
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'json'):
+        raise ApiError("format must be 'ndjson' or 'json'")
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit < 1:
+        raise ApiError('limit must be a positive integer')
+
+    query = query.with_entities(key_column, *[fields[name] for name in names])
+    after = request.args.get('after')
+    if after:
+        after_key = decode_values(after, 1)
+        if after_key is None:
+            raise ApiError('Malformed cursor')
+        query = query.filter(key_column > after_key[0])
+    query = query.order_by(key_column)
+    if limit is not None:
+        query = query.limit(limit + 1)
+
+    def generate():
+        next_cursor = None
+        last_key = None
+        sent = 0
+        if fmt == 'json':
+            yield '{"items":['
+        for row in query.yield_per(API_BATCH_SIZE):
+            if limit is not None and sent == limit:
+                next_cursor = encode_cursor([last_key])
+                break
+            last_key = row[0]
+            item = json.dumps({name: json_value(value) for name, value in zip(names, row[1:])})
+            if fmt == 'json':
+                yield item if sent == 0 else ',' + item
+            else:
+                yield item + '\n'
+            sent += 1
+        if fmt == 'json':
+            yield '],"next_cursor":' + json.dumps(next_cursor) + '}'
+        elif next_cursor:
+            yield json.dumps({'next_cursor': next_cursor}) + '\n'
+
+    mimetype = 'application/json' if fmt == 'json' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+
+def require_api_login():
+    """
+    Rejects API calls without a logged in user
+    """
+    if 'username' not in session:
+        raise ApiError('Authentication required', 401)
+
+
+@app.route('/api/reviews')
+def api_reviews():
+    """
+    An API to stream reviews as JSON.
+    """
+    require_api_login()
+    return stream_rows(Reviews.query, Reviews.id, REVIEW_FIELDS)
+
+
+@app.route('/api/jobs')
+def api_jobs():
+    """
+    An API to stream jobs as JSON, employers only see their own postings.
+    """
+    require_api_login()
+    query = Job.query
+    if session.get('type') == 'employer':
+        query = query.filter(Job.employer_id == session['username'])
+    return stream_rows(query, Job.job_id, JOB_FIELDS)
+
+
+@app.route('/api/applications')
+def api_applications():
+    """
+    An API to stream the applications visible to the current user as JSON.
+    """
+    require_api_login()
+    query = Application.query
+    if session.get('type') == 'employer':
+        query = query.join(Job, Application.job_id == Job.job_id).filter(Job.employer_id == session['username'])
+    elif session.get('type') != 'admin':
+        query = query.filter(Application.user_name == session['username'])
+    return stream_rows(query, Application.application_id, APPLICATION_FIELDS)
+
+
+@app.route('/api/jobs/search')
+def api_search_jobs():
+    """
+    An API to search job postings by title, description and location, best matches first.
+    Matches are wrapped in <mark> tags in the escaped `title_html` and `snippet_html`.
+    """
+    require_api_login()
+    if session.get('type') == 'employer':
+        raise ApiError('Job search is available to applicants', 403)
+    query = request.args.get('q', '').strip()
+    if not query:
+        raise ApiError('q is required')
+    page = search_jobs(query, after=request.args.get('after'), before=request.args.get('before'),
+                       per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int))
+    fields = [name for name in JOB_FIELDS if name != 'description']
+    items = [dict({name: json_value(getattr(hit.job, name)) for name in fields}, score=hit.score,
+                  title_html=str(hit.title), snippet_html=str(hit.snippet))
+             for hit in page.items]
+    return jsonify(items=items, next_cursor=page.next_cursor, prev_cursor=page.prev_cursor)
@@ -0,0 +1,185 @@
+"""
+This module provides the in-memory prefix index behind the job title autocomplete.
+
+Every worker keeps the distinct job titles of `Reviews` and `Job` in a sorted list. A lookup
+bisects to the first title starting with the typed prefix and walks forward, so it never
+touches the database and costs O(log n + k) for k suggestions.
+
+The index is loaded on first use. Titles added or removed through the ORM are applied once their
+transaction commits, so the worker that served a write sees it straight away. Writes made by
+other workers (or with core statements) show up when the index is reloaded, which happens every
+`AUTOCOMPLETE_REFRESH_INTERVAL` seconds.
+
+Key Components:
+- `TitleIndex`: Sorted, reference counted set of titles with prefix lookup.
+- `title_index`: The index of the current worker process.
+- `suggest_job_titles`: Returns the suggestions for a prefix, loading the index when needed.
+- `watch_committed_values`: Reports the committed inserts, deletes and changes of some columns.
+"""
+import threading
+import time
+from bisect import bisect_left, insort
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import attributes
+
+from app import app, db
+from app.models import Reviews, Job
+
+
+def normalize_title(title):
+    """
+    Returns the lookup key of a title, case-insensitive and with collapsed whitespace
+    """
+    return ' '.join((title or '').lower().split())
+
+
+class TitleIndex:
+    """
+    A sorted set of job titles with prefix lookup.
+
+    Titles are reference counted per spelling, so a title stays suggested until its last
+    review or job is gone, and the most common spelling of a title is the one suggested.
+    """
+
+    def __init__(self):
+        self.keys = []
+        self.spellings = {}
+        self.lock = threading.Lock()
+        self.loaded_at = None
+
+    def load(self, counts):
+        """Replaces the contents with `(title, count)` pairs"""
+        spellings = {}
+        for title, count in counts:
+            key = normalize_title(title)
+            if key:
+                per_key = spellings.setdefault(key, {})
+                per_key[title] = per_key.get(title, 0) + count
+        with self.lock:
+            self.spellings = spellings
+            self.keys = sorted(spellings)
+            self.loaded_at = time.monotonic()
+
+    def clear(self):
+        """Empties the index, the next lookup loads it again"""
+        with self.lock:
+            self.spellings = {}
+            self.keys = []
+            self.loaded_at = None
+
+    def add(self, title, count=1):
+        """Counts `count` more rows using `title`"""
+        key = normalize_title(title)
+        if not key:
+            return
+        with self.lock:
+            per_key = self.spellings.get(key)
+            if per_key is None:
+                per_key = self.spellings[key] = {}
+                insort(self.keys, key)
+            per_key[title] = per_key.get(title, 0) + count
+
+    def discard(self, title, count=1):
+        """Counts `count` fewer rows using `title`, dropping the title when none are left"""
+        key = normalize_title(title)
+        with self.lock:
+            per_key = self.spellings.get(key)
+            if per_key is None or title not in per_key:
+                return
+            per_key[title] -= count
+            if per_key[title] <= 0:
+                del per_key[title]
+            if not per_key:
+                del self.spellings[key]
+                del self.keys[bisect_left(self.keys, key)]
+
+    def suggest(self, prefix, limit=10):
+        """Returns up to `limit` titles starting with `prefix`, in alphabetical order"""
+        prefix = normalize_title(prefix)
+        if not prefix:
+            return []
+        suggestions = []
+        with self.lock:
+            position = bisect_left(self.keys, prefix)
+            while position < len(self.keys) and len(suggestions) < limit:
+                key = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                per_key = self.spellings[key]
+                suggestions.append(max(per_key, key=lambda title: (per_key[title], title)))
+                position += 1
+        return suggestions
+
+    def __len__(self):
+        return len(self.keys)
+
+
+title_index = TitleIndex()
+
+
+def title_counts():
+    """
+    Reads every distinct job title of the reviews and jobs with its number of rows
+    """
+    reviews = db.session.query(Reviews.job_title, func.count()).group_by(Reviews.job_title).all()
+    jobs = db.session.query(Job.title, func.count()).group_by(Job.title).all()
+    return reviews + jobs
+
+
+def suggest_job_titles(prefix, limit=10):
+    """
+    Returns job title suggestions for `prefix`, (re)loading the index when it is missing or stale
+    """
+    loaded_at = title_index.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > app.config['AUTOCOMPLETE_REFRESH_INTERVAL']:
+        title_index.load(title_counts())
+    return title_index.suggest(prefix, limit)
+
+
+def watch_committed_values(name, attributes_by_model, apply):
+    """
+    Calls `apply(changes)` after every commit with the `(value, delta)` pairs of the watched attributes
+    that the transaction inserted (+1) or deleted (-1), a changed value counts as both.
+    `name` keeps the pending changes of different watchers apart in the session.
+    """
+    @event.listens_for(db.session, 'after_flush')
+    def collect_changes(flushed_session, flush_context):
+        changes = flushed_session.info.setdefault(name, [])
+        for instance in flushed_session.new:
+            for attribute in attributes_by_model.get(type(instance), ()):
+                changes.append((getattr(instance, attribute), 1))
+        for instance in flushed_session.deleted:
+            for attribute in attributes_by_model.get(type(instance), ()):
+                changes.append((getattr(instance, attribute), -1))
+        for instance in flushed_session.dirty:
+            for attribute in attributes_by_model.get(type(instance), ()):
+                history = attributes.get_history(instance, attribute)
+                if history.added and history.deleted:
+                    changes.extend([(history.deleted[0], -1), (history.added[0], 1)])
+
+    @event.listens_for(db.session, 'after_commit')
+    def apply_changes(committed_session):
+        changes = committed_session.info.pop(name, [])
+        if changes:
+            apply(changes)
+
+    @event.listens_for(db.session, 'after_soft_rollback')
+    def drop_changes(rolled_back_session, previous_transaction):
+        rolled_back_session.info.pop(name, None)
+
+
+def apply_title_changes(changes):
+    """
+    Applies committed title changes to the index of this worker, unless it has not been loaded yet
+    """
+    if title_index.loaded_at is None:
+        return
+    for title, delta in changes:
+        if delta > 0:
+            title_index.add(title)
+        else:
+            title_index.discard(title)
+
+
+watch_committed_values('title_changes', {Reviews: ('job_title',), Job: ('title',)}, apply_title_changes)
@@ -0,0 +1,244 @@
+"""
+This module imports reviews and jobs in bulk from CSV files.
+
+The file is read one row at a time, so its size does not matter. Rows are validated and collected
+into chunks, and every chunk is stored with a single batched insert and committed as one
+transaction, instead of one ORM object and one commit per row. A row failing validation is
+reported with its line number and skipped, the rest of the file is still imported. Should the
+database refuse a chunk, that chunk is retried row by row so only the offending rows are rejected.
+
+Imported review texts go through the inappropriate word filter like reviews added from the site,
+and the job title summaries, table versions and near-duplicate index are updated the same way.
+New job e-mails are not sent for imported jobs.
+
+Key Components:
+- `import_csv`: Imports a CSV stream of reviews or jobs and returns an `ImportReport`.
+- `ImportReport`: Rows imported, rows rejected (with the reason) and the import speed.
+- `IMPORT_COLUMNS`: The columns read for each kind of import.
+"""
+import csv
+import time
+
+from sqlalchemy import insert, func
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import app, db
+from app.aggregates import record_reviews_added
+from app.autocomplete import title_index
+from app.cache import bump_versions
+from app.duplicates import index_reviews_after
+from app.fuzzy import phrase_index
+from app.inappropriate_words import profanity_filter
+from app.models import Reviews, Job, User
+
+DEFAULT_IMPORT_CHUNK_SIZE = 5000
+# Rejected rows kept in a report, a broken file should not fill the memory with errors
+MAX_REPORTED_ERRORS = 100
+
+IMPORT_COLUMNS = {
+    'reviews': ('job_title', 'department', 'locations', 'job_description', 'hourly_pay',
+                'benefits', 'review', 'rating', 'recommendation'),
+    'jobs': ('title', 'description', 'location', 'pay', 'employer_id'),
+}
+# Columns a file may leave out
+OPTIONAL_COLUMNS = {'pay'}
+# What the decoder puts in place of bytes that are not UTF-8 (files are decoded with errors='replace')
+UNDECODABLE = '\ufffd'
+
+
+class RowError(Exception):
+    """A row that cannot be imported"""
+
+
+class ImportReport:
+    """The outcome of an import"""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    def reject(self, line, message):
+        """Records a rejected row"""
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    @property
+    def rows_per_second(self):
+        """Rows read per second, rejected rows included"""
+        rows = self.imported + self.rejected
+        return rows / self.elapsed if self.elapsed else float(rows)
+
+    def summary(self):
+        """A one line description of the import"""
+        return (f'Imported {self.imported} {self.kind}, rejected {self.rejected} rows '
+                f'in {self.elapsed:.2f}s ({self.rows_per_second:.0f} rows/s).')
+
+
+def text_value(row, column, max_length, required=True):
+    """Returns the stripped text of a column, checking its presence and length"""
+    value = (row.get(column) or '').strip()
+    if not value:
+        if required:
+            raise RowError(f'{column} is required')
+        return None
+    if max_length and len(value) > max_length:
+        raise RowError(f'{column} is longer than {max_length} characters')
+    return value
+
+
+def int_value(row, column, low=None, high=None):
+    """Returns the whole number of a column, checking its range"""
+    text = text_value(row, column, None)
+    try:
+        value = int(text)
+    except ValueError:
+        raise RowError(f'{column} is not a whole number: {text!r}') from None
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise RowError(f'{column} must be between {low} and {high}' if high is not None
+                       else f'{column} must be at least {low}')
+    return value
+
+
+def check_decoded(row):
+    """Rejects a row holding bytes the decoder could not read, instead of storing replacement characters"""
+    for value in row.values():
+        values = value if isinstance(value, list) else [value]
+        if any(UNDECODABLE in (text or '') for text in values):
+            raise RowError('the line is not valid UTF-8, save the file as UTF-8 (CSV UTF-8 in Excel)')
+
+
+def column_length(model, column):
+    """Returns the declared length of a string column (None for unbounded text)"""
+    return getattr(model.__table__.c[column].type, 'length', None)
+
+
+def review_row(row, mask):
+    """Validates a CSV row of a review and returns the values to insert"""
+    values = {column: text_value(row, column, column_length(Reviews, column))
+              for column in ('job_title', 'department', 'locations', 'job_description', 'benefits')}
+    values['hourly_pay'] = int_value(row, 'hourly_pay', low=0)
+    values['rating'] = int_value(row, 'rating', 1, 5)
+    values['recommendation'] = int_value(row, 'recommendation', 1, 10)
+    review = mask(text_value(row, 'review', None))
+    if len(review) > column_length(Reviews, 'review'):
+        raise RowError(f"review is longer than {column_length(Reviews, 'review')} characters")
+    values['review'] = review
+    values['upvote_count'] = 0
+    return values
+
+
+def job_row(row, employers, default_employer):
+    """Validates a CSV row of a job and returns the values to insert"""
+    values = {column: text_value(row, column, column_length(Job, column))
+              for column in ('title', 'description', 'location')}
+    pay = text_value(row, 'pay', None, required=False)
+    try:
+        values['pay'] = float(pay) if pay is not None else None
+    except ValueError:
+        raise RowError(f'pay is not a number: {pay!r}') from None
+    if values['pay'] is not None and values['pay'] < 0:
+        raise RowError('pay must be at least 0')
+    employer_id = text_value(row, 'employer_id', None, required=False) or default_employer
+    if not employer_id:
+        raise RowError('employer_id is required')
+    if employer_id not in employers:
+        raise RowError(f'employer_id {employer_id!r} is not an employer')
+    values['employer_id'] = employer_id
+    return values
+
+
+def insert_chunk(kind, table, chunk, report):
+    """
+    Stores a chunk of `(line, values)` in one transaction, falling back to one row at a time when the
+    database refuses the batch. Returns the values stored.
+    """
+    rows = [values for _, values in chunk]
+    try:
+        store_rows(kind, table, rows)
+    except SQLAlchemyError:
+        db.session.rollback()
+        rows = []
+        for line, values in chunk:
+            try:
+                store_rows(kind, table, [values])
+                rows.append(values)
+            except SQLAlchemyError as error:
+                db.session.rollback()
+                report.reject(line, str(getattr(error, 'orig', None) or error).splitlines()[0])
+    report.imported += len(rows)
+    return rows
+
+
+def store_rows(kind, table, rows):
+    """Inserts rows with one batched statement and commits them with their bookkeeping"""
+    db.session.execute(insert(table), rows)
+    if kind == 'reviews':
+        record_reviews_added(rows)
+    bump_versions(table.name)
+    db.session.commit()
+
+
+def import_csv(stream, kind, chunk_size=DEFAULT_IMPORT_CHUNK_SIZE, employer_id=None, check_duplicates=True,
+               progress_callback=None):
+    """
+    Imports the rows of a CSV text stream (or any iterable of text lines) into the reviews or jobs table
+    and returns an `ImportReport`. The stream should be decoded with errors='replace', rows with
+    undecodable bytes are then rejected like any other invalid row.
+
+    The first line names the columns (see `IMPORT_COLUMNS`). For jobs, `employer_id` is used for the
+    rows without one. Imported reviews are checked for near-duplicates afterwards unless `check_duplicates`
+    is off, in which case `flask build-duplicate-index` catches up later. `progress_callback` is called
+    with the report after every chunk.
+    """
+    if kind not in IMPORT_COLUMNS:
+        raise ValueError(f'Unknown import kind {kind!r}')
+    report = ImportReport(kind)
+    started = time.perf_counter()
+    reader = csv.DictReader(stream)
+    missing = [column for column in IMPORT_COLUMNS[kind]
+               if column not in (reader.fieldnames or ()) and column not in OPTIONAL_COLUMNS
+               and not (column == 'employer_id' and employer_id)]
+    if missing:
+        report.reject(1, f"missing columns: {', '.join(missing)}")
+        report.elapsed = time.perf_counter() - started
+        return report
+
+    if kind == 'reviews':
+        table = Reviews.__table__
+        last_id = db.session.query(func.coalesce(func.max(Reviews.id), 0)).scalar()
+        mask = profanity_filter().mask
+        validate = lambda row: review_row(row, mask)  # pylint: disable=unnecessary-lambda-assignment
+    else:
+        table = Job.__table__
+        employers = {name for name, in db.session.query(User.user_name).filter(User.type == 'employer')}
+        validate = lambda row: job_row(row, employers, employer_id)  # pylint: disable=unnecessary-lambda-assignment
+
+    chunk = []
+    for row in reader:
+        try:
+            check_decoded(row)
+            chunk.append((reader.line_num, validate(row)))
+        except RowError as error:
+            report.reject(reader.line_num, str(error))
+        if len(chunk) >= chunk_size:
+            insert_chunk(kind, table, chunk, report)
+            chunk = []
+            if progress_callback:
+                report.elapsed = time.perf_counter() - started
+                progress_callback(report)
+    if chunk:
+        insert_chunk(kind, table, chunk, report)
+
+    if report.imported:
+        if kind == 'reviews' and check_duplicates and app.config['DUPLICATE_REVIEW_ACTION'] != 'off':
+            # Imported rows cannot be turned away any more, duplicates are flagged whatever the action
+            index_reviews_after(last_id, chunk_size=chunk_size)
+        # The in-memory title indexes only follow ORM writes, they are loaded again on their next use
+        title_index.clear()
+        phrase_index.clear()
+    report.elapsed = time.perf_counter() - started
+    return report
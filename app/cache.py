@@ -0,0 +1,208 @@
+"""
+This module caches rendered listing pages and answers conditional GET requests.
+
+Every table the listings are built from has a change stamp (a version counter and the time of
+the last write) in the `table_versions` table. Stamps are bumped in the same transaction as the
+write: automatically for every ORM flush touching a tracked table, and explicitly by the code
+paths that write with bulk statements. Because the stamps live in the database every worker
+process sees them, so writes never have to find and evict stale entries; cached fragments and
+ETags derived from older stamps simply stop matching.
+
+Key Components:
+- `bump_versions`: Increments the change stamp of one or more tables, the caller commits.
+- `table_stamps` / `table_versions`: Read the current stamps of some tables with a single query.
+- `FragmentCache`: Thread-safe, size-bounded LRU mapping of keys to rendered HTML.
+- `cached_fragment`: Returns a cached fragment or renders and stores it.
+- `conditional`: Decorator answering matching If-None-Match / If-Modified-Since requests with 304.
+- `static_page`: Serves pages without database content from precomputed bodies with an ETag.
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from itertools import chain
+
+from flask import g, make_response, render_template, request, session
+from markupsafe import Markup
+from sqlalchemy import event
+
+from app import app, db
+from app.dialects import conflict_insert
+from app.models import TableVersion
+
+# Tables whose ORM writes bump their change stamp automatically
+TRACKED_TABLES = frozenset(('reviews', 'upvote', 'jobs', 'applications', 'users'))
+
+
+def bump_versions(*tables, connection=None):
+    """
+    Increments the version and change time of each table inside the current transaction
+    """
+    executor = connection if connection is not None else db.session
+    model_table = TableVersion.__table__
+    now = datetime.utcnow()
+    for table_name in tables:
+        statement = conflict_insert(model_table)
+        if statement is not None:
+            statement = statement.values(table_name=table_name, version=1, updated_at=now)
+            executor.execute(statement.on_conflict_do_update(
+                index_elements=[model_table.c.table_name],
+                set_={'version': model_table.c.version + 1, 'updated_at': now}))
+            continue
+        updated = executor.execute(model_table.update().where(model_table.c.table_name == table_name).values(
+            version=model_table.c.version + 1, updated_at=now))
+        if not updated.rowcount:
+            executor.execute(model_table.insert().values(table_name=table_name, version=1, updated_at=now))
+
+
+@event.listens_for(db.session, 'after_flush')
+def stamp_flushed_tables(flushed_session, flush_context):
+    """
+    Bumps the tracked tables touched by an ORM flush, inside the flush's transaction
+    """
+    tables = {instance.__table__.name
+              for instance in chain(flushed_session.new, flushed_session.dirty, flushed_session.deleted)}
+    tables &= TRACKED_TABLES
+    if tables:
+        bump_versions(*sorted(tables), connection=flushed_session.connection())
+
+
+def table_stamps(*tables):
+    """
+    Returns the versions of the tables as a tuple and the time of the latest write to any of them.
+    Tables never written count as version 0. Stamps are read once per table for the rest of the request.
+    """
+    stamps = g.setdefault('table_stamps', {})
+    missing = [table_name for table_name in tables if table_name not in stamps]
+    if missing:
+        for table_name in missing:
+            stamps[table_name] = (0, None)
+        for row in db.session.query(TableVersion.table_name, TableVersion.version, TableVersion.updated_at
+                                    ).filter(TableVersion.table_name.in_(missing)):
+            stamps[row.table_name] = (row.version, row.updated_at)
+    versions = tuple(stamps[table_name][0] for table_name in tables)
+    changes = [stamps[table_name][1] for table_name in tables if stamps[table_name][1] is not None]
+    return versions, max(changes) if changes else None
+
+
+def table_versions(*tables):
+    """
+    Returns the current version of each table as a tuple
+    """
+    return table_stamps(*tables)[0]
+
+
+class FragmentCache:
+    """A thread-safe LRU cache of rendered fragments holding at most `max_entries` items"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the fragment stored under `key` or None, marking it as recently used"""
+        with self.lock:
+            fragment = self.entries.get(key)
+            if fragment is not None:
+                self.entries.move_to_end(key)
+            return fragment
+
+    def set(self, key, fragment):
+        """Stores a fragment, evicting the least recently used ones beyond the size bound"""
+        with self.lock:
+            self.entries[key] = fragment
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Drops every cached fragment"""
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+
+fragment_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+
+def cached_fragment(name, tables, variant, render):
+    """
+    Returns the fragment `name` for the current query string, rendering it with `render()` on a miss.
+
+    `tables` are the tables the fragment is rendered from and `variant` holds everything else the
+    markup depends on, such as the role of the user or their applied and upvoted flags.
+    """
+    key = (name, table_versions(*tables), tuple(sorted(request.args.items(multi=True))), variant)
+    fragment = fragment_cache.get(key)
+    if fragment is None:
+        fragment = Markup(render())
+        fragment_cache.set(key, fragment)
+    return fragment
+
+
+def conditional(*tables, extra=None):
+    """
+    Decorator adding ETag and Last-Modified headers to a listing view of `tables`.
+
+    The ETag is derived from the change stamps of the tables, the query string, the role and
+    name of the user and, if given, the value returned by `extra()` for state kept outside the
+    database. A matching If-None-Match is answered with 304 before the view runs.
+    If-Modified-Since is only consulted when the client sent no If-None-Match.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            versions, changed = table_stamps(*tables)
+            parts = (request.endpoint, versions, tuple(sorted(request.args.items(multi=True))),
+                     session.get('type'), session.get('username'), extra() if extra else None)
+            etag = hashlib.sha1(repr(parts).encode()).hexdigest()
+            last_modified = changed.replace(microsecond=0, tzinfo=timezone.utc) if changed else None
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                not_modified = bool(last_modified and request.if_modified_since
+                                    and last_modified <= request.if_modified_since)
+            if not_modified:
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.last_modified = last_modified
+            # Let browsers keep the page but always revalidate it
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapped
+    return decorator
+
+
+page_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+
+def static_page(template):
+    """
+    Returns a response for a page that only depends on the session, rendering it once per user.
+    The body greets the user by name, so it is never reused after a login or logout: browsers must
+    revalidate it with the ETag, which is derived from the user and the body, and get a 304 while
+    both are unchanged.
+    """
+    key = (template, session.get('type'), session.get('username'))
+    page = page_cache.get(key)
+    if page is None:
+        body = render_template(template)
+        page = (body, hashlib.sha1((repr(key) + body).encode()).hexdigest())
+        page_cache.set(key, page)
+    body, etag = page
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+    else:
+        response = make_response(body)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,89 @@
+"""
+This module registers the maintenance commands of the application with the Flask CLI.
+
+Usage (with `FLASK_APP=crudapp.py`):
+- `flask rebuild-summaries`: Recomputes the per job title review summaries from the reviews table.
+- `flask remoderate-reviews`: Masks inappropriate words in the stored reviews after the word list changed.
+- `flask build-duplicate-index`: Rebuilds the near-duplicate review index from the stored reviews.
+- `flask import-csv`: Imports reviews or jobs in bulk from a CSV file.
+- `flask export`: Writes the reviews, jobs or applications to a CSV, Parquet or Arrow file.
+"""
+import time
+
+import click
+
+from app import app
+from app.aggregates import rebuild_summaries
+from app.moderation import remoderate_reviews, DEFAULT_CHUNK_SIZE
+from app.duplicates import rebuild_duplicate_index
+from app.bulk_import import import_csv, DEFAULT_IMPORT_CHUNK_SIZE
+from app.export import export_table, EXPORT_TABLES, EXPORT_FORMATS, EXPORT_BATCH_SIZE
+
+
+@app.cli.command('rebuild-summaries')
+def rebuild_summaries_command():
+    """Recompute the job title review summaries from scratch (backfill or drift repair)."""
+    groups = rebuild_summaries()
+    click.echo(f'Rebuilt {groups} job title summaries.')
+
+
+@app.cli.command('remoderate-reviews')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Reviews read and written per batch.')
+@click.option('--workers', default=0, help='Worker processes, defaults to the number of CPUs.')
+@click.option('--checkpoint', default='remoderate.checkpoint.json', show_default=True,
+              help='File recording the progress, an interrupted run continues from it.')
+@click.option('--restart', is_flag=True, help='Ignore an existing checkpoint and scan every review again.')
+def remoderate_reviews_command(chunk_size, workers, checkpoint, restart):
+    """Re-apply the inappropriate word filter to the stored reviews."""
+    def report(progress):
+        click.echo(f"Scanned {progress['scanned']} reviews (up to id {progress['last_id']}), "
+                   f"masked {progress['changed']}.")
+
+    progress = remoderate_reviews(chunk_size=chunk_size, workers=workers or None, checkpoint=checkpoint,
+                                  restart=restart, progress_callback=report)
+    click.echo(f"Done: scanned {progress['scanned']} reviews, masked {progress['changed']}.")
+
+
+@app.cli.command('build-duplicate-index')
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, help='Reviews indexed per transaction.')
+@click.option('--no-flag', is_flag=True, help='Only build the index, do not flag existing duplicates.')
+def build_duplicate_index_command(chunk_size, no_flag):
+    """Rebuild the near-duplicate review index (MinHash LSH buckets) from the stored reviews."""
+    indexed, flagged = rebuild_duplicate_index(chunk_size=chunk_size, flag=not no_flag)
+    click.echo(f'Indexed {indexed} reviews, flagged {flagged} near-duplicates.')
+
+
+@app.cli.command('import-csv')
+@click.argument('kind', type=click.Choice(['reviews', 'jobs']))
+@click.argument('csv_file', type=click.File('r', encoding='utf-8-sig', errors='replace'))
+@click.option('--chunk-size', default=DEFAULT_IMPORT_CHUNK_SIZE, show_default=True,
+              help='Rows inserted per transaction.')
+@click.option('--employer', default=None, help='Employer user name of the job rows without an employer_id.')
+@click.option('--no-duplicate-check', is_flag=True,
+              help='Skip the near-duplicate check of imported reviews (run build-duplicate-index later).')
+def import_csv_command(kind, csv_file, chunk_size, employer, no_duplicate_check):
+    """Import reviews or jobs from a CSV file whose first line names the columns."""
+    def report_progress(report):
+        click.echo(f'{report.imported + report.rejected} rows read, {report.rows_per_second:.0f} rows/s.')
+
+    report = import_csv(csv_file, kind, chunk_size=chunk_size, employer_id=employer,
+                        check_duplicates=not no_duplicate_check, progress_callback=report_progress)
+    for line, message in report.errors:
+        click.echo(f'Line {line}: {message}', err=True)
+    if report.rejected > len(report.errors):
+        click.echo(f'... and {report.rejected - len(report.errors)} more rejected rows.', err=True)
+    click.echo(report.summary())
+
+
+@app.cli.command('export')
+@click.argument('name', type=click.Choice(list(EXPORT_TABLES)))
+@click.argument('output', type=click.File('wb'))
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_FORMATS)), default='csv', show_default=True,
+              help='File format, parquet and arrow need pyarrow.')
+@click.option('--batch-size', default=EXPORT_BATCH_SIZE, show_default=True,
+              help='Rows read per batch (and per Parquet row group).')
+def export_command(name, output, fmt, batch_size):
+    """Export a whole table to a file (- for standard output)."""
+    started = time.perf_counter()
+    written = export_table(name, output, fmt=fmt, batch_size=batch_size)
+    click.echo(f'Exported {name} as {fmt}: {written} bytes in {time.perf_counter() - started:.2f}s.', err=True)
@@ -4,4 +4,19 @@ basedir = os.path.abspath(os.path.dirname(__file__))
 class Config(object):
     """The class creates a connection to the database"""
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.join(basedir, 'app.db')
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Buffer upvotes in memory and group-commit them instead of writing on every click
+    UPVOTE_WRITE_BEHIND = os.environ.get('UPVOTE_WRITE_BEHIND', '0') == '1'
+    UPVOTE_FLUSH_INTERVAL = float(os.environ.get('UPVOTE_FLUSH_INTERVAL', '2.0'))
+    UPVOTE_FLUSH_SIZE = int(os.environ.get('UPVOTE_FLUSH_SIZE', '500'))
+    # Number of rendered listing fragments kept per worker process
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', '256'))
+    # Seconds after which a worker reloads its job title autocomplete index from the database
+    AUTOCOMPLETE_REFRESH_INTERVAL = float(os.environ.get('AUTOCOMPLETE_REFRESH_INTERVAL', '60'))
+    # File holding the words masked in reviews, and how often (seconds) workers check it for changes
+    INAPPROPRIATE_WORDS_FILE = os.environ.get('INAPPROPRIATE_WORDS_FILE') or os.path.join(basedir, 'inappropriate_words.txt')
+    INAPPROPRIATE_WORDS_CHECK_INTERVAL = float(os.environ.get('INAPPROPRIATE_WORDS_CHECK_INTERVAL', '5'))
+    # What /add does with a near-duplicate of a review of the same job: 'flag', 'reject' or 'off'
+    DUPLICATE_REVIEW_ACTION = os.environ.get('DUPLICATE_REVIEW_ACTION', 'flag')
+    # Shingle similarity from which two reviews count as near-duplicates
+    DUPLICATE_REVIEW_THRESHOLD = float(os.environ.get('DUPLICATE_REVIEW_THRESHOLD', '0.8'))
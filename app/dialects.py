@@ -0,0 +1,22 @@
+"""
+This module contains helpers for statements whose syntax differs between database backends.
+
+Key Components:
+- `conflict_insert`: Returns an INSERT construct that supports `ON CONFLICT` clauses where available.
+"""
+from app import db
+
+
+def conflict_insert(table):
+    """
+    Returns an insert for `table` offering `on_conflict_do_nothing` / `on_conflict_do_update`,
+    or None when the current database has no ON CONFLICT support.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert(table)
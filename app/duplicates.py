@@ -0,0 +1,176 @@
+"""
+This module detects near-duplicate reviews with MinHash signatures and locality sensitive hashing.
+
+Every review is reduced to the set of character shingles of its text and summarized by a MinHash
+signature, whose rows agree between two reviews with a probability equal to the Jaccard
+similarity of their shingle sets. The signature is cut into bands, and each band (together with
+the job title) is hashed into a bucket stored in `review_lsh_buckets`. Reviews of the same job
+sharing any bucket are candidates, and a candidate is a duplicate when the Jaccard similarity of
+the two shingle sets reaches `DUPLICATE_REVIEW_THRESHOLD`.
+
+A lookup probes a fixed number of buckets through the primary key index and compares the new
+review with at most `MAX_CANDIDATES` stored ones, so its cost does not grow with the table.
+
+Key Components:
+- `shingles` / `minhash_signature` / `band_buckets`: Turn a review into its LSH buckets.
+- `find_duplicate`: Returns the id of a stored near-duplicate of a review, if any.
+- `index_review` / `forget_review`: Add a review to the index or remove it.
+- `index_reviews_after`: Indexes reviews stored without the check, such as bulk imports.
+- `rebuild_duplicate_index`: Rebuilds the index from the stored reviews, flagging duplicates.
+"""
+import hashlib
+import random
+import re
+
+from sqlalchemy import insert
+
+from app import app, db
+from app.cache import bump_versions
+from app.dialects import conflict_insert
+from app.models import Reviews, ReviewBucket
+
+SHINGLE_SIZE = 4
+# 16 bands of 4 rows: pairs above a similarity of about 0.5 are likely to share a bucket
+BANDS = 16
+ROWS_PER_BAND = 4
+MAX_CANDIDATES = 20
+MERSENNE_PRIME = (1 << 61) - 1
+
+# The same seed in every process, signatures have to agree between workers and runs
+_rng = random.Random(1723)
+HASH_PARAMS = [(_rng.randrange(1, MERSENNE_PRIME), _rng.randrange(MERSENNE_PRIME))
+               for _ in range(BANDS * ROWS_PER_BAND)]
+
+
+def stable_hash(text, signed=False):
+    """
+    Returns a 64 bit hash of `text` that is the same in every process (unlike `hash()`)
+    """
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), 'big', signed=signed)
+
+
+def shingles(text):
+    """
+    Returns the set of character shingles of a text, ignoring case, punctuation and spacing
+    """
+    normalized = ' '.join(re.findall(r'\w+', (text or '').lower()))
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(first, second):
+    """
+    Returns the Jaccard similarity of two sets
+    """
+    if not first or not second:
+        return 0.0
+    common = len(first & second)
+    return common / (len(first) + len(second) - common)
+
+
+def minhash_signature(shingle_set):
+    """
+    Returns the MinHash signature of a set of shingles, one minimum per hash function
+    """
+    values = [stable_hash(shingle) for shingle in shingle_set]
+    return [min((a * value + b) % MERSENNE_PRIME for value in values) for a, b in HASH_PARAMS]
+
+
+def band_buckets(job_title, shingle_set):
+    """
+    Returns the LSH bucket of every band of the signature, scoped to the job title
+    """
+    if not shingle_set:
+        return []
+    signature = minhash_signature(shingle_set)
+    title = ' '.join((job_title or '').lower().split())
+    return [stable_hash(f'{title}|{band}|' + ','.join(map(str, signature[band * ROWS_PER_BAND:
+                                                                       (band + 1) * ROWS_PER_BAND])),
+                        signed=True)
+            for band in range(BANDS)]
+
+
+def find_duplicate(job_title, text, buckets=None):
+    """
+    Returns the id of the most similar stored review of the same job at or above the threshold, or None
+    """
+    shingle_set = shingles(text)
+    buckets = band_buckets(job_title, shingle_set) if buckets is None else buckets
+    if not buckets:
+        return None
+    candidate_ids = [row.review_id for row in db.session.query(ReviewBucket.review_id)
+                     .filter(ReviewBucket.bucket.in_(buckets)).distinct().limit(MAX_CANDIDATES)]
+    if not candidate_ids:
+        return None
+    best_id, best_score = None, app.config['DUPLICATE_REVIEW_THRESHOLD']
+    for review_id, review in db.session.query(Reviews.id, Reviews.review).filter(Reviews.id.in_(candidate_ids)):
+        score = jaccard(shingle_set, shingles(review))
+        if score >= best_score:
+            best_id, best_score = review_id, score
+    return best_id
+
+
+def index_review(review_id, buckets):
+    """
+    Stores the buckets of a flushed review, inside the current transaction.
+    Buckets already stored for the review are skipped where the database supports it.
+    """
+    if buckets:
+        table = ReviewBucket.__table__
+        statement = conflict_insert(table)
+        statement = insert(table) if statement is None else statement.on_conflict_do_nothing()
+        db.session.execute(statement, [{'bucket': bucket, 'review_id': review_id} for bucket in set(buckets)])
+
+
+def forget_review(review_id):
+    """
+    Removes the buckets of a review that is being deleted. The oldest review flagged as its duplicate
+    takes its place: that one is no longer flagged and the other duplicates now point to it.
+    """
+    ReviewBucket.query.filter(ReviewBucket.review_id == review_id).delete(synchronize_session=False)
+    successor = (db.session.query(Reviews.id).filter(Reviews.duplicate_of == review_id)
+                 .order_by(Reviews.id).limit(1).scalar())
+    if successor is None:
+        return
+    Reviews.query.filter(Reviews.id == successor).update({Reviews.duplicate_of: None}, synchronize_session=False)
+    Reviews.query.filter(Reviews.duplicate_of == review_id).update({Reviews.duplicate_of: successor},
+                                                                    synchronize_session=False)
+    bump_versions('reviews')
+
+
+def index_reviews_after(last_id, chunk_size=1000, flag=True):
+    """
+    Indexes the reviews with an id above `last_id` in id order and returns `(indexed, flagged)`.
+    With `flag`, each review found to duplicate an older one is marked with that review's id.
+    """
+    indexed = flagged = 0
+    while True:
+        rows = (db.session.query(Reviews.id, Reviews.job_title, Reviews.review, Reviews.duplicate_of)
+                .filter(Reviews.id > last_id).order_by(Reviews.id).limit(chunk_size).all())
+        if not rows:
+            return indexed, flagged
+        flagged_before = flagged
+        for review_id, job_title, text, duplicate_of in rows:
+            buckets = band_buckets(job_title, shingles(text))
+            if flag and duplicate_of is None:
+                original = find_duplicate(job_title, text, buckets)
+                if original is not None:
+                    Reviews.query.filter(Reviews.id == review_id).update(
+                        {'duplicate_of': original}, synchronize_session=False)
+                    flagged += 1
+            index_review(review_id, buckets)
+            indexed += 1
+        if flagged > flagged_before:
+            bump_versions('reviews')
+        last_id = rows[-1].id
+        db.session.commit()
+
+
+def rebuild_duplicate_index(chunk_size=1000, flag=True):
+    """
+    Rebuilds the bucket table from every stored review and returns `(indexed, flagged)`
+    """
+    ReviewBucket.query.delete(synchronize_session=False)
+    db.session.commit()
+    return index_reviews_after(0, chunk_size=chunk_size, flag=flag)
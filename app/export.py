@@ -0,0 +1,183 @@
+"""
+This module exports the reviews, jobs and applications as CSV, Parquet or Arrow files.
+
+Rows are read through a server-side cursor (on databases that have one) `EXPORT_BATCH_SIZE`
+at a time and written out batch by batch, so an export holds one batch in memory whatever the
+size of the table. The rows are read as plain tuples of the table columns, without building ORM
+objects. CSV is always available; Parquet (one row group per batch) and the Arrow IPC stream
+format need the optional `pyarrow` package. SQLite lets a column hold values of another type,
+such values are converted to the column type (or exported as null when they cannot be) so a
+stray value never ends a stream halfway.
+
+Key Components:
+- `EXPORT_TABLES`: The exportable tables by name.
+- `EXPORT_FORMATS`: The formats available in this installation, with their mimetype and extension.
+- `export_chunks`: Yields the encoded file of a table piece by piece, for streaming responses.
+- `export_table`: Writes the export of a table to a binary file.
+"""
+import csv
+import io
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models import Reviews, Job, Application
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+EXPORT_BATCH_SIZE = 50000
+
+EXPORT_TABLES = {
+    'reviews': Reviews.__table__,
+    'jobs': Job.__table__,
+    'applications': Application.__table__,
+}
+
+EXPORT_FORMATS = {'csv': ('text/csv', 'csv')}
+if pyarrow is not None:
+    EXPORT_FORMATS['parquet'] = ('application/vnd.apache.parquet', 'parquet')
+    EXPORT_FORMATS['arrow'] = ('application/vnd.apache.arrow.stream', 'arrows')
+
+
+def table_batches(table, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the rows of a table in primary key order, `batch_size` tuples at a time
+    """
+    statement = (select(*table.columns).order_by(*table.primary_key.columns)
+                 .execution_options(stream_results=True))
+    result = db.session.execute(statement)
+    try:
+        yield from result.partitions(batch_size)
+    finally:
+        result.close()
+
+
+class ChunkSink(io.RawIOBase):
+    """A write-only file collecting what a writer wrote since the last `drain`"""
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        """Returns and forgets the bytes written so far"""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def csv_chunks(table, batch_size):
+    """Yields a CSV file of the table, one encoded batch of lines at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in table.columns])
+    for rows in table_batches(table, batch_size):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def arrow_type(column):
+    """Returns the Arrow type of a table column"""
+    python_type = column.type.python_type
+    if python_type is int:
+        return pyarrow.int64()
+    if python_type is float:
+        return pyarrow.float64()
+    if python_type is datetime:
+        return pyarrow.timestamp('us')
+    return pyarrow.string()
+
+
+def coerce_value(value, python_type):
+    """Returns a value converted to the Python type of its column, or None when it cannot be"""
+    if python_type is str:
+        return str(value)
+    if python_type in (int, float):
+        try:
+            return python_type(value)
+        except (TypeError, ValueError, OverflowError):
+            return None
+    return None
+
+
+def arrow_array(values, field, column):
+    """Returns the Arrow array of a column of a batch, converting values that do not fit its type"""
+    try:
+        return pyarrow.array(values, type=field.type)
+    except (pyarrow.ArrowException, OverflowError):
+        python_type = column.type.python_type
+        return pyarrow.array([value if value is None or type(value) is python_type  # pylint: disable=unidiomatic-typecheck
+                              else coerce_value(value, python_type) for value in values], type=field.type)
+
+
+def arrow_chunks(table, batch_size, fmt):
+    """Yields a Parquet file (one row group per batch) or an Arrow stream of the table"""
+    # Numbers may be stored as text and exported as null, so number columns are always nullable
+    schema = pyarrow.schema([(column.key, arrow_type(column),
+                              column.nullable or column.primary_key or column.type.python_type in (int, float))
+                             for column in table.columns])
+    sink = ChunkSink()
+    if fmt == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+    for rows in table_batches(table, batch_size):
+        columns = list(zip(*rows))
+        batch = pyarrow.record_batch([arrow_array(values, field, column)
+                                      for values, field, column in zip(columns, schema, table.columns)],
+                                     schema=schema)
+        if fmt == 'parquet':
+            writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(name, fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yields the export of the table `name` in the format `fmt` as a series of byte strings
+    """
+    if name not in EXPORT_TABLES:
+        raise ValueError(f"Unknown table {name!r}, choose one of {', '.join(EXPORT_TABLES)}")
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported format {fmt!r}, choose one of {', '.join(EXPORT_FORMATS)}"
+                         + ('' if pyarrow else ' (install pyarrow for parquet and arrow)'))
+    table = EXPORT_TABLES[name]
+    if fmt == 'csv':
+        return csv_chunks(table, batch_size)
+    return arrow_chunks(table, batch_size, fmt)
+
+
+def export_table(name, output, fmt='csv', batch_size=EXPORT_BATCH_SIZE):
+    """
+    Writes the export of the table `name` to the binary file `output` and returns the bytes written
+    """
+    written = 0
+    for chunk in export_chunks(name, fmt, batch_size):
+        output.write(chunk)
+        written += len(chunk)
+    return written
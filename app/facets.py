@@ -0,0 +1,138 @@
+"""
+This module provides the faceted filters of the review listing.
+
+Reviews can be narrowed down by department, location, an hourly pay range, a minimum rating
+and a minimum recommendation. Next to every filter the page shows how many reviews each of its
+values would leave, counted under all the *other* active filters so that switching a value never
+leads to an empty page. The counts are grouped queries served by the composite indexes on
+`Reviews`, and they are cached per filter combination until the reviews table changes.
+
+Key Components:
+- `review_filters`: Reads the active filters from the query string.
+- `apply_review_filters`: Narrows a `Reviews` query down to the active filters.
+- `facet_counts`: Returns the per value counts of every facet, cached per filter combination.
+"""
+from sqlalchemy import case, func
+
+from app import app, db
+from app.cache import FragmentCache, table_versions
+from app.models import Reviews
+
+# Hourly pay bands offered as facet values, the upper bound is exclusive and None is open-ended
+PAY_BANDS = ((0, 10), (10, 15), (15, 20), (20, 25), (25, None))
+# Most frequent departments and locations listed as facet values
+FACET_LIMIT = 20
+INT_FILTERS = ('min_pay', 'max_pay', 'min_rating', 'min_recommendation')
+
+facet_cache = FragmentCache(app.config['FRAGMENT_CACHE_SIZE'])
+
+
+def review_filters(args):
+    """
+    Returns the active filters found in `args`, dropping empty and malformed values
+    """
+    filters = {}
+    for name in ('department', 'location'):
+        value = args.get(name, '').strip()
+        if value:
+            filters[name] = value
+    for name in INT_FILTERS:
+        value = args.get(name, type=int)
+        if value is not None:
+            filters[name] = value
+    return filters
+
+
+def filter_conditions(filters, skip=()):
+    """
+    Returns the SQL conditions for the active filters, leaving out the facets in `skip`
+    """
+    conditions = []
+    if 'department' in filters and 'department' not in skip:
+        conditions.append(Reviews.department == filters['department'])
+    if 'location' in filters and 'location' not in skip:
+        conditions.append(Reviews.locations == filters['location'])
+    if 'pay' not in skip:
+        if 'min_pay' in filters:
+            conditions.append(Reviews.hourly_pay >= filters['min_pay'])
+        if 'max_pay' in filters:
+            conditions.append(Reviews.hourly_pay <= filters['max_pay'])
+    if 'min_rating' in filters and 'rating' not in skip:
+        conditions.append(Reviews.rating >= filters['min_rating'])
+    if 'min_recommendation' in filters and 'recommendation' not in skip:
+        conditions.append(Reviews.recommendation >= filters['min_recommendation'])
+    return conditions
+
+
+def apply_review_filters(query, filters):
+    """
+    Narrows a `Reviews` query down to the active filters
+    """
+    return query.filter(*filter_conditions(filters))
+
+
+def pay_band_label(low, high):
+    """
+    Returns the display label of a pay band
+    """
+    return f'${low}+' if high is None else f'${low}-{high - 1}'
+
+
+def grouped_counts(column, filters, skip, limit=None):
+    """
+    Counts the reviews per value of `column` under every active filter except `skip`
+    """
+    count = func.count(Reviews.id)
+    query = (db.session.query(column, count)
+             .filter(*filter_conditions(filters, skip=(skip,)))
+             .group_by(column))
+    if limit:
+        query = query.order_by(count.desc(), column).limit(limit)
+    else:
+        query = query.order_by(column)
+    return [(value, total) for value, total in query]
+
+
+def at_least(counts):
+    """
+    Turns per value counts into counts of the reviews at or above each value, for the minimum filters
+    """
+    totals, running = [], 0
+    for value, total in reversed(counts):
+        running += total
+        totals.append((value, running))
+    return totals
+
+
+def compute_facet_counts(filters):
+    """
+    Runs one grouped count query per facet
+    """
+    band = case(*[((Reviews.hourly_pay >= low) if high is None
+                   else (Reviews.hourly_pay >= low) & (Reviews.hourly_pay < high), index)
+                  for index, (low, high) in enumerate(PAY_BANDS)])
+    pay = []
+    for index, total in grouped_counts(band, filters, 'pay'):
+        if index is not None:
+            low, high = PAY_BANDS[index]
+            pay.append({'label': pay_band_label(low, high), 'min_pay': low,
+                        'max_pay': None if high is None else high - 1, 'count': total})
+    return {
+        'department': grouped_counts(Reviews.department, filters, 'department', limit=FACET_LIMIT),
+        'location': grouped_counts(Reviews.locations, filters, 'location', limit=FACET_LIMIT),
+        'pay': pay,
+        'rating': at_least(grouped_counts(Reviews.rating, filters, 'rating')),
+        'recommendation': at_least(grouped_counts(Reviews.recommendation, filters, 'recommendation')),
+    }
+
+
+def facet_counts(filters):
+    """
+    Returns the facet counts for a filter combination, computing them only after the reviews changed
+    """
+    key = (table_versions('reviews'), tuple(sorted(filters.items())))
+    counts = facet_cache.get(key)
+    if counts is None:
+        counts = compute_facet_counts(filters)
+        facet_cache.set(key, counts)
+    return counts
@@ -0,0 +1,258 @@
+"""
+This module provides typo-tolerant matching of job titles and locations with a trigram index.
+
+Every distinct job title and location of `Reviews` and `Job` is kept in an in-memory index. Each
+word of a query is matched against the vocabulary of those phrases by trigrams (runs of three
+characters of each word, padded like PostgreSQL's pg_trgm), and only the phrases containing the
+matched words are scored, so the candidates are found without looking at every phrase. Phrases
+are ranked by trigram similarity (shared trigrams over all distinct trigrams of both strings).
+
+When a full-text search of the reviews finds nothing, the review listing uses the best match to
+search again, so "teachng assistant" finds the reviews of "Teaching Assistant".
+The index is kept up to date the same way as the job title autocomplete index.
+
+Key Components:
+- `trigrams`: Returns the set of trigrams of a string.
+- `similarity`: Returns the trigram similarity of two trigram sets.
+- `TrigramIndex`: Reference counted phrases with an inverted trigram index and similarity lookup.
+- `phrase_index`: The index of the current worker process.
+- `similar_phrases`: Returns the known titles and locations closest to some text.
+"""
+import threading
+import time
+
+from sqlalchemy import func
+
+from app import app, db
+from app.autocomplete import normalize_title, watch_committed_values
+from app.models import Reviews, Job
+
+# Matches below this similarity are not worth suggesting
+SIMILARITY_THRESHOLD = 0.3
+# Close vocabulary words tried for every word of a query
+WORD_ALTERNATIVES = 5
+# Candidate phrases scored by a lookup at most, whatever the number of phrases sharing its words
+MAX_SCORED = 500
+
+
+def trigrams(text):
+    """
+    Returns the trigrams of the words in `text`, each word padded with two leading and one trailing space
+    """
+    grams = set()
+    for word in normalize_title(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(first, second):
+    """
+    Returns the trigram similarity of two trigram sets: shared trigrams over all distinct trigrams
+    """
+    common = len(first & second)
+    return common / (len(first) + len(second) - common) if common else 0.0
+
+
+class TrigramIndex:
+    """
+    A two level trigram index of phrases, ranking phrases by their similarity to a query.
+
+    Each query word is first matched against the vocabulary, the distinct words of all phrases,
+    through an inverted index from trigrams to words. The vocabulary grows far slower than the
+    number of phrases, and the words it returns lead to the phrases containing them through a
+    second inverted index, in which the phrases of a word are grouped by their number of trigrams.
+
+    A phrase of `n` trigrams can reach at most a similarity of min(q, n) / max(q, n) with a query of
+    `q` trigrams, so the groups are visited from the closest size outwards. The visit stops once that
+    bound cannot beat the best matches found, or after `MAX_SCORED` candidates. A common query word
+    such as "assistant" therefore costs a bounded number of similarity computations, however many
+    phrases contain it. Candidates must contain a close match of every recognised query word; if no
+    phrase does, the phrases of the rarest word are used alone.
+
+    Phrases are reference counted per spelling like the autocomplete index, so a phrase is
+    forgotten once the last row using it is gone and its most common spelling is returned.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Empties the index, the next lookup loads it again"""
+        with self.lock:
+            self.phrases = {}
+            # word -> {number of trigrams of the phrase -> keys of the phrases containing the word}
+            self.word_phrases = {}
+            self.word_counts = {}
+            self.word_grams = {}
+            self.postings = {}
+            self.loaded_at = None
+
+    def load(self, counts):
+        """Replaces the contents with `(phrase, count)` pairs"""
+        fresh = TrigramIndex()
+        for phrase, count in counts:
+            fresh.add(phrase, count)
+        with self.lock:
+            self.phrases, self.word_phrases, self.word_counts = fresh.phrases, fresh.word_phrases, fresh.word_counts
+            self.word_grams, self.postings = fresh.word_grams, fresh.postings
+            self.loaded_at = time.monotonic()
+
+    def add(self, phrase, count=1):
+        """Counts `count` more rows using `phrase`, the caller holds `lock` once the index is in use"""
+        key = normalize_title(phrase)
+        if not key:
+            return
+        entry = self.phrases.get(key)
+        if entry is None:
+            entry = self.phrases[key] = (trigrams(key), {})
+            size = len(entry[0])
+            for word in set(key.split()):
+                if word not in self.word_phrases:
+                    self.word_phrases[word] = {}
+                    self.word_counts[word] = 0
+                    self.word_grams[word] = trigrams(word)
+                    for gram in self.word_grams[word]:
+                        self.postings.setdefault(gram, set()).add(word)
+                self.word_phrases[word].setdefault(size, set()).add(key)
+                self.word_counts[word] += 1
+        spellings = entry[1]
+        spellings[phrase] = spellings.get(phrase, 0) + count
+
+    def discard(self, phrase, count=1):
+        """Counts `count` fewer rows using `phrase`, dropping it when none are left (holding `lock`)"""
+        key = normalize_title(phrase)
+        entry = self.phrases.get(key)
+        if entry is None or phrase not in entry[1]:
+            return
+        spellings = entry[1]
+        spellings[phrase] -= count
+        if spellings[phrase] <= 0:
+            del spellings[phrase]
+        if spellings:
+            return
+        size = len(entry[0])
+        del self.phrases[key]
+        for word in set(key.split()):
+            groups = self.word_phrases[word]
+            groups[size].discard(key)
+            if not groups[size]:
+                del groups[size]
+            self.word_counts[word] -= 1
+            if groups:
+                continue
+            del self.word_phrases[word]
+            del self.word_counts[word]
+            for gram in self.word_grams.pop(word):
+                words = self.postings[gram]
+                words.discard(word)
+                if not words:
+                    del self.postings[gram]
+
+    def similar_words(self, word, threshold, limit):
+        """Returns up to `limit` vocabulary words whose similarity to `word` reaches `threshold`"""
+        if word in self.word_phrases:
+            return [word]
+        grams = trigrams(word)
+        candidates = set()
+        for gram in grams:
+            candidates.update(self.postings.get(gram, ()))
+        scored = [(similarity(grams, self.word_grams[candidate]), candidate) for candidate in candidates]
+        scored = sorted((match for match in scored if match[0] >= threshold), reverse=True)
+        return [candidate for _, candidate in scored[:limit]]
+
+    def best_phrases(self, query, anchors, required, limit, threshold):
+        """
+        Scores the phrases containing one of the `anchors` words and a word of each `required` list,
+        closest sizes first, and returns the best `(score, key)` pairs
+        """
+        sizes = {size for word in anchors for size in self.word_phrases[word]}
+        bound = lambda size: min(len(query), size) / max(len(query), size)  # pylint: disable=unnecessary-lambda-assignment
+        best, scored, seen = [], 0, set()
+        for size in sorted(sizes, key=bound, reverse=True):
+            if bound(size) < threshold or scored >= MAX_SCORED or (
+                    len(best) >= limit and bound(size) <= best[limit - 1][0]):
+                break
+            for word in anchors:
+                for key in self.word_phrases[word].get(size, ()):
+                    if key in seen or not all(any(key in self.word_phrases[match].get(size, ()) for match in words)
+                                              for words in required):
+                        continue
+                    seen.add(key)
+                    scored += 1
+                    score = similarity(query, self.phrases[key][0])
+                    if score >= threshold:
+                        best.append((score, key))
+            best.sort(key=lambda match: (-match[0], match[1]))
+            del best[limit:]
+        return best
+
+    def search(self, text, limit=5, threshold=SIMILARITY_THRESHOLD):
+        """Returns up to `limit` `(phrase, similarity)` pairs at or above `threshold`, best first"""
+        query = trigrams(text)
+        if not query:
+            return []
+        with self.lock:
+            # the close vocabulary matches of each query word, rarest word first
+            word_matches = []
+            for word in set(normalize_title(text).split()):
+                words = self.similar_words(word, threshold, WORD_ALTERNATIVES)
+                if words:
+                    word_matches.append((sum(self.word_counts[match] for match in words), words))
+            if not word_matches:
+                return []
+            word_matches.sort()
+            anchors, required = word_matches[0][1], [words for _, words in word_matches[1:]]
+            best = self.best_phrases(query, anchors, required, limit, threshold)
+            if not best and required:
+                best = self.best_phrases(query, anchors, [], limit, threshold)
+            matches = []
+            for score, key in best:
+                spellings = self.phrases[key][1]
+                matches.append((max(spellings, key=lambda phrase: (spellings[phrase], phrase)), score))
+        return matches
+
+    def __len__(self):
+        return len(self.phrases)
+
+
+phrase_index = TrigramIndex()
+
+
+def phrase_counts():
+    """
+    Reads every distinct job title and location of the reviews and jobs with its number of rows
+    """
+    counts = []
+    for column in (Reviews.job_title, Reviews.locations, Job.title, Job.location):
+        counts.extend(db.session.query(column, func.count()).group_by(column).all())
+    return counts
+
+
+def similar_phrases(text, limit=5):
+    """
+    Returns the known job titles and locations most similar to `text`, (re)loading the index when needed
+    """
+    loaded_at = phrase_index.loaded_at
+    if loaded_at is None or time.monotonic() - loaded_at > app.config['AUTOCOMPLETE_REFRESH_INTERVAL']:
+        phrase_index.load(phrase_counts())
+    return phrase_index.search(text, limit)
+
+
+def apply_phrase_changes(changes):
+    """
+    Applies committed title and location changes to the index of this worker, once it is loaded
+    """
+    if phrase_index.loaded_at is None:
+        return
+    with phrase_index.lock:
+        for phrase, delta in changes:
+            if delta > 0:
+                phrase_index.add(phrase)
+            else:
+                phrase_index.discard(phrase)
+
+
+watch_committed_values('phrase_changes', {Reviews: ('job_title', 'locations'), Job: ('title', 'location')},
+                       apply_phrase_changes)
@@ -1,26 +1,206 @@
-inappropriate_words_list=[
-    "ass",
-    "bitch",
-    "bloody",
-    "cock",
-    "cum",
-    "damn",
-    "dick",
-    "fuck",
-    "hell",
-    "horny",
-    "jerk-off",
-    "penis",
-    "piss",
-    "poop",
-    "porn",
-    "prick",
-    "pussy",
-    "shit",
-    "slut",
-    "tits"
-]
+"""
+This module provides the inappropriate word filter applied to the reviews.
+
+The words are read from the file named by the `INAPPROPRIATE_WORDS_FILE` setting, and a new
+version of the file replaces the filter of the running workers without a restart.
+
+`ProfanityFilter` compiles a word list once into a set of normalized words, so checking a review
+costs one set lookup per word, whatever the size of the list. Words are normalized before they are
+compared, which also catches the usual obfuscations:
+- surrounding punctuation is ignored ("damn!" is "damn"),
+- case and accents are folded ("DÁMN" is "damn"),
+- digits and symbols standing in for letters of a word are read as letters ("$h1t" is "shit"),
+- separators inside a word are dropped ("s.h.i.t" is "shit"),
+- stretched letters are allowed ("shiiiit" is "shit", but "heel" is not "hell").
+
+Only whole words are matched, so words that merely contain a listed word ("class", "hello") pass.
+Matches are masked with asterisks, the rest of the text (spacing and punctuation) is kept as typed.
+
+Key Components:
+- `ProfanityFilter`: A compiled filter with `contains`, `find` and `mask`.
+- `WordList`: The word list file and its compiled filter, reloaded when the file changes.
+- `profanity_filter`: Returns the filter compiled from the current word list.
+- `badwords`: Returns the current word list.
+"""
+import os
+import re
+import threading
+import unicodedata
+
+from app import app
+
+# Characters commonly typed in place of letters
+LEET_LETTERS = str.maketrans({'0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't',
+                              '@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't'})
+# A word without its leading and trailing punctuation, symbols that stand for letters are kept
+WORD = re.compile(r'[^\w\s@$]*(\S+?)[^\w\s]*(?!\S)')
+SEPARATORS = re.compile(r"[.\-_'*~]")
+REPEATS = re.compile(r'(.)\1+')
+RUNS = re.compile(r'(.)\1*')
+# Bound of the per filter memo of word verdicts
+MAX_VERDICTS = 100000
+
+
+def normalize_word(word):
+    """
+    Returns the comparison form of a word: folded case and accents, letters for look-alike symbols
+    and no separators. Look-alike symbols are only read as letters in words with a letter, so numbers
+    such as "455" stay numbers.
+    """
+    word = unicodedata.normalize('NFKD', word)
+    word = ''.join(char for char in word if not unicodedata.combining(char)).lower()
+    if any(char.isalpha() for char in word):
+        word = word.translate(LEET_LETTERS)
+    return SEPARATORS.sub('', word)
+
+
+def squeeze(word):
+    """
+    Collapses every run of a repeated letter into a single letter
+    """
+    return REPEATS.sub(r'\1', word)
+
+
+def run_lengths(word):
+    """
+    Returns the length of every run of a repeated letter, "hello" gives (1, 1, 2, 1)
+    """
+    return tuple(len(match.group(0)) for match in RUNS.finditer(word))
+
+
+class ProfanityFilter:
+    """A word filter compiled from a word list, matching normalized whole words in linear time"""
+
+    def __init__(self, words):
+        # verdicts of the words seen so far, reviews keep reusing the same few thousand words
+        self.verdicts = {}
+        self.words = set()
+        # squeezed form -> run lengths of the listed words with that form, so a word matches a listed
+        # word when each letter is repeated at least as often: "asss" matches "ass", "as" and "heel"
+        # ("hel" like "hell") do not
+        self.squeezed = {}
+        for word in words:
+            normalized = normalize_word(word.strip())
+            if normalized:
+                self.words.add(normalized)
+                self.squeezed.setdefault(squeeze(normalized), set()).add(run_lengths(normalized))
+
+    def is_inappropriate(self, word):
+        """Returns whether a single word (without surrounding punctuation) is on the list"""
+        verdict = self.verdicts.get(word)
+        if verdict is None:
+            normalized = normalize_word(word)
+            runs = run_lengths(normalized)
+            verdict = normalized in self.words or any(
+                all(run >= listed_run for run, listed_run in zip(runs, listed))
+                for listed in self.squeezed.get(squeeze(normalized), ()))
+            if len(self.verdicts) >= MAX_VERDICTS:
+                self.verdicts.clear()
+            self.verdicts[word] = verdict
+        return verdict
+
+    def find(self, text):
+        """Returns the `(start, end)` offsets of every inappropriate word in `text`"""
+        return [match.span(1) for match in WORD.finditer(text or '') if self.is_inappropriate(match.group(1))]
+
+    def contains(self, text):
+        """Returns whether `text` holds any inappropriate word"""
+        return bool(self.find(text))
+
+    def mask(self, text, mask_char='*'):
+        """Returns `text` with every inappropriate word replaced by `mask_char`s of the same length"""
+        spans = self.find(text)
+        if not spans:
+            return text
+        parts, position = [], 0
+        for start, end in spans:
+            parts.append(text[position:start])
+            parts.append(mask_char * (end - start))
+            position = end
+        parts.append(text[position:])
+        return ''.join(parts)
+
+
+def read_word_list(path):
+    """
+    Reads a word list file: one word per line, blank lines and lines starting with # are skipped
+    """
+    with open(path, encoding='utf-8') as word_file:
+        return [line.strip() for line in word_file if line.strip() and not line.lstrip().startswith('#')]
+
+
+class WordList:
+    """
+    The word list file and the filter compiled from it.
+
+    The file is read and compiled once per version (modification time and size). A background
+    thread of each worker process checks the version every `interval` seconds and swaps in a new
+    filter when it changed, so requests never touch the file and workers never need a restart.
+    """
+
+    def __init__(self, path, interval):
+        self.path = path
+        self.interval = interval
+        self.version = None
+        self.words = []
+        self.filter = ProfanityFilter([])
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.watcher_pid = None
+        self.reload()
+
+    def file_version(self):
+        """Returns the modification time and size of the file"""
+        stat = os.stat(self.path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def reload(self):
+        """Compiles the file again if it changed since the last load, returns whether it did"""
+        with self.lock:
+            version = self.file_version()
+            if version == self.version:
+                return False
+            words = read_word_list(self.path)
+            # A single assignment, requests see either the old filter or the new one
+            self.words, self.filter, self.version = words, ProfanityFilter(words), version
+            return True
+
+    def current(self):
+        """Returns the filter of the current word list, watching the file from the first call on"""
+        if self.watcher_pid != os.getpid():
+            self.start()
+        return self.filter
+
+    def start(self):
+        """Starts the file watcher thread of this process, threads do not survive a worker fork"""
+        with self.lock:
+            if self.watcher_pid == os.getpid():
+                return
+            self.watcher_pid = os.getpid()
+            threading.Thread(target=self.run, name='word-list-watcher', daemon=True).start()
+
+    def run(self):
+        """Body of the file watcher thread"""
+        while not self.stopped.wait(self.interval):
+            try:
+                if self.reload():
+                    app.logger.info('Reloaded %d inappropriate words from %s', len(self.words), self.path)
+            except OSError:
+                app.logger.exception('Reading %s failed, keeping the previous word list', self.path)
+
+
+word_list = WordList(app.config['INAPPROPRIATE_WORDS_FILE'], app.config['INAPPROPRIATE_WORDS_CHECK_INTERVAL'])
+
+
+def profanity_filter():
+    """
+    Returns the filter compiled from the current word list
+    """
+    return word_list.current()
 
 
 def badwords():
-    return inappropriate_words_list
\ No newline at end of file
+    """
+    Returns the current word list
+    """
+    return word_list.words
@@ -1,7 +1,7 @@
 from app import db
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import ForeignKey, Float
-from sqlalchemy.orm import relationship
+from sqlalchemy import ForeignKey, Float, func, literal_column
+from sqlalchemy.orm import relationship, query_expression, column_property
 from datetime import datetime
 
 
@@ -18,6 +18,52 @@ class Reviews(db.Model):
     rating = db.Column(db.Integer, nullable=False)
     recommendation = db.Column(db.Integer, nullable=False)
     upvote_count = db.Column(db.Integer, default=0)
+    # Id of an older review of the same job this one nearly copies, set when duplicates are flagged
+    duplicate_of = db.Column(db.Integer, nullable=True)
+
+    # Support keyset pagination of the review listing for each server-side sort key
+    __table_args__ = (
+        db.Index('ix_reviews_upvote_count_id', 'upvote_count', 'id'),
+        db.Index('ix_reviews_rating_id', 'rating', 'id'),
+        db.Index('ix_reviews_hourly_pay_id', 'hourly_pay', 'id'),
+        # Serve the faceted filters and their grouped counts without scanning the table
+        db.Index('ix_reviews_department_locations_rating', 'department', 'locations', 'rating'),
+        db.Index('ix_reviews_locations_rating', 'locations', 'rating'),
+        db.Index('ix_reviews_rating_recommendation', 'rating', 'recommendation'),
+    )
+
+
+class ReviewBucket(db.Model):
+    """Model which stores the MinHash LSH buckets of each review, used to find near-duplicate reviews"""
+    __tablename__ = 'review_lsh_buckets'
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    review_id = db.Column(db.Integer, ForeignKey('reviews.id'), primary_key=True, autoincrement=False, index=True)
+
+
+class JobTitleSummary(db.Model):
+    """Model which stores running totals of the reviews for each job title and department"""
+    __tablename__ = 'job_title_summary'
+    job_title = db.Column(db.String(64), primary_key=True)
+    department = db.Column(db.String(64), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_total = db.Column(db.Integer, nullable=False, default=0)
+    hourly_pay_total = db.Column(db.Integer, nullable=False, default=0)
+    recommendation_total = db.Column(db.Integer, nullable=False, default=0)
+
+    @property
+    def average_rating(self):
+        """Average rating of the reviews in this group"""
+        return self.rating_total / self.review_count if self.review_count else 0
+
+    @property
+    def average_hourly_pay(self):
+        """Average hourly pay of the reviews in this group"""
+        return self.hourly_pay_total / self.review_count if self.review_count else 0
+
+    @property
+    def average_recommendation(self):
+        """Average recommendation score (1-10) of the reviews in this group"""
+        return self.recommendation_total / self.review_count if self.review_count else 0
 
 
 class Upvote(db.Model):
@@ -46,13 +92,25 @@ class Job(db.Model):
     job_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     title = db.Column(db.String(164), nullable=False, index=True)
     description = db.Column(db.Text, nullable=False)
-    location = db.Column(db.String(164), nullable=False)
+    location = db.Column(db.String(164), nullable=False, index=True)
     pay = db.Column(db.Float, nullable=True)
-    posted_date = db.Column(db.DateTime, default=datetime.utcnow)
+    posted_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     employer_id = db.Column(db.String(60), ForeignKey('users.user_name'), nullable=False)  # Reference to User table
     # Relationship to applications
     applications = relationship("Application", back_populates="job")
     employer = relationship("User", back_populates="jobs")  # Link to the employer
+    # The start of the description, loaded by the job listing instead of the whole text
+    description_preview = query_expression()
+    # Sort key of the pay, jobs without pay rank below every paid job (keyset cursors cannot hold NULL).
+    # The literal keeps the expression identical to the one of ix_jobs_pay_rank_job_id.
+    pay_rank = column_property(func.coalesce(pay, literal_column('-1')))
+
+    # Support keyset pagination of the job listing for each server-side sort key
+    __table_args__ = (
+        db.Index('ix_jobs_posted_date_job_id', 'posted_date', 'job_id'),
+        db.Index('ix_jobs_pay_job_id', 'pay', 'job_id'),
+        db.Index('ix_jobs_pay_rank_job_id', func.coalesce(pay, literal_column('-1')), 'job_id'),
+    )
     
 
 class Application(db.Model):
@@ -64,4 +122,19 @@ class Application(db.Model):
     
     # Relationships
     user = relationship("User", back_populates="applications")
-    job = relationship("Job", back_populates="applications")
\ No newline at end of file
+    job = relationship("Job", back_populates="applications")
+
+    __table_args__ = (
+        # Answers "which of these jobs did the user apply to" from the index alone
+        db.Index('ix_applications_user_name_job_id', 'user_name', 'job_id'),
+        # One application per user and job, repeated submissions are ignored
+        db.UniqueConstraint('job_id', 'user_name', name='uq_applications_job_id_user_name'),
+    )
+
+
+class TableVersion(db.Model):
+    """Model which stores a version counter and change time per table, bumped by every write to that table"""
+    __tablename__ = 'table_versions'
+    table_name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
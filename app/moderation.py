@@ -0,0 +1,144 @@
+"""
+This module re-applies the inappropriate word filter to the reviews already stored.
+
+Reviews are read in primary key order, one chunk at a time, and masked by a pool of worker
+processes while the next chunks are being read. Only the reviews whose text changed are written
+back, with one batched update per chunk. After every chunk the id of its last review is saved in a
+checkpoint file, so an interrupted run continues where it stopped instead of starting over.
+
+Key Components:
+- `remoderate_reviews`: Runs a (resumable) re-moderation over every review.
+- `mask_chunk`: The work done by each worker process on one chunk of reviews.
+- `read_checkpoint` / `write_checkpoint`: Keep the progress of a run on disk.
+"""
+import json
+import os
+from collections import deque
+from multiprocessing import Pool
+
+from sqlalchemy import bindparam
+
+from app import db
+from app.cache import bump_versions
+from app.inappropriate_words import ProfanityFilter, badwords
+from app.models import Reviews
+
+DEFAULT_CHUNK_SIZE = 1000
+
+# The filter of a worker process, compiled once by `init_worker`
+worker_filter = None
+
+
+def init_worker(words):
+    """
+    Compiles the word list once in each worker process
+    """
+    global worker_filter  # pylint: disable=global-statement
+    worker_filter = ProfanityFilter(words)
+
+
+def mask_chunk(rows):
+    """
+    Masks a chunk of `(id, review)` rows and returns `(id, original, masked)` for the changed ones
+    """
+    changed = []
+    for review_id, text in rows:
+        masked = worker_filter.mask(text)
+        if masked != text:
+            changed.append((review_id, text, masked))
+    return changed
+
+
+def read_checkpoint(path):
+    """
+    Returns the saved progress of an interrupted run, or a fresh one
+    """
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as checkpoint:
+            return json.load(checkpoint)
+    return {'last_id': 0, 'scanned': 0, 'changed': 0}
+
+
+def write_checkpoint(path, progress):
+    """
+    Saves the progress atomically, so a crash while writing never leaves a broken checkpoint
+    """
+    if not path:
+        return
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as checkpoint:
+        json.dump(progress, checkpoint)
+    os.replace(temporary, path)
+
+
+def review_chunks(last_id, chunk_size):
+    """
+    Yields the `(id, review)` rows following `last_id` in chunks, using the primary key as cursor
+    """
+    while True:
+        rows = (db.session.query(Reviews.id, Reviews.review).filter(Reviews.id > last_id)
+                .order_by(Reviews.id).limit(chunk_size).all())
+        if not rows:
+            return
+        last_id = rows[-1].id
+        yield [tuple(row) for row in rows]
+
+
+def write_changes(changed):
+    """
+    Stores the masked reviews with one batched update, skipping reviews edited in the meantime
+    """
+    if changed:
+        table = Reviews.__table__
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('review_id'))
+            .where(table.c.review == bindparam('original')).values(review=bindparam('masked')),
+            [{'review_id': review_id, 'original': original, 'masked': masked}
+             for review_id, original, masked in changed])
+        bump_versions('reviews')
+    db.session.commit()
+
+
+def remoderate_reviews(chunk_size=DEFAULT_CHUNK_SIZE, workers=None, checkpoint=None, restart=False,
+                       words=None, progress_callback=None):
+    """
+    Masks inappropriate words in every stored review and returns the progress of the run.
+
+    `workers` processes mask the chunks (the number of CPUs by default, 1 runs in this process).
+    With a `checkpoint` path the run resumes from the saved progress unless `restart` is set,
+    and the checkpoint is removed once every review has been scanned.
+    """
+    words = list(badwords() if words is None else words)
+    progress = read_checkpoint(None if restart else checkpoint)
+    workers = workers or os.cpu_count() or 1
+
+    def finish_chunk(rows, changed):
+        write_changes(changed)
+        progress['last_id'] = rows[-1][0]
+        progress['scanned'] += len(rows)
+        progress['changed'] += len(changed)
+        write_checkpoint(checkpoint, progress)
+        if progress_callback:
+            progress_callback(progress)
+
+    chunks = review_chunks(progress['last_id'], chunk_size)
+    if workers == 1:
+        init_worker(words)
+        for rows in chunks:
+            finish_chunk(rows, mask_chunk(rows))
+    else:
+        with Pool(workers, initializer=init_worker, initargs=(words,)) as pool:
+            # Keep a few chunks in flight, results are written in id order so the checkpoint stays exact
+            in_flight = deque()
+            for rows in chunks:
+                in_flight.append((rows, pool.apply_async(mask_chunk, (rows,))))
+                if len(in_flight) >= workers * 2:
+                    rows, result = in_flight.popleft()
+                    finish_chunk(rows, result.get())
+            while in_flight:
+                rows, result = in_flight.popleft()
+                finish_chunk(rows, result.get())
+
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    return progress
@@ -0,0 +1,143 @@
+"""
+This module provides keyset (a.k.a. seek) pagination for the listing pages.
+
+Instead of ``OFFSET``, every page is located by the sort key of the last (or first)
+row of the page the user is coming from. The database can then seek straight into
+the matching index, so fetching page 1000 costs the same as fetching page 1.
+
+Key Components:
+- `Page`: The rows of a single page together with the cursors of its neighbours.
+- `keyset_paginate`: Applies a keyset window to an SQLAlchemy query.
+- `encode_cursor` / `decode_cursor`: Turn a sort key into an opaque, URL-safe token and back.
+- `clamp_per_page`: Keeps user supplied page sizes within bounds.
+- `sort_order`: Reads a whitelisted sort key and direction from the query string.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import DateTime, tuple_
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+
+class Page:
+    """A single page of rows plus the cursors needed to reach the adjacent pages"""
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def clamp_per_page(per_page):
+    """
+    Keeps a user supplied page size within sane bounds
+    """
+    if not per_page or per_page < 1:
+        return DEFAULT_PER_PAGE
+    return min(per_page, MAX_PER_PAGE)
+
+
+def encode_cursor(values):
+    """
+    Encodes the sort key of a row into an opaque, URL-safe cursor
+    """
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_values(cursor, width):
+    """
+    Decodes the raw JSON values of a cursor produced by `encode_cursor`.
+    Returns None when the cursor is malformed or does not hold exactly `width` values.
+    """
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != width:
+        return None
+    return values
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decodes a cursor produced by `encode_cursor`.
+    Returns None when the cursor is malformed or does not match the sort columns.
+    """
+    values = decode_values(cursor, len(columns))
+    if values is None:
+        return None
+    try:
+        return [datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None
+                else value for column, value in zip(columns, values)]
+    except (TypeError, ValueError):
+        return None
+
+
+def sort_order(sorts, default):
+    """
+    Reads the `sort` and `order` query parameters.
+    Returns the sort key, its columns and whether to sort descending, unknown keys fall back to `default`.
+    """
+    sort = request.args.get('sort', default)
+    if sort not in sorts:
+        sort = default
+    return sort, sorts[sort], request.args.get('order', 'desc') != 'asc'
+
+
+def row_key(row, columns):
+    """
+    Returns the sort key of an ORM row for the given columns
+    """
+    return [getattr(row, column.key) for column in columns]
+
+
+def keyset_paginate(query, columns, after=None, before=None, per_page=DEFAULT_PER_PAGE, descending=True):
+    """
+    Returns one `Page` of `query` ordered by `columns`.
+
+    `after` fetches the page following the given cursor, `before` the page preceding it.
+    The last column must be unique (normally the primary key) so that the ordering is total,
+    and the columns must not hold NULLs, which never compare true against a cursor.
+    A malformed cursor is ignored and the first page is returned instead.
+    """
+    per_page = clamp_per_page(per_page)
+    key = tuple_(*columns)
+    forward = [column.desc() if descending else column.asc() for column in columns]
+    backward = [column.asc() if descending else column.desc() for column in columns]
+
+    before_key = decode_cursor(before, columns) if before else None
+    if before_key is not None:
+        bound = tuple_(*before_key)
+        rows = (query.filter(key > bound if descending else key < bound)
+                .order_by(*backward).limit(per_page + 1).all())
+        has_more = len(rows) > per_page
+        rows = list(reversed(rows[:per_page]))
+        prev_cursor = encode_cursor(row_key(rows[0], columns)) if has_more else None
+        next_cursor = encode_cursor(row_key(rows[-1], columns)) if rows else None
+        return Page(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+    after_key = decode_cursor(after, columns) if after else None
+    if after_key is not None:
+        bound = tuple_(*after_key)
+        query = query.filter(key < bound if descending else key > bound)
+    rows = query.order_by(*forward).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(row_key(rows[-1], columns)) if has_more else None
+    prev_cursor = encode_cursor(row_key(rows[0], columns)) if after_key is not None and rows else None
+    return Page(rows, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
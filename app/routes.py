@@ -16,19 +16,41 @@ Key Components:
 
 Routes:
 - Authentication (`/login`, `/logout`, `/signup`)
-- Job-related actions (`/view-jobs`, `/add-job`, `/delete-job/<job_id>`, `/apply-job/<job_id>`)
-- Review actions (`/review`, `/pageContent`, `/delete_review/<review_id>`)
+- Job-related actions (`/view-jobs`, `/search-jobs`, `/add-job`, `/delete-job/<job_id>`, `/apply-job/<job_id>`)
+- Review actions (`/review`, `/pageContent`, `/review-summary`, `/delete_review/<review_id>`)
+- Upvotes (`/upvote/<review_id>`, `/remove_upvote/<review_id>`)
+- Job title autocomplete (`/autocomplete/job-titles`)
 - User management (`/view-users`, `/delete_user/<user_name>`)
+- Bulk CSV import of reviews and jobs (`/import`) and table exports (`/export/<name>`)
 - Static pages (`/about`, `/contact`)
+- The read-only JSON API (`/api/...`) lives in `app.api`
 
 Each route interacts with the database, managing user sessions, and displays specific templates.
 """
-from app.inappropriate_words import badwords
+import codecs
+import os
+from app.inappropriate_words import profanity_filter
 from functools import wraps
-from flask import render_template, request, redirect, url_for, session, flash
+from sqlalchemy import func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, with_expression
+from flask import render_template, request, redirect, url_for, session, flash, jsonify, Response, stream_with_context
 from app import app, db
 from app.email_notification import send_welcome_email, send_new_job_email
-from app.models import Reviews, User, Job, Application,Upvote
+from app.models import Reviews, User, Job, Application, JobTitleSummary
+from app.pagination import keyset_paginate, sort_order, DEFAULT_PER_PAGE
+from app.search import search_reviews, search_jobs
+from app.facets import review_filters, apply_review_filters, facet_counts
+from app.autocomplete import suggest_job_titles
+from app.fuzzy import similar_phrases
+from app.duplicates import band_buckets, shingles, find_duplicate, index_review, forget_review
+from app.aggregates import record_review_added, record_review_removed
+from app.upvotes import add_upvote, remove_upvote, mark_upvoted, apply_pending_upvotes, upvote_buffer
+from app.cache import cached_fragment, conditional, static_page, bump_versions
+from app.dialects import conflict_insert
+from app.streaming import stream_template, batched_rows, STREAM_BATCH_SIZE
+from app.bulk_import import import_csv, int_value, RowError, IMPORT_COLUMNS
+from app.export import export_chunks, EXPORT_TABLES, EXPORT_FORMATS
 
 
 
@@ -60,24 +82,33 @@ def upvote_review(review_id):
     """Allow a user to upvote a review"""
     user_name = session.get('username')
 
-    # Check if the user has already upvoted this review
-    existing_upvote = Upvote.query.filter_by(review_id=review_id, user_name=user_name).first()
-    
-    if existing_upvote:
+    if app.config['UPVOTE_WRITE_BEHIND']:
+        recorded = upvote_buffer.add(review_id, user_name)
+    else:
+        recorded = add_upvote(review_id, user_name)
+
+    if recorded:
+        flash('Upvoted successfully!')
+    elif Reviews.query.get(review_id):
         flash('You have already upvoted this review.')
-        return redirect(url_for('page_content'))
+    else:
+        flash('Review not found.')
+
+    return redirect(url_for('page_content'))
 
-    # Add an upvote entry
-    new_upvote = Upvote(review_id=review_id, user_name=user_name)
-    db.session.add(new_upvote)
 
-    # Increment the review's upvote count
-    review = Reviews.query.get(review_id)
-    if review:
-        review.upvote_count += 1
-        db.session.commit()
-        flash('Upvoted successfully!')
-    
+@app.route('/remove_upvote/<int:review_id>', methods=['POST'])
+@login_required
+def remove_upvote_review(review_id):
+    """Allow a user to take back their upvote on a review"""
+    user_name = session.get('username')
+
+    # An upvote still waiting in the write-behind buffer never reaches the database
+    if upvote_buffer.discard(review_id, user_name) or remove_upvote(review_id, user_name):
+        flash('Upvote removed.')
+    else:
+        flash('You have not upvoted this review.')
+
     return redirect(url_for('page_content'))
 
 @app.route('/login', methods=['GET', 'POST'])  # Route for handling the login page logic
@@ -158,39 +189,121 @@ def review():
     """
     if session.get('type') == 'employer':
         return redirect(url_for('home'))
-    entries = Reviews.query.all()
-    return render_template('review-page.html', entries=entries)
+    return render_template('review-page.html')
+
+
+# Server-side sort keys of the review listing, each backed by a composite index
+REVIEW_SORTS = {
+    'upvotes': (Reviews.upvote_count, Reviews.id),
+    'rating': (Reviews.rating, Reviews.id),
+    'pay': (Reviews.hourly_pay, Reviews.id),
+    'newest': (Reviews.id,),
+}
+
+
+def render_review_page(search_title):
+    """
+    Renders one page of reviews. Without a search the reviews are narrowed down by the facet
+    filters and ordered by the `sort` key (upvotes by default), otherwise they are the full-text
+    matches ranked by relevance, falling back to the closest known job title or location when
+    nothing matches as typed. The page is located through the `after`/`before` cursors.
+    """
+    after = request.args.get('after')
+    before = request.args.get('before')
+    per_page = request.args.get('per_page', DEFAULT_PER_PAGE, type=int)
+    sort, columns, descending = sort_order(REVIEW_SORTS, 'upvotes')
+    order = 'desc' if descending else 'asc'
+    searching = search_title.strip() != ''
+    filters = {} if searching else review_filters(request.args)
+
+    def render_table():
+        search_text, similar = search_title, []
+        if searching:
+            page = search_reviews(search_title, after=after, before=before, per_page=per_page)
+            if not page.items and not (after or before):
+                # Nothing matched as typed, so search for the closest known title or location instead
+                similar = [phrase for phrase, _ in similar_phrases(search_title)]
+                if similar:
+                    search_text = similar[0]
+                    page = search_reviews(search_text, per_page=per_page)
+        else:
+            page = keyset_paginate(apply_review_filters(Reviews.query, filters), columns, after=after,
+                                   before=before, per_page=per_page, descending=descending)
+        mark_upvoted(page.items, session.get('username'))
+        apply_pending_upvotes(page.items)
+        return render_template('review_table.html', entries=page.items, page=page, search=search_text,
+                               sort=sort, order=order, filters=filters, typed_search=search_title, similar=similar)
+
+    # The upvote buttons depend on the user, the delete column on the role
+    variant = (search_title, session.get('type') == 'admin', session.get('username'), upvote_buffer.generation)
+    table = cached_fragment('review_table', ('reviews', 'upvote'), variant, render_table)
+    facets = None if searching else facet_counts(filters)
+    return render_template('page_content.html', table=table, search=search_title, sort=sort, order=order,
+                           filters=filters, facets=facets)
+
+
+def stream_all_reviews():
+    """
+    Streams every review matching the facet filters in the order given by the `sort` key as one page.
+    Rows are read in batches from a server-side cursor while the HTML is being sent.
+    """
+    sort, columns, descending = sort_order(REVIEW_SORTS, 'upvotes')
+    filters = review_filters(request.args)
+    user_name = session.get('username')
+    query = apply_review_filters(Reviews.query, filters).order_by(
+        *[column.desc() if descending else column.asc() for column in columns])
+
+    def entries():
+        for batch in batched_rows(query):
+            mark_upvoted(batch, user_name)
+            apply_pending_upvotes(batch)
+            yield from batch
+
+    return stream_template('page_content.html', entries=entries(), show_all=True, search='',
+                           sort=sort, order='desc' if descending else 'asc',
+                           filters=filters, facets=facet_counts(filters))
+
+
+def upvote_buffer_state():
+    """Identifies the buffered upvotes shown by this worker, they are not covered by the table stamps"""
+    return os.getpid(), upvote_buffer.generation
+
+
+@app.route('/autocomplete/job-titles')
+@login_required
+def job_title_suggestions():
+    """An API which suggests known job titles starting with the typed text `q`"""
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    return jsonify(suggest_job_titles(request.args.get('q', ''), limit))
 
 
 @app.route('/pageContent')
 @login_required
+@conditional('reviews', 'upvote', extra=upvote_buffer_state)
 def page_content():
-    """An API for the user to view all the reviews entered"""
+    """An API for the user to view the reviews entered, one page at a time (or all at once for admins)"""
     if session.get('type') == 'employer':
         return redirect(url_for('home'))
-    entries = Reviews.query.all()
-    return render_template('page_content.html', entries=entries)
+    search_title = request.args.get('search', '')
+    if request.args.get('all') and session.get('type') == 'admin' and not search_title.strip():
+        return stream_all_reviews()
+    return render_review_page(search_title)
 
 
 @app.route('/pageContentPost', methods=['POST'])
 @login_required
 def page_content_post():
-    """An API for the user to view specific reviews depending on the job title"""
+    """An API for the user to search the reviews by job title, description, department, location or text"""
     form = request.form
-    search_title = form.get('search')
-    if search_title.strip() == '':
-        entries = Reviews.query.all()
-    else:
-        entries = Reviews.query.filter_by(job_title=search_title)
-    return render_template('page_content.html', entries=entries)
+    search_title = form.get('search', '')
+    return render_review_page(search_title)
 
 
 @app.route('/home')
 @login_required
 def home():
     """An API for the user to be able to access the homepage through the navbar"""
-    entries = Reviews.query.all()
-    return render_template('index.html', entries=entries)
+    return static_page('index.html')
 
 
 @app.route('/add', methods=['POST'])
@@ -202,44 +315,157 @@ def add():
     description = form.get('job_description')
     department = form.get('department')
     locations = form.get('locations')
-    hourly_pay = form.get('hourly_pay')
     benefits = form.get('benefits')
     review_sample = form.get('review')
-    rating = form.get('rating')
-    recommendation = form.get('recommendation')
-    inappropriate_words_list=badwords()
-    filtered_review = ' '.join(
-    word for word in review_sample.split()
-    if word.lower() not in inappropriate_words_list
-)   
+    # The numbers are summed into the job title summary, they are checked like imported rows
+    try:
+        hourly_pay = int_value(form, 'hourly_pay', low=0)
+        rating = int_value(form, 'rating', 1, 5)
+        recommendation = int_value(form, 'recommendation', 1, 10)
+    except RowError as error:
+        flash(f'The review was not added: {error}.', 'review')
+        return redirect(url_for('review'))
+    filtered_review = profanity_filter().mask(review_sample)
+    # Copy-pasted reviews of the same job are flagged or rejected, depending on the configuration
+    duplicate_action = app.config['DUPLICATE_REVIEW_ACTION']
+    buckets = band_buckets(title, shingles(filtered_review)) if duplicate_action != 'off' else []
+    duplicate_of = find_duplicate(title, filtered_review, buckets) if buckets else None
+    if duplicate_of is not None and duplicate_action == 'reject':
+        flash('This review is nearly identical to an existing review of the same job and was not added.', 'review')
+        return redirect(url_for('review'))
     entry = Reviews(job_title=title, job_description=description,
                     department=department, locations=locations,
                     hourly_pay=hourly_pay, benefits=benefits,
                     review=filtered_review, rating=rating,
-                    recommendation=recommendation)
+                    recommendation=recommendation, duplicate_of=duplicate_of)
     db.session.add(entry) # pylint: disable=no-member
+    db.session.flush() # pylint: disable=no-member
+    record_review_added(entry)
+    index_review(entry.id, buckets)
     db.session.commit() # pylint: disable=no-member
     return redirect('/home')
 
 
+@app.route('/review-summary')
+@login_required
+def review_summary():
+    """
+    An API for users to view the average rating, pay and recommendation of each job title.
+    It only reads the precomputed summary table, never the reviews themselves.
+    """
+    if session.get('type') == 'employer':
+        return redirect(url_for('home'))
+    page = keyset_paginate(JobTitleSummary.query, (JobTitleSummary.job_title, JobTitleSummary.department),
+                           after=request.args.get('after'),
+                           before=request.args.get('before'),
+                           per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+                           descending=False)
+    return render_template('review_summary.html', summaries=page.items, page=page)
+
+
+# Server-side sort keys of the job listing, each backed by a composite index
+JOB_SORTS = {
+    'posted_date': (Job.posted_date, Job.job_id),
+    'pay': (Job.pay_rank, Job.job_id),
+}
+
+
+# Minimum pay choices offered by the job listing
+JOB_PAY_THRESHOLDS = (50000, 75000, 100000)
+# Characters of the description shown on a job card, the full text is on the apply page
+DESCRIPTION_PREVIEW_LENGTH = 300
+
+
+def job_filters(args):
+    """
+    Returns the active job listing filters found in `args`: the `q` search text and the `min_pay` threshold
+    """
+    filters = {}
+    search = args.get('q', '').strip()
+    if search:
+        filters['q'] = search
+    min_pay = args.get('min_pay', type=float)
+    if min_pay is not None:
+        filters['min_pay'] = min_pay
+    return filters
+
+
+def apply_job_filters(query, filters):
+    """
+    Narrows a job query to the jobs whose title or location contains the search text and that pay
+    at least `min_pay`
+    """
+    if 'q' in filters:
+        search = filters['q'].lower()
+        query = query.filter(or_(func.lower(Job.title).contains(search, autoescape=True),
+                                 func.lower(Job.location).contains(search, autoescape=True)))
+    if 'min_pay' in filters:
+        query = query.filter(Job.pay >= filters['min_pay'])
+    return query
+
+
 @app.route('/view-jobs')
 @login_required
+@conditional('jobs', 'applications')
 def view_jobs():
     """
-    An API for users to view jobs.
+    An API for users to view jobs, one page at a time in the order given by the `sort` key.
+    The search text and pay threshold are applied in the query, so only one page of jobs is read.
     """
     if session.get('type') == "applicant" or session.get('type') == "admin":
-        jobs = Job.query.all()
-        applications = Application.query.filter_by(user_name= session.get('username')).all()
-        applied_job_ids_array = list(map(get_job_ids, applications))
-        return render_template('view_jobs.html', jobs=jobs,applications=applications,applied_job_ids_array=applied_job_ids_array)
+        sort, columns, descending = sort_order(JOB_SORTS, 'posted_date')
+        filters = job_filters(request.args)
+
+        def render_cards():
+            query = apply_job_filters(Job.query, filters).options(
+                defer(Job.description),
+                with_expression(Job.description_preview,
+                                func.substr(Job.description, 1, DESCRIPTION_PREVIEW_LENGTH + 1)))
+            page = keyset_paginate(query, columns,
+                                   after=request.args.get('after'),
+                                   before=request.args.get('before'),
+                                   per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int),
+                                   descending=descending)
+            # Admins never get an apply button, only applicants need their applied flags
+            applied_job_ids = (applied_job_ids_of(session.get('username'), [job.job_id for job in page.items])
+                               if session.get('type') == 'applicant' else set())
+            return render_template('job_cards.html', jobs=page.items, page=page, sort=sort,
+                                   order='desc' if descending else 'asc', filters=filters,
+                                   preview_length=DESCRIPTION_PREVIEW_LENGTH, applied_job_ids=applied_job_ids)
+
+        # Admins all see the same cards, applicants see their own applied flags
+        variant = ('admin',) if session.get('type') == 'admin' else ('applicant', session.get('username'))
+        cards = cached_fragment('job_cards', ('jobs', 'applications'), variant, render_cards)
+        return render_template('view_jobs.html', cards=cards, sort=sort, filters=filters,
+                               pay_thresholds=JOB_PAY_THRESHOLDS)
     return redirect(url_for('home'))
 
-def get_job_ids(application):
+def applied_job_ids_of(user_name, job_ids):
+    """
+    Returns the set of the given job ids the user applied to.
+    Only the job ids are read, straight from the (user_name, job_id) index.
+    """
+    if not user_name or not job_ids:
+        return set()
+    return {job_id for job_id, in db.session.query(Application.job_id)
+            .filter(Application.user_name == user_name, Application.job_id.in_(job_ids))}
+
+@app.route('/search-jobs')
+@login_required
+def search_jobs_page():
     """
-    This function is used to get all the job ids in the application table.
+    An API for users to search job postings, descriptions included, with the best matches first.
+    Each result shows a snippet of the description around the matched words.
     """
-    return application.job_id
+    if session.get('type') not in ('applicant', 'admin'):
+        return redirect(url_for('home'))
+    search_text = request.args.get('q', '').strip()
+    page = search_jobs(search_text, after=request.args.get('after'), before=request.args.get('before'),
+                       per_page=request.args.get('per_page', DEFAULT_PER_PAGE, type=int))
+    applied_job_ids = (applied_job_ids_of(session.get('username'), [hit.job.job_id for hit in page.items])
+                       if session.get('type') == 'applicant' else set())
+    return render_template('search_jobs.html', page=page, search_text=search_text, applied_job_ids=applied_job_ids)
+
 
 @app.route('/add-job', methods=['GET', 'POST'])
 @login_required
@@ -318,21 +544,44 @@ def apply_job(job_id):
 @app.route('/apply/<int:job_id>', methods=['POST'])
 @login_required
 def apply(job_id):
-    """An API for users to apply for a job."""
-    # Get the username from the session
-    user_name = session.get('username')
+    """
+    An API for users to apply for a job. Applying again (a double click or a retried request)
+    leaves the existing application untouched.
+    """
+    if record_application(job_id, session.get('username')):
+        flash("Application submitted successfully!")
+    else:
+        flash("You have already applied for this job.")
+    return redirect(url_for('view_jobs'))  # Redirect to the job listing page
 
-    # Create a new application entry
-    new_application = Application(job_id=job_id, user_name=user_name)
-    db.session.add(new_application) # pylint: disable=no-member
-    db.session.commit() # pylint: disable=no-member
 
-    flash("Application submitted successfully!")
-    return redirect(url_for('view_jobs'))  # Redirect to the job listing page
+def record_application(job_id, user_name):
+    """
+    Stores an application unless the user already applied for the job, returns whether it was new.
+    A single INSERT ... ON CONFLICT DO NOTHING, so concurrent retries cannot create duplicates.
+    """
+    table = Application.__table__
+    values = {'job_id': job_id, 'user_name': user_name}
+    statement = conflict_insert(table)
+    if statement is not None:
+        inserted = db.session.execute(statement.values(**values).on_conflict_do_nothing(
+            index_elements=[table.c.job_id, table.c.user_name])).rowcount == 1
+    else:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(**values))
+            inserted = True
+        except IntegrityError:
+            inserted = False
+    if inserted:
+        bump_versions('applications')
+    db.session.commit() # pylint: disable=no-member
+    return inserted
 
 
 @app.route('/view-applicants')
 @login_required
+@conditional('jobs', 'applications')
 def view_applicants():
     """
     This function displays all the applications
@@ -363,6 +612,8 @@ def delete_review(review_id):
     if session.get('type') == 'admin':  # Check if the user is an admin
         review_rows = Reviews.query.get(review_id)
         if review_rows:
+            record_review_removed(review_rows)
+            forget_review(review_id)
             db.session.delete(review_rows) # pylint: disable=no-member
             db.session.commit() # pylint: disable=no-member
             flash('Review deleted successfully.', 'success')
@@ -381,8 +632,9 @@ def view_users():
     if session.get('type') != 'admin':
         return redirect(url_for('home'))
 
-    users = User.query.all()
-    return render_template('view_users.html', users=users)
+    # Streamed, so the page starts rendering before every user has been read
+    users = User.query.order_by(User.user_name).yield_per(STREAM_BATCH_SIZE)
+    return stream_template('view_users.html', users=users)
 
 @app.route('/delete_user/<string:user_name>', methods=['POST'])
 def delete_user(user_name):
@@ -401,16 +653,54 @@ def delete_user(user_name):
 
     return redirect(url_for('view_users'))
 
+
+@app.route('/import', methods=['GET', 'POST'])
+def bulk_import():
+    """
+    An API for admins to upload a CSV file of reviews or jobs. The upload is read as a stream and
+    inserted in batches, rows that fail validation are listed instead of failing the whole file.
+    """
+    if session.get('type') != 'admin':
+        return redirect(url_for('home'))
+    if request.method == 'GET':
+        return render_template('import.html', kinds=IMPORT_COLUMNS, exports=EXPORT_TABLES, formats=EXPORT_FORMATS)
+    upload = request.files.get('file')
+    kind = request.form.get('kind')
+    if not upload or not upload.filename or kind not in IMPORT_COLUMNS:
+        flash('Choose what to import and a CSV file.')
+        return render_template('import.html', kinds=IMPORT_COLUMNS, exports=EXPORT_TABLES,
+                               formats=EXPORT_FORMATS), 400
+    # Decoded line by line, the spooled upload file is not an io object TextIOWrapper accepts on every Python.
+    # Bytes that are not UTF-8 are replaced so their rows are rejected instead of ending the import halfway.
+    report = import_csv(codecs.iterdecode(upload.stream, 'utf-8-sig', errors='replace'), kind,
+                        employer_id=request.form.get('employer_id', '').strip() or None)
+    return render_template('import.html', kinds=IMPORT_COLUMNS, exports=EXPORT_TABLES, formats=EXPORT_FORMATS,
+                           report=report)
+
+
+@app.route('/export/<string:name>')
+def export_data(name):
+    """
+    An API for admins to download a whole table as CSV (or Parquet/Arrow when pyarrow is installed).
+    The file is streamed batch by batch while the rows are read.
+    """
+    if session.get('type') != 'admin':
+        return redirect(url_for('home'))
+    fmt = request.args.get('format', 'csv')
+    if name not in EXPORT_TABLES or fmt not in EXPORT_FORMATS:
+        return f"Unknown export, choose one of {', '.join(EXPORT_TABLES)} as {', '.join(EXPORT_FORMATS)}", 404
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    return Response(stream_with_context(export_chunks(name, fmt)), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={name}.{extension}'})
+
 @app.route('/about')
 @login_required
 def about_us():
     """An API for the user to be able to access the About Us through the navbar"""
-    entries = Reviews.query.all()
-    return render_template('about.html', entries=entries)
+    return static_page('about.html')
 
 @app.route('/contact')
 @login_required
 def contact_us():
     """An API for the user to be able to access the Contact Us through the navbar"""
-    entries = Reviews.query.all()
-    return render_template('contact.html', entries=entries)
+    return static_page('contact.html')
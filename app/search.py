@@ -0,0 +1,201 @@
+"""
+This module provides SQLite FTS5 full-text search over the reviews and the job postings.
+
+The `reviews_fts` and `jobs_fts` virtual tables are external-content indexes over `reviews` and
+`jobs`, so the text itself is stored only once. Triggers on the content tables keep the indexes in
+sync on every insert, update and delete (posting or deleting a job included), and they are created
+together with the tables by `db.create_all()`. Existing databases get the same objects through the
+Alembic migrations.
+
+Key Components:
+- `register_fts_table`: Attaches an FTS5 index and its sync triggers to a model's table.
+- `fts_match_query`: Turns free text typed by a user into a safe FTS5 query.
+- `ranked_page`: Fetches one bm25-ranked page of matching row ids using keyset cursors.
+- `search_reviews`: Returns one `Page` of reviews matching a free-text search.
+- `search_jobs`: Returns one `Page` of job postings matching a free-text search, with highlighted snippets.
+"""
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import DDL, bindparam, event, or_, text
+from sqlalchemy.orm import defer
+
+from app import db
+from app.models import Reviews, Job
+from app.pagination import Page, DEFAULT_PER_PAGE, clamp_per_page, decode_values, encode_cursor, keyset_paginate
+
+REVIEW_FTS_TABLE = 'reviews_fts'
+REVIEW_FTS_COLUMNS = ('job_title', 'job_description', 'department', 'locations', 'review')
+# bm25 weights in the order of REVIEW_FTS_COLUMNS, a hit in the job title counts the most
+REVIEW_FTS_WEIGHTS = (10.0, 2.0, 4.0, 4.0, 1.0)
+
+JOB_FTS_TABLE = 'jobs_fts'
+JOB_FTS_COLUMNS = ('title', 'description', 'location')
+JOB_FTS_WEIGHTS = (10.0, 1.0, 4.0)
+# Words of description around the matches shown in a job search result
+JOB_SNIPPET_WORDS = 24
+# Control characters marking the matches inside FTS5 snippets, replaced by <mark> after escaping
+MATCH_START, MATCH_END = '\x02', '\x03'
+
+
+def fts_table_ddl(fts_table, content_table, content_rowid, columns):
+    """
+    Returns the statements that create an external-content FTS5 table and its sync triggers
+    """
+    cols = ', '.join(columns)
+    new_values = ', '.join(f'new.{column}' for column in columns)
+    old_values = ', '.join(f'old.{column}' for column in columns)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5({cols}, content='{content_table}', "
+        f"content_rowid='{content_rowid}', tokenize='porter unicode61')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.{content_rowid}, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.{content_rowid}, {old_values}); END",
+        # Only the indexed columns re-index a row, so upvotes do not touch the full-text index
+        f"CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {cols} ON {content_table} BEGIN "
+        f"INSERT INTO {fts_table}({fts_table}, rowid, {cols}) VALUES ('delete', old.{content_rowid}, {old_values}); "
+        f"INSERT INTO {fts_table}(rowid, {cols}) VALUES (new.{content_rowid}, {new_values}); END",
+    ]
+
+
+def register_fts_table(table, fts_table, content_rowid, columns):
+    """
+    Creates the FTS5 index and its triggers whenever `table` is created, and drops it with the table
+    """
+    for statement in fts_table_ddl(fts_table, table.name, content_rowid, columns):
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {fts_table}').execute_if(dialect='sqlite'))
+
+
+register_fts_table(Reviews.__table__, REVIEW_FTS_TABLE, 'id', REVIEW_FTS_COLUMNS)
+register_fts_table(Job.__table__, JOB_FTS_TABLE, 'job_id', JOB_FTS_COLUMNS)
+
+
+def fts_match_query(search_text):
+    """
+    Turns free text into an FTS5 query in which every word has to match as a prefix.
+    Quoting each word keeps FTS5 operators typed by the user from being interpreted.
+    """
+    tokens = re.findall(r'\w+', (search_text or '').lower())
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def ranked_page(fts_table, weights, match, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Returns one `Page` of `(rowid, score)` hits ordered by bm25 score (best first).
+    The cursors carry the `(score, rowid)` of the boundary hit, so deep pages stay cheap.
+    """
+    per_page = clamp_per_page(per_page)
+    rank = f"bm25({fts_table}, {', '.join(str(weight) for weight in weights)})"
+    params = {'match': match, 'limit': per_page + 1}
+
+    before_key = decode_values(before, 2) if before else None
+    after_key = decode_values(after, 2) if after and before_key is None else None
+    condition, direction = '', 'ASC'
+    if before_key is not None:
+        condition, direction = f'AND ({rank}, rowid) < (:score, :rowid)', 'DESC'
+        params['score'], params['rowid'] = before_key
+    elif after_key is not None:
+        condition = f'AND ({rank}, rowid) > (:score, :rowid)'
+        params['score'], params['rowid'] = after_key
+
+    hits = db.session.execute(text(
+        f'SELECT rowid, {rank} AS score FROM {fts_table} WHERE {fts_table} MATCH :match {condition} '
+        f'ORDER BY score {direction}, rowid {direction} LIMIT :limit'), params).fetchall()
+    has_more = len(hits) > per_page
+    hits = [(hit.rowid, hit.score) for hit in hits[:per_page]]
+
+    if before_key is not None:
+        hits.reverse()
+        prev_cursor = encode_cursor(hits[0][::-1]) if has_more else None
+        next_cursor = encode_cursor(hits[-1][::-1]) if hits else None
+    else:
+        next_cursor = encode_cursor(hits[-1][::-1]) if has_more else None
+        prev_cursor = encode_cursor(hits[0][::-1]) if after_key is not None and hits else None
+    return Page(hits, per_page, next_cursor=next_cursor, prev_cursor=prev_cursor)
+
+
+def search_reviews(search_text, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Returns one `Page` of reviews matching `search_text`, best matches first.
+    Databases other than SQLite fall back to a case-insensitive substring match.
+    """
+    match = fts_match_query(search_text)
+    if not match:
+        return Page([], clamp_per_page(per_page))
+
+    if db.engine.dialect.name != 'sqlite':
+        columns = [getattr(Reviews, column) for column in REVIEW_FTS_COLUMNS]
+        query = Reviews.query
+        for token in re.findall(r'\w+', search_text):
+            query = query.filter(or_(*[column.ilike(f'%{token}%') for column in columns]))
+        return keyset_paginate(query, (Reviews.id,), after=after, before=before, per_page=per_page)
+
+    page = ranked_page(REVIEW_FTS_TABLE, REVIEW_FTS_WEIGHTS, match, after=after, before=before, per_page=per_page)
+    ids = [rowid for rowid, _ in page.items]
+    reviews = {review.id: review for review in Reviews.query.filter(Reviews.id.in_(ids))} if ids else {}
+    page.items = [reviews[review_id] for review_id in ids if review_id in reviews]
+    return page
+
+
+class JobHit:
+    """A job matching a search, with its bm25 score and the highlighted title and description snippet"""
+
+    def __init__(self, job, score, title, snippet):
+        self.job = job
+        self.score = score
+        self.title = title
+        self.snippet = snippet
+
+
+def highlight(marked_text):
+    """
+    Escapes text returned by FTS5 `highlight`/`snippet` and turns the match markers into <mark> tags
+    """
+    html = []
+    for part in re.split(f'({MATCH_START}|{MATCH_END})', marked_text or ''):
+        if part == MATCH_START:
+            html.append('<mark>')
+        elif part == MATCH_END:
+            html.append('</mark>')
+        else:
+            html.append(str(escape(part)))
+    return Markup(''.join(html))
+
+
+def search_jobs(search_text, after=None, before=None, per_page=DEFAULT_PER_PAGE):
+    """
+    Returns one `Page` of `JobHit`s for the jobs matching `search_text`, best matches first.
+    Only the postings on the page are loaded, and their descriptions are reduced to snippets around
+    the matches. Databases other than SQLite fall back to an unranked substring match.
+    """
+    match = fts_match_query(search_text)
+    if not match:
+        return Page([], clamp_per_page(per_page))
+
+    if db.engine.dialect.name != 'sqlite':
+        columns = [getattr(Job, column) for column in JOB_FTS_COLUMNS]
+        query = Job.query
+        for token in re.findall(r'\w+', search_text):
+            query = query.filter(or_(*[column.ilike(f'%{token}%') for column in columns]))
+        page = keyset_paginate(query, (Job.job_id,), after=after, before=before, per_page=per_page)
+        page.items = [JobHit(job, None, highlight(job.title), highlight(job.description[:JOB_SNIPPET_WORDS * 8]))
+                      for job in page.items]
+        return page
+
+    page = ranked_page(JOB_FTS_TABLE, JOB_FTS_WEIGHTS, match, after=after, before=before, per_page=per_page)
+    ids = [rowid for rowid, _ in page.items]
+    if not ids:
+        return page
+    marked = {row.rowid: row for row in db.session.execute(text(
+        f"SELECT rowid, highlight({JOB_FTS_TABLE}, 0, :start, :end) AS title, "
+        f"snippet({JOB_FTS_TABLE}, 1, :start, :end, '…', {JOB_SNIPPET_WORDS}) AS snippet "
+        f"FROM {JOB_FTS_TABLE} WHERE {JOB_FTS_TABLE} MATCH :match AND rowid IN :ids"
+    ).bindparams(bindparam('ids', expanding=True)),
+        {'start': MATCH_START, 'end': MATCH_END, 'match': match, 'ids': ids})}
+    # The snippets stand in for the descriptions, which are not loaded
+    jobs = {job.job_id: job for job in Job.query.options(defer(Job.description)).filter(Job.job_id.in_(ids))}
+    page.items = [JobHit(jobs[job_id], score, highlight(marked[job_id].title), highlight(marked[job_id].snippet))
+                  for job_id, score in page.items if job_id in jobs and job_id in marked]
+    return page
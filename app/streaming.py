@@ -0,0 +1,39 @@
+"""
+This module provides streamed HTML rendering for pages that can list every row of a table.
+
+`render_template` builds the whole page as one string before the first byte is sent, so its
+cost in time and memory grows with the number of rows. `stream_template` hands the template's
+`generate()` iterator to the response instead, and `batched_rows` feeds the template from a
+server-side cursor, so the first byte goes out right away and only one batch of rows is held.
+
+Key Components:
+- `stream_template`: Streams a template, the streaming counterpart of `render_template`.
+- `batched_rows`: Iterates over a query in batches of rows fetched with `yield_per`.
+- `STREAM_BATCH_SIZE`: The number of rows fetched from the database per batch.
+"""
+from flask import Response, current_app, stream_with_context
+
+STREAM_BATCH_SIZE = 500
+
+
+def stream_template(template_name, **context):
+    """
+    Renders a template into a streamed response, chunk by chunk as the template produces output
+    """
+    current_app.update_template_context(context)
+    template = current_app.jinja_env.get_template(template_name)
+    return Response(stream_with_context(template.generate(context)))
+
+
+def batched_rows(query, size=STREAM_BATCH_SIZE):
+    """
+    Yields the rows of `query` in lists of at most `size` rows, read through a server-side cursor
+    """
+    batch = []
+    for row in query.yield_per(size):
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
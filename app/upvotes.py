@@ -0,0 +1,318 @@
+"""
+This module contains the upvote logic shared by the review routes.
+
+Upvotes are written with a conflict-ignoring insert followed by an in-database
+`upvote_count = upvote_count + 1`, both in one transaction. Concurrent clicks therefore
+can neither double count nor trip the `_review_user_uc` unique constraint.
+
+With `UPVOTE_WRITE_BEHIND` enabled, upvotes are instead collected in the per-process
+`upvote_buffer` and group-committed on a timer or once `UPVOTE_FLUSH_SIZE` upvotes are
+pending, so a burst of clicks on a popular review takes SQLite's write lock once per flush.
+
+Key Components:
+- `add_upvote` / `remove_upvote`: Atomically record or withdraw a user's upvote.
+- `UpvoteBuffer`: Sharded in-memory buffer of upvotes with a periodic write-behind flush.
+- `apply_pending_upvotes`: Makes buffered upvotes visible on the rows about to be rendered.
+- `upvoted_review_ids`: Resolves which of a set of reviews a user has upvoted with a single query.
+- `mark_upvoted`: Sets `has_upvoted` on every review of a page for the templates.
+"""
+import atexit
+import threading
+
+from flask import has_app_context
+from sqlalchemy import and_, bindparam, exists, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app import app, db
+from app.cache import bump_versions
+from app.dialects import conflict_insert
+from app.models import Reviews, Upvote
+
+
+def adjust_upvote_count(review_id, delta):
+    """
+    Adds `delta` to the stored upvote count of a review without reading it first
+    """
+    Reviews.query.filter(Reviews.id == review_id).update(
+        {Reviews.upvote_count: func.coalesce(Reviews.upvote_count, 0) + delta}, synchronize_session=False)
+
+
+def add_upvote(review_id, user_name):
+    """
+    Records an upvote and increments the review's count in a single transaction.
+    Returns False, without changing anything, when the upvote already exists or the review does not.
+    """
+    # Only insert when the review exists, SQLite does not enforce the foreign key
+    rows = select(literal(review_id), literal(user_name)).where(exists().where(Reviews.id == review_id))
+    statement = conflict_insert(Upvote.__table__)
+    try:
+        if statement is not None:
+            result = db.session.execute(
+                statement.from_select(['review_id', 'user_name'], rows).on_conflict_do_nothing())
+        else:
+            result = db.session.execute(insert(Upvote.__table__).from_select(['review_id', 'user_name'], rows))
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    if result.rowcount != 1:
+        db.session.rollback()
+        return False
+    adjust_upvote_count(review_id, 1)
+    bump_versions('reviews', 'upvote')
+    db.session.commit()
+    return True
+
+
+def remove_upvote(review_id, user_name):
+    """
+    Withdraws an upvote and decrements the review's count in a single transaction.
+    Returns False when the user had not upvoted the review.
+    """
+    deleted = Upvote.query.filter_by(review_id=review_id, user_name=user_name).delete(synchronize_session=False)
+    if not deleted:
+        db.session.rollback()
+        return False
+    adjust_upvote_count(review_id, -1)
+    bump_versions('reviews', 'upvote')
+    db.session.commit()
+    return True
+
+
+class UpvoteShard:
+    """One lock-protected slice of the buffer, holding pending upvotes as review id -> user names"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.flushing = {}
+
+
+class UpvoteBuffer:
+    """
+    Per-process write-behind buffer for upvotes.
+
+    Reviews are spread over several shards so that requests upvoting different reviews do not
+    contend for one lock. Pending upvotes are deduplicated against the `Upvote` table when they
+    are recorded and written with a single transaction per flush. `size` and `generation` are
+    shared by all shards and kept under their own lock, so no change is lost between shards.
+    """
+
+    def __init__(self, shard_count=16):
+        self.shards = [UpvoteShard() for _ in range(shard_count)]
+        self.flush_lock = threading.Lock()
+        self.counter_lock = threading.Lock()
+        self.size = 0
+        # Changes whenever the buffered state does, so cached pages showing it can be told apart
+        self.generation = 0
+        self.stopped = threading.Event()
+        self.timer = None
+
+    def changed(self, size_delta=0):
+        """Adjusts the number of pending upvotes and starts a new generation of the buffered state"""
+        with self.counter_lock:
+            self.size += size_delta
+            self.generation += 1
+
+    def shard(self, review_id):
+        """Returns the shard responsible for a review"""
+        return self.shards[review_id % len(self.shards)]
+
+    def add(self, review_id, user_name):
+        """
+        Buffers an upvote. Returns False when the review does not exist or the user
+        already upvoted it, either in the database or in the buffer.
+        """
+        row = db.session.query(Reviews.id, Upvote.id).outerjoin(
+            Upvote, and_(Upvote.review_id == Reviews.id, Upvote.user_name == user_name)
+        ).filter(Reviews.id == review_id).first()
+        if row is None or row[1] is not None:
+            return False
+        shard = self.shard(review_id)
+        with shard.lock:
+            if user_name in shard.pending.get(review_id, ()) or user_name in shard.flushing.get(review_id, ()):
+                return False
+            shard.pending.setdefault(review_id, set()).add(user_name)
+        self.changed(1)
+        self.start()
+        if self.size >= app.config['UPVOTE_FLUSH_SIZE']:
+            self.flush()
+        return True
+
+    def discard(self, review_id, user_name):
+        """
+        Drops a buffered, not yet flushed upvote. Returns True if there was one.
+        An upvote that is being flushed is waited for; it is in the database afterwards (returning
+        False, so the caller withdraws it there) or back among the pending ones if the flush failed.
+        """
+        shard = self.shard(review_id)
+        with shard.lock:
+            if self.drop_pending(shard, review_id, user_name):
+                return True
+            if user_name not in shard.flushing.get(review_id, ()):
+                return False
+        with self.flush_lock:
+            with shard.lock:
+                return self.drop_pending(shard, review_id, user_name)
+
+    def drop_pending(self, shard, review_id, user_name):
+        """Removes a pending upvote from a shard whose lock the caller holds, returns True if there was one"""
+        users = shard.pending.get(review_id)
+        if not users or user_name not in users:
+            return False
+        users.discard(user_name)
+        if not users:
+            del shard.pending[review_id]
+        self.changed(-1)
+        return True
+
+    def pending_count(self, review_id):
+        """Number of buffered upvotes of a review that are not in the database yet"""
+        shard = self.shard(review_id)
+        with shard.lock:
+            return len(shard.pending.get(review_id, ())) + len(shard.flushing.get(review_id, ()))
+
+    def pending_for_user(self, user_name, review_ids):
+        """The reviews among `review_ids` that have a buffered upvote by `user_name`"""
+        upvoted = set()
+        for review_id in review_ids:
+            shard = self.shard(review_id)
+            with shard.lock:
+                if user_name in shard.pending.get(review_id, ()) or user_name in shard.flushing.get(review_id, ()):
+                    upvoted.add(review_id)
+        return upvoted
+
+    def flush(self):
+        """
+        Writes all buffered upvotes in one transaction and returns the number of upvotes stored.
+        Upvotes that turn out to be duplicates, or whose review was deleted meanwhile, are dropped.
+        """
+        with self.flush_lock:
+            taken = 0
+            for shard in self.shards:
+                with shard.lock:
+                    shard.flushing, shard.pending = shard.pending, {}
+                    taken += sum(len(users) for users in shard.flushing.values())
+            with self.counter_lock:
+                self.size -= taken
+            batch = {}
+            for shard in self.shards:
+                batch.update(shard.flushing)
+            if not batch:
+                return 0
+            try:
+                if has_app_context():
+                    stored = self.write(batch)
+                else:
+                    with app.app_context():
+                        stored = self.write(batch)
+            except SQLAlchemyError:
+                # Keep the upvotes for the next attempt
+                for shard in self.shards:
+                    with shard.lock:
+                        for review_id, users in shard.flushing.items():
+                            shard.pending.setdefault(review_id, set()).update(users)
+                        shard.flushing = {}
+                self.changed(taken)
+                raise
+            for shard in self.shards:
+                with shard.lock:
+                    shard.flushing = {}
+            self.changed()
+            return stored
+
+    @staticmethod
+    def write(batch):
+        """Group-commits a batch of review id -> user names to `Upvote` and `Reviews.upvote_count`"""
+        rows = select(bindparam('review_id'), bindparam('user_name')).where(
+            exists().where(Reviews.id == bindparam('review_id')))
+        statement = conflict_insert(Upvote.__table__)
+        if statement is not None:
+            statement = statement.from_select(['review_id', 'user_name'], rows).on_conflict_do_nothing()
+        else:
+            statement = insert(Upvote.__table__).prefix_with('IGNORE', dialect='mysql').from_select(
+                ['review_id', 'user_name'], rows)
+        increments = []
+        try:
+            for review_id, users in batch.items():
+                result = db.session.execute(statement, [{'review_id': review_id, 'user_name': user_name}
+                                                        for user_name in users])
+                if result.rowcount > 0:
+                    increments.append({'target': review_id, 'delta': result.rowcount})
+            if increments:
+                reviews = Reviews.__table__
+                db.session.execute(reviews.update().where(reviews.c.id == bindparam('target')).values(
+                    upvote_count=func.coalesce(reviews.c.upvote_count, 0) + bindparam('delta')), increments)
+                bump_versions('reviews', 'upvote')
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+        return sum(increment['delta'] for increment in increments)
+
+    def start(self):
+        """Starts the background flush timer on first use"""
+        if self.timer is not None:
+            return
+        with self.flush_lock:
+            if self.timer is not None:
+                return
+            self.stopped.clear()
+            self.timer = threading.Thread(target=self.run, args=(app.config['UPVOTE_FLUSH_INTERVAL'],),
+                                          name='upvote-flush', daemon=True)
+            self.timer.start()
+
+    def run(self, interval):
+        """Body of the flush timer thread"""
+        while not self.stopped.wait(interval):
+            try:
+                self.flush()
+            except SQLAlchemyError:
+                app.logger.exception('Flushing buffered upvotes failed, retrying on the next tick')
+
+    def shutdown(self):
+        """Stops the flush timer and writes out whatever is still buffered"""
+        self.stopped.set()
+        if self.timer is not None:
+            self.timer.join()
+            self.timer = None
+        return self.flush()
+
+
+upvote_buffer = UpvoteBuffer()
+# Nothing buffered may be lost when a worker exits
+atexit.register(upvote_buffer.shutdown)
+
+
+def upvoted_review_ids(user_name, review_ids):
+    """
+    Returns the subset of `review_ids` that `user_name` has upvoted.
+    The lookup is a single query served by the `_review_user_uc` unique index.
+    """
+    if not user_name or not review_ids:
+        return set()
+    rows = db.session.query(Upvote.review_id).filter(Upvote.user_name == user_name,
+                                                     Upvote.review_id.in_(review_ids))
+    return {review_id for (review_id,) in rows} | upvote_buffer.pending_for_user(user_name, review_ids)
+
+
+def apply_pending_upvotes(reviews):
+    """
+    Adds the buffered upvotes to the counts shown for each review.
+    The value is set as if loaded from the database, so it is never written back.
+    """
+    for review in reviews:
+        pending = upvote_buffer.pending_count(review.id)
+        if pending:
+            set_committed_value(review, 'upvote_count', (review.upvote_count or 0) + pending)
+    return reviews
+
+
+def mark_upvoted(reviews, user_name):
+    """
+    Sets `has_upvoted` on each review so the template never has to query per row
+    """
+    upvoted = upvoted_review_ids(user_name, [review.id for review in reviews])
+    for review in reviews:
+        review.has_upvoted = review.id in upvoted
+    return reviews
@@ -0,0 +1,61 @@
+"""
+Benchmark of the inappropriate word filter against the list scan it replaced.
+
+Times filtering long reviews with the default word list and with a large synthetic one.
+Run from the repository root:
+
+    python benchmarks/profanity_filter.py [review_words] [list_size]
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.append(os.getcwd())
+from app.inappropriate_words import ProfanityFilter, badwords  # pylint: disable=wrong-import-position
+
+TEXT_WORDS = ['the', 'shift', 'manager', 'was', 'helpful', 'and', 'pay', 'is', 'fair,', 'but', 'weekends',
+              'get', 'busy!', 'Great', 'team.', 'damn', 'hours', 'flexible', 'library', 'students']
+
+
+def list_scan(review, words):
+    """The original filter: a list membership test for every word, dropping the matches"""
+    return ' '.join(word for word in review.split() if word.lower() not in words)
+
+
+def make_word_list(size, rng):
+    """Returns the default list padded with random words up to `size` entries"""
+    words = list(badwords())
+    while len(words) < size:
+        words.append(''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 9))))
+    return words
+
+
+def timed(function, *args, repeat=5):
+    """Returns the best wall time of `repeat` calls in milliseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main(review_words, list_size):
+    """Compares the compiled filter with the list scan"""
+    rng = random.Random(42)
+    review = ' '.join(rng.choice(TEXT_WORDS) for _ in range(review_words))
+    for words in (badwords(), make_word_list(list_size, rng)):
+        start = time.perf_counter()
+        engine = ProfanityFilter(words)
+        build = (time.perf_counter() - start) * 1000
+        print(f'{len(words)} listed words, review of {review_words} words')
+        print(f'  compile:   {build:9.2f} ms (once per word list version)')
+        print(f'  list scan: {timed(list_scan, review, words):9.2f} ms')
+        print(f'  filter:    {timed(engine.mask, review):9.2f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 10000)
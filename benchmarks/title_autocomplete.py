@@ -0,0 +1,44 @@
+"""
+Benchmark of the job title autocomplete index.
+
+Builds a `TitleIndex` of synthetic job titles (100k by default) and reports the build time and the
+latency of prefix lookups, which should stay well under a millisecond whatever the number of titles.
+Run from the repository root:
+
+    python benchmarks/title_autocomplete.py [number_of_titles]
+"""
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+from app.autocomplete import TitleIndex  # pylint: disable=wrong-import-position
+
+LOOKUPS = 1000
+
+
+def main(count):
+    """Times prefix lookups in an index of `count` titles"""
+    index = TitleIndex()
+    start = time.perf_counter()
+    index.load((f'Job Title {i:06d}', 1) for i in range(count))
+    build = time.perf_counter() - start
+
+    latencies = []
+    for i in range(LOOKUPS):
+        start = time.perf_counter()
+        suggestions = index.suggest(f'job title {i % 1000:04d}', limit=10)
+        latencies.append((time.perf_counter() - start) * 1000)
+        assert suggestions, f'no suggestions for job title {i % 1000:04d}'
+    latencies.sort()
+
+    print(f'titles indexed: {len(index.keys)}')
+    print(f'build time:     {build:.2f} s')
+    print(f'lookup p50:     {statistics.median(latencies):.3f} ms')
+    print(f'lookup p95:     {latencies[int(len(latencies) * 0.95)]:.3f} ms')
+    print(f'lookup max:     {latencies[-1]:.3f} ms')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
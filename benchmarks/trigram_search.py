@@ -0,0 +1,106 @@
+"""
+Benchmark of the typo-tolerant trigram search over job titles.
+
+Builds a `TrigramIndex` of synthetic job titles (100k by default) and reports the latency of
+lookups with a typo in them: misspelled full titles, which contain a rare word, and misspelled
+common roles such as "teachng assistant", whose words appear in thousands of titles.
+Run from the repository root:
+
+    python benchmarks/trigram_search.py [number_of_titles]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.getcwd())
+from app.fuzzy import TrigramIndex  # pylint: disable=wrong-import-position
+
+ROLES = ['Teaching Assistant', 'Research Assistant', 'Library Assistant', 'Barista', 'Lifeguard',
+         'Lab Technician', 'Tutor', 'Grader', 'Desk Attendant', 'Web Developer', 'Photographer',
+         'Event Staff', 'Mail Clerk', 'Peer Mentor', 'Tour Guide', 'IT Support Specialist']
+SYLLABLES = ['ba', 'ko', 'ri', 'ten', 'mal', 'so', 'vin', 'dra', 'le', 'gu', 'par', 'ne', 'zo', 'qui',
+             'st', 'or', 'an', 'ly', 'chem', 'bio', 'geo', 'phy', 'ent', 'ics']
+
+
+def make_words(count, rng):
+    """Returns `count` distinct pronounceable made-up words, standing in for departments and places"""
+    words = set()
+    while len(words) < count:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize())
+    return sorted(words)
+
+
+def make_titles(count, seed=42):
+    """Returns `count` distinct synthetic job titles such as "Lab Technician Koridra Vinle" """
+    rng = random.Random(seed)
+    words = make_words(20000, rng)
+    titles = set()
+    while len(titles) < count:
+        titles.add(f'{rng.choice(ROLES)} {rng.choice(words)} {rng.choice(words)}')
+    return sorted(titles)
+
+
+def with_typo(text, rng):
+    """Drops one letter of a random word, the way a hurried user would"""
+    words = text.split()
+    index = rng.randrange(len(words))
+    word = words[index]
+    if len(word) > 3:
+        position = rng.randrange(1, len(word))
+        words[index] = word[:position] + word[position + 1:]
+    return ' '.join(words)
+
+
+# Misspelled roles, every word of them is shared by a large share of the titles
+COMMON_QUERIES = ['teachng assistant', 'libary asistant', 'reserch assistant', 'lifegaurd', 'lab technican',
+                  'desk atendant', 'web develper', 'it suport specialist', 'tour gide', 'peer mentr']
+
+
+def time_lookups(index, queries, repeat=1):
+    """Returns the sorted latencies in ms and the number of queries whose intended match is in the top 5"""
+    latencies, found = [], 0
+    for query, expected in queries:
+        for _ in range(repeat):
+            start = time.perf_counter()
+            matches = index.search(query, limit=5)
+            latencies.append((time.perf_counter() - start) * 1000)
+        found += any(expected(match) for match, _ in matches)
+    return sorted(latencies), found
+
+
+def report(label, latencies):
+    """Prints the latency percentiles of a set of lookups"""
+    print(f'{label} p50:  {statistics.median(latencies):.2f} ms')
+    print(f'{label} p95:  {latencies[int(len(latencies) * 0.95) - 1]:.2f} ms')
+    print(f'{label} max:  {latencies[-1]:.2f} ms')
+
+
+def main(count):
+    """Builds the index and times lookups of misspelled titles"""
+    titles = make_titles(count)
+    start = time.perf_counter()
+    index = TrigramIndex()
+    index.load((title, 1) for title in titles)
+    build = time.perf_counter() - start
+
+    rng = random.Random(7)
+    queries = [(with_typo(title, rng), title.__eq__) for title in rng.sample(titles, 200)]
+    latencies, found = time_lookups(index, queries)
+    common = [(query, lambda match, role=role: match.lower().startswith(role.lower()))
+              for query, role in zip(COMMON_QUERIES, ['Teaching Assistant', 'Library Assistant',
+                                                      'Research Assistant', 'Lifeguard', 'Lab Technician',
+                                                      'Desk Attendant', 'Web Developer', 'IT Support Specialist',
+                                                      'Tour Guide', 'Peer Mentor'])]
+    common_latencies, common_found = time_lookups(index, common, repeat=20)
+    print(f'titles indexed:    {len(index)}')
+    print(f'distinct trigrams: {len(index.postings)}')
+    print(f'build time:        {build:.2f} s')
+    report('full title  ', latencies)
+    print(f'intended title in top 5: {found}/{len(queries)}')
+    report('common role ', common_latencies)
+    print(f'a title of the intended role in top 5: {common_found}/{len(common)}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -71,6 +71,13 @@ def run_migrations_online():
                 directives[:] = []
                 logger.info('No changes in schema detected.')
 
+    # the FTS5 virtual tables and their shadow tables are managed by hand-written
+    # migrations, keep autogenerate from trying to drop them
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == 'table' and reflected and '_fts' in name:
+            return False
+        return True
+
     connectable = current_app.extensions['migrate'].db.get_engine()
 
     with connectable.connect() as connection:
@@ -78,6 +85,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
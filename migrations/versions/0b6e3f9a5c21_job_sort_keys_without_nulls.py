@@ -0,0 +1,51 @@
+"""Keep NULLs out of the job listing sort keys
+
+posted_date becomes NOT NULL (rows without one get the migration time) and the pay sort uses
+an expression index on coalesce(pay, -1), jobs without pay ranking below every paid job.
+
+Revision ID: 0b6e3f9a5c21
+Revises: f4b8e27c1d96
+Create Date: 2026-10-19 09:12:36.481027
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b6e3f9a5c21'
+down_revision = 'f4b8e27c1d96'
+branch_labels = None
+depends_on = None
+
+
+def restore_fts_triggers():
+    # A batch ALTER recreates the jobs table on SQLite, which drops the triggers keeping jobs_fts in sync
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN "
+               "INSERT INTO jobs_fts(rowid, title, description, location) "
+               "VALUES (new.job_id, new.title, new.description, new.location); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN "
+               "INSERT INTO jobs_fts(jobs_fts, rowid, title, description, location) "
+               "VALUES ('delete', old.job_id, old.title, old.description, old.location); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, description, location ON jobs BEGIN "
+               "INSERT INTO jobs_fts(jobs_fts, rowid, title, description, location) "
+               "VALUES ('delete', old.job_id, old.title, old.description, old.location); "
+               "INSERT INTO jobs_fts(rowid, title, description, location) "
+               "VALUES (new.job_id, new.title, new.description, new.location); END")
+
+
+def upgrade():
+    op.execute('UPDATE jobs SET posted_date = CURRENT_TIMESTAMP WHERE posted_date IS NULL')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.alter_column('posted_date', existing_type=sa.DateTime(), nullable=False)
+    restore_fts_triggers()
+    op.create_index('ix_jobs_pay_rank_job_id', 'jobs', [sa.text('coalesce(pay, -1)'), 'job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jobs_pay_rank_job_id', table_name='jobs')
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.alter_column('posted_date', existing_type=sa.DateTime(), nullable=True)
+    restore_fts_triggers()
@@ -0,0 +1,26 @@
+"""Add composite index for keyset pagination of reviews
+
+Revision ID: 3f9a1c2d7b64
+Revises: efd84bb26ab4
+Create Date: 2026-10-18 09:12:31.481223
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7b64'
+down_revision = 'efd84bb26ab4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows without a count would fall out of the (upvote_count, id) key comparison
+    op.execute('UPDATE reviews SET upvote_count = 0 WHERE upvote_count IS NULL')
+    op.create_index('ix_reviews_upvote_count_id', 'reviews', ['upvote_count', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reviews_upvote_count_id', table_name='reviews')
@@ -0,0 +1,28 @@
+"""Add table_versions for fragment cache invalidation
+
+Revision ID: 5e0b7c93d2f1
+Revises: d4a8f6e21b37
+Create Date: 2026-10-18 15:05:56.240117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e0b7c93d2f1'
+down_revision = 'd4a8f6e21b37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_versions',
+    sa.Column('table_name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,28 @@
+"""Add composite indexes backing the faceted review filters
+
+Revision ID: 6f2d8b0c4e19
+Revises: a93c4e7f1d08
+Create Date: 2026-10-18 17:05:26.418302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6f2d8b0c4e19'
+down_revision = 'a93c4e7f1d08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_reviews_department_locations_rating', 'reviews', ['department', 'locations', 'rating'], unique=False)
+    op.create_index('ix_reviews_locations_rating', 'reviews', ['locations', 'rating'], unique=False)
+    op.create_index('ix_reviews_rating_recommendation', 'reviews', ['rating', 'recommendation'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_reviews_rating_recommendation', table_name='reviews')
+    op.drop_index('ix_reviews_locations_rating', table_name='reviews')
+    op.drop_index('ix_reviews_department_locations_rating', table_name='reviews')
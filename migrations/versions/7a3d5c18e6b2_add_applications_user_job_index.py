@@ -0,0 +1,24 @@
+"""Add a composite (user_name, job_id) index on applications
+
+Revision ID: 7a3d5c18e6b2
+Revises: e2c7a9d04f15
+Create Date: 2026-10-18 20:41:07.530912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a3d5c18e6b2'
+down_revision = 'e2c7a9d04f15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_applications_user_name_job_id', 'applications', ['user_name', 'job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_applications_user_name_job_id', table_name='applications')
@@ -0,0 +1,47 @@
+"""Add FTS5 full-text index over reviews
+
+Revision ID: 8c2e5d41a9f0
+Revises: 3f9a1c2d7b64
+Create Date: 2026-10-18 10:02:47.118409
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c2e5d41a9f0'
+down_revision = '3f9a1c2d7b64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5("
+               "job_title, job_description, department, locations, review, "
+               "content='reviews', content_rowid='id', tokenize='porter unicode61')")
+    op.execute("CREATE TRIGGER IF NOT EXISTS reviews_fts_ai AFTER INSERT ON reviews BEGIN "
+               "INSERT INTO reviews_fts(rowid, job_title, job_description, department, locations, review) "
+               "VALUES (new.id, new.job_title, new.job_description, new.department, new.locations, new.review); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS reviews_fts_ad AFTER DELETE ON reviews BEGIN "
+               "INSERT INTO reviews_fts(reviews_fts, rowid, job_title, job_description, department, locations, review) "
+               "VALUES ('delete', old.id, old.job_title, old.job_description, old.department, old.locations, old.review); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS reviews_fts_au AFTER UPDATE OF "
+               "job_title, job_description, department, locations, review ON reviews BEGIN "
+               "INSERT INTO reviews_fts(reviews_fts, rowid, job_title, job_description, department, locations, review) "
+               "VALUES ('delete', old.id, old.job_title, old.job_description, old.department, old.locations, old.review); "
+               "INSERT INTO reviews_fts(rowid, job_title, job_description, department, locations, review) "
+               "VALUES (new.id, new.job_title, new.job_description, new.department, new.locations, new.review); END")
+    # Index the reviews that already exist
+    op.execute("INSERT INTO reviews_fts(reviews_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS reviews_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS reviews_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS reviews_fts_ai')
+    op.execute('DROP TABLE IF EXISTS reviews_fts')
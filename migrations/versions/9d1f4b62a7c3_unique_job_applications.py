@@ -0,0 +1,44 @@
+"""Remove duplicate job applications and make (job_id, user_name) unique
+
+Revision ID: 9d1f4b62a7c3
+Revises: 7a3d5c18e6b2
+Create Date: 2026-10-18 21:10:44.102583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d1f4b62a7c3'
+down_revision = '7a3d5c18e6b2'
+branch_labels = None
+depends_on = None
+
+# Duplicate applications deleted per statement
+DEDUPE_BATCH_SIZE = 1000
+
+
+def upgrade():
+    # Keep the first application of each user for each job, deleting the repeats in batches.
+    # The repeats are found through ix_applications_user_name_job_id.
+    connection = op.get_bind()
+    duplicates = sa.text(
+        'SELECT a.application_id FROM applications a WHERE EXISTS ('
+        'SELECT 1 FROM applications b WHERE b.user_name = a.user_name AND b.job_id = a.job_id '
+        'AND b.application_id < a.application_id) LIMIT :batch_size')
+    delete = sa.text('DELETE FROM applications WHERE application_id IN :ids').bindparams(
+        sa.bindparam('ids', expanding=True))
+    while True:
+        ids = [row[0] for row in connection.execute(duplicates, {'batch_size': DEDUPE_BATCH_SIZE})]
+        if not ids:
+            break
+        connection.execute(delete, {'ids': ids})
+
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_applications_job_id_user_name', ['job_id', 'user_name'])
+
+
+def downgrade():
+    with op.batch_alter_table('applications', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_applications_job_id_user_name', type_='unique')
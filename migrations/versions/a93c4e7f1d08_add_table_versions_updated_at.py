@@ -0,0 +1,26 @@
+"""Add updated_at change stamp to table_versions
+
+Revision ID: a93c4e7f1d08
+Revises: 5e0b7c93d2f1
+Create Date: 2026-10-18 16:31:44.057930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93c4e7f1d08'
+down_revision = '5e0b7c93d2f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('table_versions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('table_versions', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
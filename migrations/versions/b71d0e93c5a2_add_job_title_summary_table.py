@@ -0,0 +1,37 @@
+"""Add job_title_summary table with review aggregates
+
+Revision ID: b71d0e93c5a2
+Revises: 8c2e5d41a9f0
+Create Date: 2026-10-18 11:24:05.903512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71d0e93c5a2'
+down_revision = '8c2e5d41a9f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_title_summary',
+    sa.Column('job_title', sa.String(length=64), nullable=False),
+    sa.Column('department', sa.String(length=64), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('rating_total', sa.Integer(), nullable=False),
+    sa.Column('hourly_pay_total', sa.Integer(), nullable=False),
+    sa.Column('recommendation_total', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('job_title', 'department')
+    )
+    # Backfill from the existing reviews
+    op.execute('INSERT INTO job_title_summary (job_title, department, review_count, rating_total, '
+               'hourly_pay_total, recommendation_total) '
+               'SELECT job_title, department, COUNT(id), COALESCE(SUM(rating), 0), COALESCE(SUM(hourly_pay), 0), '
+               'COALESCE(SUM(recommendation), 0) FROM reviews GROUP BY job_title, department')
+
+
+def downgrade():
+    op.drop_table('job_title_summary')
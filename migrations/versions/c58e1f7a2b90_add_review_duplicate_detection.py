@@ -0,0 +1,40 @@
+"""Add near-duplicate review detection (duplicate_of flag and MinHash LSH buckets)
+
+Revision ID: c58e1f7a2b90
+Revises: 6f2d8b0c4e19
+Create Date: 2026-10-18 18:12:09.553817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c58e1f7a2b90'
+down_revision = '6f2d8b0c4e19'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duplicate_of', sa.Integer(), nullable=True))
+
+    op.create_table('review_lsh_buckets',
+    sa.Column('bucket', sa.BigInteger(), autoincrement=False, nullable=False),
+    sa.Column('review_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.ForeignKeyConstraint(['review_id'], ['reviews.id'], ),
+    sa.PrimaryKeyConstraint('bucket', 'review_id')
+    )
+    with op.batch_alter_table('review_lsh_buckets', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_review_lsh_buckets_review_id'), ['review_id'], unique=False)
+    # Existing reviews are indexed with `flask build-duplicate-index`
+
+
+def downgrade():
+    with op.batch_alter_table('review_lsh_buckets', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_review_lsh_buckets_review_id'))
+
+    op.drop_table('review_lsh_buckets')
+    with op.batch_alter_table('reviews', schema=None) as batch_op:
+        batch_op.drop_column('duplicate_of')
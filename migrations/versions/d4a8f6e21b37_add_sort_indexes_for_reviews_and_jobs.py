@@ -0,0 +1,30 @@
+"""Add composite indexes backing server-side sorting of reviews and jobs
+
+Revision ID: d4a8f6e21b37
+Revises: b71d0e93c5a2
+Create Date: 2026-10-18 13:40:12.672088
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a8f6e21b37'
+down_revision = 'b71d0e93c5a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_reviews_rating_id', 'reviews', ['rating', 'id'], unique=False)
+    op.create_index('ix_reviews_hourly_pay_id', 'reviews', ['hourly_pay', 'id'], unique=False)
+    op.create_index('ix_jobs_posted_date_job_id', 'jobs', ['posted_date', 'job_id'], unique=False)
+    op.create_index('ix_jobs_pay_job_id', 'jobs', ['pay', 'job_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_jobs_pay_job_id', table_name='jobs')
+    op.drop_index('ix_jobs_posted_date_job_id', table_name='jobs')
+    op.drop_index('ix_reviews_hourly_pay_id', table_name='reviews')
+    op.drop_index('ix_reviews_rating_id', table_name='reviews')
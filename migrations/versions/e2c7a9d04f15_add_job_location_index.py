@@ -0,0 +1,26 @@
+"""Add an index on jobs.location for the server-side job search
+
+Revision ID: e2c7a9d04f15
+Revises: c58e1f7a2b90
+Create Date: 2026-10-18 20:05:31.218406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2c7a9d04f15'
+down_revision = 'c58e1f7a2b90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_jobs_location'), ['location'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('jobs', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_jobs_location'))
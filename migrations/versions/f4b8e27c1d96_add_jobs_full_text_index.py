@@ -0,0 +1,46 @@
+"""Add FTS5 full-text index over job postings
+
+Revision ID: f4b8e27c1d96
+Revises: 9d1f4b62a7c3
+Create Date: 2026-10-18 21:48:19.664210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4b8e27c1d96'
+down_revision = '9d1f4b62a7c3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute("CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5("
+               "title, description, location, "
+               "content='jobs', content_rowid='job_id', tokenize='porter unicode61')")
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_ai AFTER INSERT ON jobs BEGIN "
+               "INSERT INTO jobs_fts(rowid, title, description, location) "
+               "VALUES (new.job_id, new.title, new.description, new.location); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_ad AFTER DELETE ON jobs BEGIN "
+               "INSERT INTO jobs_fts(jobs_fts, rowid, title, description, location) "
+               "VALUES ('delete', old.job_id, old.title, old.description, old.location); END")
+    op.execute("CREATE TRIGGER IF NOT EXISTS jobs_fts_au AFTER UPDATE OF title, description, location ON jobs BEGIN "
+               "INSERT INTO jobs_fts(jobs_fts, rowid, title, description, location) "
+               "VALUES ('delete', old.job_id, old.title, old.description, old.location); "
+               "INSERT INTO jobs_fts(rowid, title, description, location) "
+               "VALUES (new.job_id, new.title, new.description, new.location); END")
+    # Index the jobs that already exist
+    op.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute('DROP TRIGGER IF EXISTS jobs_fts_au')
+    op.execute('DROP TRIGGER IF EXISTS jobs_fts_ad')
+    op.execute('DROP TRIGGER IF EXISTS jobs_fts_ai')
+    op.execute('DROP TABLE IF EXISTS jobs_fts')
@@ -2,11 +2,17 @@ import pytest
 import os
 import sys
 import warnings
+import json
+import time
 from flask import Flask, session, url_for, flash
 sys.path.append(os.getcwd())
 from app import db, app
 from app.models import User, Job, Application, Reviews,Upvote
 from crudapp import *
+from app.cache import fragment_cache, page_cache
+from app.facets import facet_cache
+from app.autocomplete import title_index
+from app.fuzzy import phrase_index
 warnings.filterwarnings('ignore')
 
 @pytest.fixture
@@ -15,6 +21,12 @@ def client():
     app.config['TESTING'] = True
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
     client = app.test_client()
+    # every test starts from a fresh database, so table versions restart as well
+    fragment_cache.clear()
+    page_cache.clear()
+    facet_cache.clear()
+    title_index.clear()
+    phrase_index.clear()
 
     with app.app_context():
         db.create_all()
@@ -2104,4 +2116,1684 @@ def test_upvote_route_basic_functionality():
     def mock_upvote():
         return True
     
-    assert mock_upvote() is True
\ No newline at end of file
+    assert mock_upvote() is True
+
+def add_reviews(count, job_title='Paged Job'):
+    """Helper that inserts `count` reviews whose upvote counts equal their position"""
+    with app.app_context():
+        for i in range(count):
+            db.session.add(Reviews(job_title=job_title, job_description='Description', department='Dept',
+                                   locations='Location', hourly_pay=15, benefits='Benefits',
+                                   review=f'Review number {i}', rating=4, recommendation=1, upvote_count=i))
+        db.session.commit()
+
+
+def test_page_content_is_paginated(client):
+    """Test that the review listing only renders one page of reviews"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(25)
+    response = client.get('/pageContent?per_page=10')
+    assert response.status_code == 200
+    assert response.data.count(b'Review number') == 10
+    # Highest upvote counts come first
+    assert b'Review number 24<' in response.data
+    assert b'Review number 14<' not in response.data
+    assert b'Next' in response.data
+    assert b'Previous' not in response.data
+
+
+def test_page_content_next_and_previous_cursors(client):
+    """Test walking forward and back through the review pages with cursors"""
+    from app.pagination import encode_cursor
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(25)
+    with app.app_context():
+        boundary = Reviews.query.filter_by(review='Review number 15').first()
+        cursor = encode_cursor([boundary.upvote_count, boundary.id])
+    response = client.get(f'/pageContent?per_page=10&after={cursor}')
+    assert response.data.count(b'Review number') == 10
+    assert b'Review number 14<' in response.data
+    assert b'Review number 5<' in response.data
+    assert b'Review number 15<' not in response.data
+    assert b'Previous' in response.data
+
+    with app.app_context():
+        boundary = Reviews.query.filter_by(review='Review number 14').first()
+        cursor = encode_cursor([boundary.upvote_count, boundary.id])
+    response = client.get(f'/pageContent?per_page=10&before={cursor}')
+    assert response.data.count(b'Review number') == 10
+    assert b'Review number 24<' in response.data
+    assert b'Previous' not in response.data
+
+
+def test_page_content_invalid_cursor_falls_back_to_first_page(client):
+    """Test that a tampered cursor renders the first page instead of failing"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(3)
+    response = client.get('/pageContent?after=not-a-cursor')
+    assert response.status_code == 200
+    assert response.data.count(b'Review number') == 3
+
+
+def test_search_reviews_matches_any_indexed_column(client):
+    """Test that the full-text search covers department, location and review text"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    with app.app_context():
+        db.session.add(Reviews(job_title='Desk Assistant', job_description='Front desk', department='Libraries',
+                               locations='Hunt Library', hourly_pay=12, benefits='None',
+                               review='Quiet shifts, great for studying', rating=5, recommendation=1))
+        db.session.commit()
+    for search in ('hunt', 'librar', 'studying', 'desk assistant'):
+        response = client.get(f'/pageContent?search={search}')
+        assert b'Desk Assistant' in response.data
+    response = client.get('/pageContent?search=cafeteria')
+    assert b'Desk Assistant' not in response.data
+
+
+def test_search_reviews_ranks_title_matches_first(client):
+    """Test that reviews matching in the job title outrank matches in the review text"""
+    from app.search import search_reviews
+    with app.app_context():
+        db.session.add(Reviews(job_title='Cashier', job_description='Register', department='Dining',
+                               locations='Talley', hourly_pay=11, benefits='Meals',
+                               review='Better than being a tutor', rating=3, recommendation=0))
+        db.session.add(Reviews(job_title='Tutor', job_description='Math help', department='Academics',
+                               locations='DH Hill', hourly_pay=15, benefits='Flexible',
+                               review='Rewarding', rating=5, recommendation=1))
+        db.session.commit()
+        page = search_reviews('tutor')
+        assert [entry.job_title for entry in page.items] == ['Tutor', 'Cashier']
+
+
+def test_search_reviews_index_follows_deletes(client):
+    """Test that deleted reviews disappear from the full-text index"""
+    from app.search import search_reviews
+    with app.app_context():
+        review = Reviews(job_title='Lifeguard', job_description='Pool', department='Recreation',
+                         locations='Carmichael', hourly_pay=13, benefits='Gym',
+                         review='Sunny', rating=4, recommendation=1)
+        db.session.add(review)
+        db.session.commit()
+        assert len(search_reviews('lifeguard').items) == 1
+        db.session.delete(review)
+        db.session.commit()
+        assert search_reviews('lifeguard').items == []
+
+
+def test_search_reviews_is_paginated(client):
+    """Test that search results are served one page at a time with working cursors"""
+    from app.search import search_reviews
+    add_reviews(7, job_title='Grader')
+    with app.app_context():
+        first = search_reviews('grader', per_page=3)
+        second = search_reviews('grader', after=first.next_cursor, per_page=3)
+        third = search_reviews('grader', after=second.next_cursor, per_page=3)
+        back = search_reviews('grader', before=second.prev_cursor, per_page=3)
+        seen = [entry.id for entry in first.items + second.items + third.items]
+        assert len(seen) == 7 and len(set(seen)) == 7
+        assert third.next_cursor is None
+        assert [entry.id for entry in back.items] == [entry.id for entry in first.items]
+
+
+def test_search_reviews_ignores_fts_syntax(client):
+    """Test that FTS5 operators typed by a user are treated as plain words"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.post('/pageContentPost', data={'search': 'NEAR( "unbalanced * OR'})
+    assert response.status_code == 200
+
+
+def post_review(client, job_title='Barista', department='Dining', hourly_pay='12', rating='4', recommendation='8'):
+    """Helper that submits a review through the /add route"""
+    return client.post('/add', data={
+        'job_title': job_title,
+        'job_description': 'Coffee',
+        'department': department,
+        'locations': 'Talley',
+        'hourly_pay': hourly_pay,
+        'benefits': 'Free coffee',
+        'review': 'Busy mornings',
+        'rating': rating,
+        'recommendation': recommendation
+    })
+
+
+def test_add_review_updates_summary(client):
+    """Test that adding reviews keeps the job title summary in step"""
+    from app.models import JobTitleSummary
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    post_review(client, hourly_pay='12', rating='4', recommendation='8')
+    post_review(client, hourly_pay='14', rating='2', recommendation='6')
+    post_review(client, department='Libraries')
+    with app.app_context():
+        summary = JobTitleSummary.query.get(('Barista', 'Dining'))
+        assert summary.review_count == 2
+        assert summary.average_rating == 3
+        assert summary.average_hourly_pay == 13
+        assert summary.average_recommendation == 7
+        assert JobTitleSummary.query.count() == 2
+
+
+def test_add_review_rejects_non_numeric_values(client):
+    """Test that a review with a non-numeric pay or an out of range rating is turned away"""
+    from app.models import JobTitleSummary
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = post_review(client, hourly_pay='$15')
+    assert response.headers['Location'].endswith('/review')
+    body = client.get('/review').get_data(as_text=True)
+    assert 'hourly_pay is not a whole number' in body
+    post_review(client, rating='9')
+    post_review(client, hourly_pay='15')
+    with app.app_context():
+        assert Reviews.query.count() == 1
+        assert JobTitleSummary.query.get(('Barista', 'Dining')).hourly_pay_total == 15
+    assert client.get('/review-summary').status_code == 200
+
+
+def test_delete_review_updates_summary(client):
+    """Test that deleting reviews takes them out of the summary and drops empty groups"""
+    from app.models import JobTitleSummary
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    post_review(client, hourly_pay='12')
+    post_review(client, hourly_pay='20')
+    with app.app_context():
+        first, second = [review.id for review in Reviews.query.order_by(Reviews.id)]
+    client.post(f'/delete_review/{first}')
+    with app.app_context():
+        summary = JobTitleSummary.query.get(('Barista', 'Dining'))
+        assert summary.review_count == 1
+        assert summary.hourly_pay_total == 20
+    client.post(f'/delete_review/{second}')
+    with app.app_context():
+        assert JobTitleSummary.query.count() == 0
+
+
+def test_rebuild_summaries_repairs_drift(client):
+    """Test that the rebuild command recomputes the summaries from the reviews"""
+    from app.models import JobTitleSummary
+    add_reviews(4, job_title='Usher')
+    with app.app_context():
+        assert JobTitleSummary.query.count() == 0
+    result = app.test_cli_runner().invoke(args=['rebuild-summaries'])
+    assert 'Rebuilt 1 job title summaries' in result.output
+    with app.app_context():
+        summary = JobTitleSummary.query.get(('Usher', 'Dept'))
+        assert summary.review_count == 4
+        assert summary.average_rating == 4
+
+
+def test_review_summary_route(client):
+    """Test that the summary page renders the aggregates"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    post_review(client)
+    response = client.get('/review-summary')
+    assert response.status_code == 200
+    assert b'Barista' in response.data
+    assert b'12.00' in response.data
+
+
+def test_review_summary_route_employer(client):
+    """Test that employers are sent back home from the summary page"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'employer'
+        sess['type'] = 'employer'
+    response = client.get('/review-summary')
+    assert response.status_code == 302
+    assert response.location.endswith('/home')
+
+
+class QueryCounter:
+    """Context manager counting the SQL statements sent to the database"""
+
+    def __enter__(self):
+        from sqlalchemy import event
+        self.count = 0
+        self.statements = []
+        with app.app_context():
+            self.engine = db.engine
+        event.listen(self.engine, 'before_cursor_execute', self.increment)
+        return self
+
+    def increment(self, conn, cursor, statement, *args):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __exit__(self, *exc):
+        from sqlalchemy import event
+        event.remove(self.engine, 'before_cursor_execute', self.increment)
+
+
+def test_page_content_marks_upvoted_reviews(client):
+    """Test that reviews the user already upvoted are shown as upvoted"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(5)
+    with app.app_context():
+        for review in Reviews.query.filter(Reviews.upvote_count < 2):
+            db.session.add(Upvote(review_id=review.id, user_name='testuser'))
+        db.session.add(Upvote(review_id=Reviews.query.filter_by(upvote_count=4).first().id, user_name='other'))
+        db.session.commit()
+    response = client.get('/pageContent')
+    assert response.data.count(b'You have upvoted this review') == 2
+
+
+def test_page_content_query_count_is_independent_of_rows(client):
+    """Test that rendering the review page costs the same number of queries for any page size"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(30)
+    with app.app_context():
+        for review in Reviews.query.all():
+            db.session.add(Upvote(review_id=review.id, user_name='testuser'))
+        db.session.commit()
+    # the first request of the app also runs the create_all hook
+    client.get('/pageContent')
+    with QueryCounter() as small:
+        client.get('/pageContent?per_page=2')
+    with QueryCounter() as large:
+        client.get('/pageContent?per_page=25')
+    assert 0 < small.count == large.count
+
+
+def test_upvote_route_increments_once(client):
+    """Test that repeated upvotes by the same user only count once"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+    for _ in range(3):
+        response = client.post(f'/upvote/{review_id}')
+        assert response.status_code == 302
+    with app.app_context():
+        assert Reviews.query.get(review_id).upvote_count == 1
+        assert Upvote.query.filter_by(review_id=review_id).count() == 1
+
+
+def test_upvote_route_missing_review(client):
+    """Test that upvoting a missing review records nothing"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.post('/upvote/4242')
+    assert response.status_code == 302
+    with client.session_transaction() as sess:
+        assert ('message', 'Review not found.') in sess['_flashes']
+    with app.app_context():
+        assert Upvote.query.count() == 0
+
+
+def test_remove_upvote_route(client):
+    """Test that a user can take back an upvote and only once"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+    client.post(f'/upvote/{review_id}')
+    response = client.post(f'/remove_upvote/{review_id}')
+    assert response.status_code == 302
+    assert response.location.endswith('/pageContent')
+    client.post(f'/remove_upvote/{review_id}')
+    with app.app_context():
+        assert Reviews.query.get(review_id).upvote_count == 0
+        assert Upvote.query.count() == 0
+
+
+def test_concurrent_upvotes_are_counted_exactly(tmp_path):
+    """Test that many threads upvoting one review at once neither lose nor double count votes"""
+    import threading
+    from app.upvotes import add_upvote
+    original_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + str(tmp_path / 'upvotes.db')
+    try:
+        with app.app_context():
+            db.create_all()
+            review = Reviews(job_title='Popular', job_description='Description', department='Dept',
+                             locations='Location', hourly_pay=15, benefits='Benefits',
+                             review='Everyone agrees', rating=5, recommendation=10)
+            db.session.add(review)
+            db.session.commit()
+            review_id = review.id
+
+        users = [f'user{i}' for i in range(20)]
+        errors = []
+
+        def hammer(user_name):
+            try:
+                with app.app_context():
+                    for _ in range(5):
+                        add_upvote(review_id, user_name)
+            except Exception as error:  # pylint: disable=broad-except
+                errors.append(error)
+
+        threads = [threading.Thread(target=hammer, args=(user,)) for user in users * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        with app.app_context():
+            assert Reviews.query.get(review_id).upvote_count == len(users)
+            assert Upvote.query.filter_by(review_id=review_id).count() == len(users)
+            db.drop_all()
+    finally:
+        app.config['SQLALCHEMY_DATABASE_URI'] = original_uri
+
+
+@pytest.fixture
+def write_behind():
+    """Fixture enabling the upvote write-behind buffer with a timer that never fires during a test"""
+    from app.upvotes import upvote_buffer
+    app.config.update(UPVOTE_WRITE_BEHIND=True, UPVOTE_FLUSH_INTERVAL=3600, UPVOTE_FLUSH_SIZE=500)
+    yield upvote_buffer
+    with app.app_context():
+        upvote_buffer.shutdown()
+    app.config['UPVOTE_WRITE_BEHIND'] = False
+
+
+def test_write_behind_upvote_is_buffered_and_visible(client, write_behind):
+    """Test that buffered upvotes are shown to readers before they are flushed"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+    client.post(f'/upvote/{review_id}')
+    client.post(f'/upvote/{review_id}')
+    with app.app_context():
+        assert Reviews.query.get(review_id).upvote_count == 0
+        assert Upvote.query.count() == 0
+    assert write_behind.pending_count(review_id) == 1
+    response = client.get('/pageContent')
+    assert b'<span>1</span>' in response.data
+    assert b'You have upvoted this review' in response.data
+    with app.app_context():
+        assert Reviews.query.get(review_id).upvote_count == 0
+
+
+def test_write_behind_flush_group_commits(client, write_behind):
+    """Test that a flush writes all buffered upvotes and skips ones already stored"""
+    add_reviews(2)
+    with app.app_context():
+        first, second = [review.id for review in Reviews.query.order_by(Reviews.id)]
+        db.session.add(Upvote(review_id=second, user_name='alice'))
+        db.session.commit()
+        for user_name in ('alice', 'bob', 'carol'):
+            write_behind.add(first, user_name)
+        assert write_behind.add(second, 'alice') is False
+        write_behind.add(second, 'bob')
+        assert write_behind.flush() == 4
+        assert Reviews.query.get(first).upvote_count == 3
+        assert Reviews.query.get(second).upvote_count == 2
+        assert Upvote.query.count() == 5
+        assert write_behind.pending_count(first) == 0
+
+
+def test_write_behind_flushes_at_size_threshold(client, write_behind):
+    """Test that reaching the size threshold flushes without waiting for the timer"""
+    app.config['UPVOTE_FLUSH_SIZE'] = 3
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+        for user_name in ('u1', 'u2', 'u3'):
+            write_behind.add(review_id, user_name)
+        assert Reviews.query.get(review_id).upvote_count == 3
+
+
+def test_write_behind_flushes_on_shutdown(client, write_behind):
+    """Test that shutting the buffer down writes out pending upvotes"""
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+        write_behind.add(review_id, 'dave')
+        write_behind.shutdown()
+        assert Reviews.query.get(review_id).upvote_count == 1
+
+
+def test_write_behind_remove_discards_buffered_upvote(client, write_behind):
+    """Test that un-upvoting before a flush simply drops the buffered upvote"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+    client.post(f'/upvote/{review_id}')
+    client.post(f'/remove_upvote/{review_id}')
+    with app.app_context():
+        assert write_behind.flush() == 0
+        assert Reviews.query.get(review_id).upvote_count == 0
+
+
+def test_write_behind_remove_during_flush_withdraws_the_upvote(client, write_behind, monkeypatch):
+    """Test that un-upvoting while the upvote is being flushed waits for the flush and withdraws it"""
+    import threading
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    with app.app_context():
+        review_id = Reviews.query.first().id
+    client.post(f'/upvote/{review_id}')
+    writing, release = threading.Event(), threading.Event()
+    write = write_behind.write
+
+    def slow_write(batch):
+        writing.set()
+        release.wait(5)
+        return write(batch)
+    monkeypatch.setattr(write_behind, 'write', slow_write)
+    flusher = threading.Thread(target=write_behind.flush)
+    flusher.start()
+    writing.wait(5)
+    threading.Timer(0.2, release.set).start()
+    client.post(f'/remove_upvote/{review_id}')
+    flusher.join()
+    with client.session_transaction() as sess:
+        assert sess['_flashes'][-1] == ('message', 'Upvote removed.')
+    with app.app_context():
+        assert Upvote.query.count() == 0
+        assert Reviews.query.get(review_id).upvote_count == 0
+    assert write_behind.pending_count(review_id) == 0
+
+
+def test_write_behind_counters_survive_concurrent_shards(client, write_behind):
+    """Test that concurrent upvotes on different shards all move the size and generation on"""
+    import threading
+    add_reviews(16)
+    with app.app_context():
+        review_ids = [review.id for review in Reviews.query]
+    generation = write_behind.generation
+
+    def upvote(review_id):
+        with app.app_context():
+            for number in range(20):
+                write_behind.add(review_id, f'user{number}')
+    threads = [threading.Thread(target=upvote, args=(review_id,)) for review_id in review_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert write_behind.size == 16 * 20
+    assert write_behind.generation == generation + 16 * 20
+
+
+def test_page_content_sorts_server_side(client):
+    """Test that the review listing honours the sort key and direction"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    with app.app_context():
+        for pay, rating in ((11, 2), (30, 1), (18, 5)):
+            db.session.add(Reviews(job_title=f'Pay {pay}', job_description='Description', department='Dept',
+                                   locations='Location', hourly_pay=pay, benefits='Benefits',
+                                   review='Review', rating=rating, recommendation=5))
+        db.session.commit()
+    response = client.get('/pageContent?sort=pay')
+    assert response.data.index(b'Pay 30') < response.data.index(b'Pay 18') < response.data.index(b'Pay 11')
+    response = client.get('/pageContent?sort=rating&order=asc')
+    assert response.data.index(b'Pay 30') < response.data.index(b'Pay 11') < response.data.index(b'Pay 18')
+    response = client.get('/pageContent?sort=bogus')
+    assert response.status_code == 200
+
+
+def test_view_jobs_sorted_by_pay_and_paginated(client):
+    """Test that jobs can be sorted by pay and paged through with the sort kept"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        for pay in (15, 40, 25):
+            db.session.add(Job(title=f'Job paying {pay}', description='Description',
+                               location='Raleigh', pay=pay, employer_id='employer'))
+        db.session.commit()
+    response = client.get('/view-jobs?sort=pay&per_page=2')
+    assert b'Job paying 40' in response.data and b'Job paying 25' in response.data
+    assert b'Job paying 15' not in response.data
+    assert b'sort=pay' in response.data
+
+
+def test_sort_queries_use_composite_indexes(client):
+    """Test that each sort key is answered from its index without a separate sort step"""
+    from sqlalchemy import text
+    with app.app_context():
+        for table, columns, index in (('reviews', 'upvote_count DESC, id DESC', 'ix_reviews_upvote_count_id'),
+                                      ('reviews', 'rating DESC, id DESC', 'ix_reviews_rating_id'),
+                                      ('reviews', 'hourly_pay DESC, id DESC', 'ix_reviews_hourly_pay_id'),
+                                      ('jobs', 'posted_date DESC, job_id DESC', 'ix_jobs_posted_date_job_id'),
+                                      ('jobs', 'pay DESC, job_id DESC', 'ix_jobs_pay_job_id')):
+            plan = ' '.join(str(row[-1]) for row in db.session.execute(
+                text(f'EXPLAIN QUERY PLAN SELECT * FROM {table} ORDER BY {columns} LIMIT 21')))
+            assert index in plan
+            assert 'TEMP B-TREE' not in plan
+
+
+def test_review_table_fragment_is_cached(client):
+    """Test that a repeated review page request is served without running the listing query"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(3)
+    first = client.get('/pageContent')
+    with QueryCounter() as counter:
+        second = client.get('/pageContent')
+    assert first.data == second.data
+    # only the table version lookup reaches the database
+    assert counter.count == 1
+
+
+def test_review_table_cache_invalidated_by_writes(client):
+    """Test that adding, upvoting and deleting reviews are reflected immediately"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    post_review(client, job_title='Cached Job')
+    assert b'Cached Job' in client.get('/pageContent').data
+    post_review(client, job_title='Fresh Job')
+    assert b'Fresh Job' in client.get('/pageContent').data
+    with app.app_context():
+        review_id = Reviews.query.filter_by(job_title='Fresh Job').first().id
+    client.post(f'/upvote/{review_id}')
+    assert b'You have upvoted this review' in client.get('/pageContent').data
+    client.post(f'/delete_review/{review_id}')
+    assert b'Fresh Job' not in client.get('/pageContent').data
+
+
+def test_review_table_cache_separates_roles(client):
+    """Test that the admin delete column is never served to other users"""
+    add_reviews(1)
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    assert b'Are you sure you want to delete this review?' in client.get('/pageContent').data
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    assert b'Are you sure you want to delete this review?' not in client.get('/pageContent').data
+
+
+def test_job_cards_cache_invalidated_by_writes(client):
+    """Test that posting, applying to and deleting jobs are reflected immediately"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'employer'
+        sess['type'] = 'employer'
+    client.post('/add-job', data={'title': 'Cached Posting', 'description': 'Description',
+                                  'location': 'Raleigh', 'pay': '20'})
+    client.post('/add-job', data={'title': 'Short Lived Posting', 'description': 'Description',
+                                  'location': 'Raleigh', 'pay': '20'})
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    response = client.get('/view-jobs')
+    assert b'Cached Posting' in response.data
+    assert response.data.count(b'Apply Now!') == 2
+    with app.app_context():
+        job_id = Job.query.filter_by(title='Cached Posting').first().job_id
+    client.post(f'/apply/{job_id}')
+    assert client.get('/view-jobs').data.count(b'Apply Now!') == 1
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    with app.app_context():
+        job_id = Job.query.filter_by(title='Short Lived Posting').first().job_id
+    assert b'Short Lived Posting' in client.get('/view-jobs').data
+    client.post(f'/delete-job/{job_id}')
+    assert b'Short Lived Posting' not in client.get('/view-jobs').data
+
+
+def test_fragment_cache_is_size_bounded():
+    """Test that the fragment cache evicts the least recently used entries"""
+    from app.cache import FragmentCache
+    cache = FragmentCache(2)
+    cache.set('a', 'A')
+    cache.set('b', 'B')
+    assert cache.get('a') == 'A'
+    cache.set('c', 'C')
+    assert len(cache) == 2
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A' and cache.get('c') == 'C'
+
+
+@pytest.mark.parametrize('path', ['/home', '/about', '/contact'])
+def test_static_pages_do_not_query_database(client, path):
+    """Test that the landing and static pages render without any database work"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    add_reviews(3)
+    # the first request of the app also runs the create_all hook
+    client.get('/review')
+    with QueryCounter() as counter:
+        first = client.get(path)
+        second = client.get(path)
+    assert counter.count == 0
+    assert first.status_code == 200
+    assert first.data == second.data
+    assert first.headers['Cache-Control'] == 'private, no-cache'
+
+
+def test_static_pages_are_cached_per_user(client):
+    """Test that a cached page never greets one user with another user's name"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'alice'
+        sess['type'] = 'applicant'
+    assert b'Welcome, alice' in client.get('/home').data
+    with client.session_transaction() as sess:
+        sess['username'] = 'bob'
+        sess['type'] = 'employer'
+    response = client.get('/home')
+    assert b'Welcome, bob' in response.data
+    assert b'Add Job' in response.data
+
+
+def test_static_pages_are_revalidated_per_user(client):
+    """Test that browsers revalidate a static page and cannot reuse it after switching users"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'alice'
+        sess['type'] = 'applicant'
+    etag = client.get('/home').headers['ETag']
+    assert client.get('/home', headers={'If-None-Match': etag}).status_code == 304
+    with client.session_transaction() as sess:
+        sess['username'] = 'bob'
+    response = client.get('/home', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Welcome, bob' in response.data
+    assert response.headers['ETag'] != etag
+
+
+def test_page_content_answers_if_none_match_with_304(client):
+    """Test that a revalidated review page costs only the change stamp lookup"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(3)
+    response = client.get('/pageContent')
+    etag = response.headers['ETag']
+    assert response.headers['Last-Modified']
+    with QueryCounter() as counter:
+        response = client.get('/pageContent', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert counter.count == 1
+
+
+def test_etag_changes_after_writes(client):
+    """Test that writes through routes and plain ORM changes both invalidate the ETag"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(1)
+    etag = client.get('/pageContent').headers['ETag']
+    post_review(client, job_title='Newer Job')
+    response = client.get('/pageContent', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert b'Newer Job' in response.data
+    etag = response.headers['ETag']
+    with app.app_context():
+        db.session.add(Upvote(review_id=Reviews.query.first().id, user_name='testuser'))
+        db.session.commit()
+    assert client.get('/pageContent', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_etag_depends_on_user_and_query(client):
+    """Test that different users and different pages never share an ETag"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'alice'
+        sess['type'] = 'applicant'
+    etag = client.get('/view-jobs').headers['ETag']
+    assert client.get('/view-jobs', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/view-jobs?sort=pay', headers={'If-None-Match': etag}).status_code == 200
+    with client.session_transaction() as sess:
+        sess['username'] = 'bob'
+    assert client.get('/view-jobs', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_view_applicants_if_modified_since(client):
+    """Test that If-Modified-Since is honoured until the next application arrives"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    with app.app_context():
+        job = Job(title='Stamped Job', description='Description', location='Raleigh', pay=20, employer_id='admin')
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.job_id
+    last_modified = client.get('/view-applicants').headers['Last-Modified']
+    response = client.get('/view-applicants', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+    with app.app_context():
+        db.session.add(Application(job_id=job_id, user_name='student'))
+        db.session.commit()
+    response = client.get('/view-applicants', headers={'If-None-Match': 'stale'})
+    assert response.status_code == 200
+
+
+def test_api_requires_login(client):
+    """Test that the JSON API rejects anonymous callers with a JSON error"""
+    response = client.get('/api/reviews')
+    assert response.status_code == 401
+    assert response.get_json() == {'error': 'Authentication required'}
+
+
+def test_api_reviews_streams_ndjson_with_field_selection(client):
+    """Test that reviews stream as one JSON object per line with only the selected fields"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(3)
+    response = client.get('/api/reviews?fields=id,job_title,upvote_count')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert rows == [{'id': i + 1, 'job_title': 'Paged Job', 'upvote_count': i} for i in range(3)]
+
+
+def test_api_rejects_unknown_fields_and_bad_cursors(client):
+    """Test that typos in field names and cursors are reported instead of silently ignored"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    response = client.get('/api/reviews?fields=id,password')
+    assert response.status_code == 400
+    assert 'password' in response.get_json()['error']
+    assert client.get('/api/reviews?after=garbage').status_code == 400
+    assert client.get('/api/reviews?format=xml').status_code == 400
+
+
+def test_api_cursor_pagination_walks_every_row(client):
+    """Test that following next_cursor visits every row exactly once"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(7)
+    seen, url = [], '/api/reviews?format=json&fields=id&limit=3'
+    while url:
+        body = client.get(url).get_json()
+        seen.extend(item['id'] for item in body['items'])
+        url = f"/api/reviews?format=json&fields=id&limit=3&after={body['next_cursor']}" if body['next_cursor'] else None
+    assert seen == list(range(1, 8))
+
+    lines = client.get('/api/reviews?fields=id&limit=5').get_data(as_text=True).splitlines()
+    assert len(lines) == 6
+    assert 'next_cursor' in json.loads(lines[-1])
+
+
+def test_api_jobs_and_applications_are_scoped_to_the_caller(client):
+    """Test that employers only see their own jobs and applicants only their own applications"""
+    with app.app_context():
+        own = Job(title='Own Job', description='Description', location='Raleigh', pay=20, employer_id='boss')
+        other = Job(title='Other Job', description='Description', location='Raleigh', pay=20, employer_id='rival')
+        db.session.add_all([own, other])
+        db.session.flush()
+        db.session.add_all([Application(job_id=own.job_id, user_name='alice'),
+                            Application(job_id=other.job_id, user_name='bob')])
+        db.session.commit()
+
+    with client.session_transaction() as sess:
+        sess['username'] = 'boss'
+        sess['type'] = 'employer'
+    jobs = client.get('/api/jobs?format=json&fields=title').get_json()['items']
+    assert jobs == [{'title': 'Own Job'}]
+    applications = client.get('/api/applications?format=json&fields=user_name').get_json()['items']
+    assert applications == [{'user_name': 'alice'}]
+
+    with client.session_transaction() as sess:
+        sess['username'] = 'bob'
+        sess['type'] = 'applicant'
+    assert len(client.get('/api/jobs?format=json').get_json()['items']) == 2
+    body = client.get('/api/applications?format=json').get_json()
+    assert [item['user_name'] for item in body['items']] == ['bob']
+    assert body['items'][0]['application_date']
+
+
+def test_admin_show_all_reviews_is_streamed(client):
+    """Test that the admin "show all" view streams every review past the page size"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    add_reviews(30)
+    response = client.get('/pageContent?all=1&sort=upvotes&order=asc')
+    body = response.get_data(as_text=True)
+    assert body.count('Review number') == 30
+    assert body.index('Review number 0<') < body.index('Review number 29<')
+    assert 'Next &raquo;' not in body
+    assert 'Show pages' in body
+
+
+def test_show_all_streams_before_reading_the_rows(client):
+    """Test that the page header is sent before the review rows are read"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    add_reviews(3)
+    client.get('/home')
+    with QueryCounter() as counter:
+        response = client.get('/pageContent?all=1')
+        chunks = iter(response.response)
+        first = next(chunks)
+        queries_before_rows = counter.count
+        rest = ''.join(chunk.decode() if isinstance(chunk, bytes) else chunk for chunk in chunks)
+    assert 'Review number' not in (first.decode() if isinstance(first, bytes) else first)
+    assert 'Review number 2' in rest
+    assert counter.count > queries_before_rows
+    response.close()
+
+
+def test_show_all_is_admin_only(client):
+    """Test that applicants asking for every review still get a single page"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    add_reviews(25)
+    response = client.get('/pageContent?all=1')
+    assert response.get_data(as_text=True).count('Review number') == 20
+
+
+def test_view_users_is_streamed(client):
+    """Test that the streamed user management page lists every user"""
+    with app.app_context():
+        for i in range(3):
+            db.session.add(User(user_name=f'user{i}', name=f'Name {i}', email=f'user{i}@ncsu.edu',
+                                password='pw', type='applicant'))
+        db.session.commit()
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    response = client.get('/view-users')
+    body = response.get_data(as_text=True)
+    assert all(f'user{i}@ncsu.edu' in body for i in range(3))
+
+
+def add_faceted_reviews():
+    """Helper that inserts reviews spread over departments, locations, pay, ratings and recommendations"""
+    rows = [('Dining', 'Raleigh', 9, 2, 3), ('Dining', 'Raleigh', 14, 4, 8), ('Dining', 'Durham', 18, 5, 9),
+            ('Library', 'Raleigh', 12, 3, 5), ('Library', 'Durham', 22, 5, 10), ('Athletics', 'Cary', 30, 1, 1)]
+    with app.app_context():
+        for department, location, pay, rating, recommendation in rows:
+            db.session.add(Reviews(job_title=f'{department} Job', job_description='Description',
+                                   department=department, locations=location, hourly_pay=pay,
+                                   benefits='Benefits', review=f'{department} in {location} at {pay}',
+                                   rating=rating, recommendation=recommendation, upvote_count=0))
+        db.session.commit()
+
+
+def test_review_facets_filter_the_listing(client):
+    """Test that the facet filters combine and narrow down the review listing"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_faceted_reviews()
+    body = client.get('/pageContent?department=Dining&min_rating=4').get_data(as_text=True)
+    assert 'Dining in Raleigh at 14' in body
+    assert 'Dining in Durham at 18' in body
+    assert 'Dining in Raleigh at 9' not in body
+    assert 'Library' not in body.split('<tbody>')[1]
+
+    body = client.get('/pageContent?min_pay=10&max_pay=20&min_recommendation=6').get_data(as_text=True)
+    table = body.split('<tbody>')[1]
+    assert 'at 14' in table and 'at 18' in table
+    assert 'at 12' not in table and 'at 22' not in table
+
+
+def test_review_facet_counts_ignore_their_own_filter(client):
+    """Test that each facet counts its values under the other filters only"""
+    from app.facets import compute_facet_counts
+    add_faceted_reviews()
+    with app.app_context():
+        counts = compute_facet_counts({'department': 'Dining', 'min_rating': 4})
+    # departments are counted under the rating filter alone
+    assert dict(counts['department']) == {'Dining': 2, 'Library': 1}
+    assert dict(counts['location']) == {'Raleigh': 1, 'Durham': 1}
+    # ratings are counted as "at least", under the department filter alone
+    assert counts['rating'] == [(5, 1), (4, 2), (2, 3)]
+    assert [(band['label'], band['count']) for band in counts['pay']] == [('$10-14', 1), ('$15-19', 1)]
+
+
+def test_review_facet_counts_are_cached_until_reviews_change(client):
+    """Test that facet counts are computed once per filter combination and table version"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_faceted_reviews()
+    body = client.get('/pageContent?location=Durham').get_data(as_text=True)
+    assert 'Dining (1)' in body and 'Library (1)' in body
+    assert len(facet_cache) == 1
+    client.get('/pageContent?location=Durham&after=bogus')
+    assert len(facet_cache) == 1
+    assert 'Dining (4)' not in client.get('/pageContent').get_data(as_text=True)
+    post_review(client, department='Dining')
+    assert 'Dining (4)' in client.get('/pageContent').get_data(as_text=True)
+
+
+def test_review_pagination_links_keep_the_filters(client):
+    """Test that the next page link carries the active filters"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(25)
+    body = client.get('/pageContent?department=Dept').get_data(as_text=True)
+    assert 'department=Dept' in body.split('Next &raquo;')[0].rsplit('<a', 1)[1]
+
+
+def test_job_title_autocomplete_merges_reviews_and_jobs(client):
+    """Test that suggestions come from review and job titles, matched case-insensitively by prefix"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(2, job_title='Barista')
+    add_reviews(1, job_title='barista')
+    add_reviews(1, job_title='Bartender')
+    with app.app_context():
+        db.session.add(Job(title='Bar Manager', description='Description', location='Raleigh', pay=20,
+                           employer_id='boss'))
+        db.session.commit()
+    assert client.get('/autocomplete/job-titles?q=BAR').get_json() == ['Bar Manager', 'Barista', 'Bartender']
+    assert client.get('/autocomplete/job-titles?q=bart').get_json() == ['Bartender']
+    assert client.get('/autocomplete/job-titles?q=bar&limit=1').get_json() == ['Bar Manager']
+    assert client.get('/autocomplete/job-titles?q=').get_json() == []
+
+
+def test_job_title_autocomplete_updates_incrementally(client):
+    """Test that committed inserts and deletes reach the loaded index without reloading it"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    add_reviews(1, job_title='Lifeguard')
+    assert client.get('/autocomplete/job-titles?q=li').get_json() == ['Lifeguard']
+
+    post_review(client, job_title='Library Assistant')
+    with QueryCounter() as counter:
+        assert client.get('/autocomplete/job-titles?q=li').get_json() == ['Library Assistant', 'Lifeguard']
+    assert counter.count == 0
+
+    with app.app_context():
+        review_id = Reviews.query.filter_by(job_title='Lifeguard').first().id
+    client.post(f'/delete_review/{review_id}')
+    assert client.get('/autocomplete/job-titles?q=li').get_json() == ['Library Assistant']
+
+    with app.app_context():
+        review = Reviews.query.filter_by(job_title='Library Assistant').first()
+        review.job_title = 'Lab Assistant'
+        db.session.rollback()
+    assert client.get('/autocomplete/job-titles?q=la').get_json() == []
+
+
+def test_title_index_prefix_lookup():
+    """Test that a lookup in an index of 100k titles returns the first titles of the prefix in order"""
+    from app.autocomplete import TitleIndex
+    index = TitleIndex()
+    index.load((f'Job Title {i:06d}', 1) for i in range(100000))
+    suggestions = index.suggest('job title 0420', limit=10)
+    assert suggestions == [f'Job Title {i:06d}' for i in range(42000, 42010)]
+    assert index.suggest('job title 1', limit=10) == []
+    index.discard('Job Title 000000')
+    assert index.suggest('job title 00000', limit=2) == ['Job Title 000001', 'Job Title 000002']
+
+
+def test_trigram_index_tolerates_typos():
+    """Test that misspelled titles and locations find their closest known phrases"""
+    from app.fuzzy import TrigramIndex
+    index = TrigramIndex()
+    index.load([('Teaching Assistant', 3), ('Research Assistant', 1), ('Hunt Library', 2),
+                ('DH Hill Library', 1), ('Barista', 1)])
+    assert index.search('teachng assistant')[0][0] == 'Teaching Assistant'
+    assert index.search('hunt libary')[0][0] == 'Hunt Library'
+    assert index.search('zzzz') == []
+    with index.lock:
+        index.discard('Hunt Library', 2)
+    assert 'Hunt Library' not in [phrase for phrase, _ in index.search('hunt libary')]
+    assert 'hunt' not in index.word_phrases
+
+
+def test_trigram_index_clear_waits_for_running_searches():
+    """Test that clearing the index never swaps its state under a search holding the lock"""
+    import threading
+    from app.fuzzy import TrigramIndex
+    index = TrigramIndex()
+    index.load([('Teaching Assistant', 1)])
+    with index.lock:
+        clearing = threading.Thread(target=index.clear)
+        clearing.start()
+        clearing.join(0.1)
+        assert clearing.is_alive()
+        assert 'assistant' in index.word_counts
+    clearing.join()
+    assert len(index) == 0 and index.loaded_at is None
+
+
+def test_trigram_index_bounds_candidates_of_common_words(monkeypatch):
+    """Test that a query of common words scores a bounded number of phrases and still finds the best one"""
+    from app import fuzzy
+    index = fuzzy.TrigramIndex()
+    index.load([(f'Assistant {i:05d} Office', 1) for i in range(20000)] + [('Teaching Assistant', 1)])
+    scored, similarity = [], fuzzy.similarity
+    monkeypatch.setattr(fuzzy, 'similarity', lambda first, second: scored.append(1) or similarity(first, second))
+    assert index.search('teachng assistant')[0][0] == 'Teaching Assistant'
+    assert len(scored) <= fuzzy.MAX_SCORED
+    assert index.search('asistant 00042 office')[0][0] == 'Assistant 00042 Office'
+
+
+def test_review_search_falls_back_to_closest_title(client):
+    """Test that a misspelled search shows the reviews of the closest known job title"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    add_reviews(2, job_title='Teaching Assistant')
+    add_reviews(1, job_title='Lifeguard')
+    body = client.get('/pageContent?search=teachng+assistant').get_data(as_text=True)
+    assert 'showing results for "Teaching Assistant"' in body
+    assert body.count('<strong>Teaching Assistant</strong>') == 2
+    assert 'Lifeguard' not in body
+
+    post_review(client, job_title='Lab Technician')
+    body = client.get('/pageContent?search=lab+technican').get_data(as_text=True)
+    assert '<strong>Lab Technician</strong>' in body
+
+
+def test_profanity_filter_catches_punctuation_and_obfuscation():
+    """Test that the compiled filter normalizes words before matching them"""
+    from app.inappropriate_words import ProfanityFilter
+    word_filter = ProfanityFilter(['damn', 'shit', 'ass', 'jerk-off'])
+    assert word_filter.mask('damn! this is $h1t, SHIIIT and s.h.i.t') == '****! this is ****, ****** and *******'
+    assert word_filter.mask('What a jerk-off.') == 'What a ********.'
+    assert word_filter.mask('class assistant as pass') == 'class assistant as pass'
+    assert word_filter.mask('DÁMN  it\n"ass"') == '****  it\n"***"'
+    assert word_filter.contains('Hell yes') is False
+    assert word_filter.mask('I worked 455 hours a week') == 'I worked 455 hours a week'
+    assert ProfanityFilter(['hell']).mask('My heel hurt, helll') == 'My heel hurt, *****'
+    assert word_filter.find('oh damn') == [(3, 7)]
+
+
+def test_add_review_masks_inappropriate_words(client):
+    """Test that inappropriate words in a review are masked instead of silently dropped"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    client.post('/add', data={
+        'job_title': 'Barista', 'job_description': 'Coffee', 'department': 'Dining', 'locations': 'Talley',
+        'hourly_pay': '12', 'benefits': 'Free coffee', 'review': 'Damn! The mornings are sh!t but fun',
+        'rating': '4', 'recommendation': '8'
+    })
+    with app.app_context():
+        assert Reviews.query.one().review == '****! The mornings are **** but fun'
+
+
+def add_review_texts(texts):
+    """Helper that stores reviews with the given texts, bypassing the filter of /add"""
+    with app.app_context():
+        for text in texts:
+            db.session.add(Reviews(job_title='Barista', job_description='Description', department='Dining',
+                                   locations='Talley', hourly_pay=12, benefits='Benefits', review=text,
+                                   rating=4, recommendation=8, upvote_count=0))
+        db.session.commit()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_remoderate_reviews_masks_stored_reviews(client, tmp_path, workers):
+    """Test that re-moderation masks old reviews, writes only changed rows and removes its checkpoint"""
+    from app.moderation import remoderate_reviews
+    add_review_texts(['fine place', 'damn boss', 'pure sh!t', 'nice crew', 'grumpy manager'] * 3)
+    checkpoint = tmp_path / 'checkpoint.json'
+    with app.app_context():
+        with QueryCounter() as counter:
+            progress = remoderate_reviews(chunk_size=4, workers=workers, checkpoint=str(checkpoint),
+                                          words=['damn', 'shit', 'grumpy'])
+        reviews = [review.review for review in Reviews.query.order_by(Reviews.id)]
+    assert progress == {'last_id': 15, 'scanned': 15, 'changed': 9}
+    assert reviews[:5] == ['fine place', '**** boss', 'pure ****', 'nice crew', '****** manager']
+    assert not checkpoint.exists()
+    # four chunks to read, one batched update and stamp per chunk with changes, one empty read at the end
+    assert counter.count <= 4 + 4 * 2 + 1
+
+
+def test_remoderate_reviews_resumes_from_checkpoint(client, tmp_path):
+    """Test that an interrupted run continues after the last finished chunk"""
+    from app.moderation import remoderate_reviews
+    add_review_texts(['damn'] * 6)
+    checkpoint = tmp_path / 'checkpoint.json'
+    checkpoint.write_text(json.dumps({'last_id': 4, 'scanned': 4, 'changed': 4}))
+    with app.app_context():
+        progress = remoderate_reviews(chunk_size=2, workers=1, checkpoint=str(checkpoint))
+        reviews = [review.review for review in Reviews.query.order_by(Reviews.id)]
+    assert progress == {'last_id': 6, 'scanned': 6, 'changed': 6}
+    assert reviews == ['damn'] * 4 + ['****'] * 2
+
+
+def test_remoderate_reviews_command(client, tmp_path):
+    """Test the flask CLI command end to end"""
+    add_review_texts(['damn it', 'all good'])
+    result = app.test_cli_runner().invoke(args=['remoderate-reviews', '--workers', '1',
+                                                '--checkpoint', str(tmp_path / 'checkpoint.json')])
+    assert result.exit_code == 0, result.output
+    assert 'Done: scanned 2 reviews, masked 1.' in result.output
+
+
+def test_word_list_reloads_when_the_file_changes(tmp_path):
+    """Test that a changed word list file is compiled once and swapped in"""
+    from app.inappropriate_words import WordList
+    path = tmp_path / 'words.txt'
+    path.write_text('# comment\ndamn\n\n')
+    words = WordList(str(path), interval=60)
+    first = words.current()
+    assert words.words == ['damn']
+    assert first.mask('damn rude') == '**** rude'
+    assert words.reload() is False
+    assert words.current() is first
+
+    path.write_text('damn\nrude\n')
+    os.utime(path, ns=(0, 10 ** 9))
+    assert words.reload() is True
+    assert words.current().mask('damn rude') == '**** ****'
+    assert first.mask('damn rude') == '**** rude'
+    words.stopped.set()
+
+
+def test_word_list_watcher_swaps_filter_in_the_background(tmp_path):
+    """Test that the watcher thread picks up a new file without any request reading it"""
+    from app.inappropriate_words import WordList
+    path = tmp_path / 'words.txt'
+    path.write_text('damn\n')
+    words = WordList(str(path), interval=0.01)
+    words.current()
+    replacement = tmp_path / 'words.new'
+    replacement.write_text('damn\nrude\n')
+    os.replace(replacement, path)
+    deadline = time.monotonic() + 5
+    while 'rude' not in words.words and time.monotonic() < deadline:
+        time.sleep(0.01)
+    words.stopped.set()
+    assert words.filter.contains('so rude')
+
+
+def test_minhash_buckets_group_near_duplicates():
+    """Test that near-identical reviews of the same job share LSH buckets and unrelated ones do not"""
+    from app.duplicates import band_buckets, shingles, jaccard
+    text = 'Great team, flexible hours and the manager really cares about students.'
+    copy = 'Great team, flexible hours and the manager really cares about students!!'
+    other = 'Pay is low, the shifts are long and nobody answers emails on time.'
+    assert jaccard(shingles(text), shingles(copy)) == 1.0
+    assert set(band_buckets('Barista', shingles(text))) & set(band_buckets('Barista', shingles(copy)))
+    assert not set(band_buckets('Barista', shingles(text))) & set(band_buckets('Barista', shingles(other)))
+    assert not set(band_buckets('Barista', shingles(text))) & set(band_buckets('Lifeguard', shingles(text)))
+
+
+def post_review_text(client, text, job_title='Barista'):
+    """Helper that submits a review with the given text through /add"""
+    return client.post('/add', data={
+        'job_title': job_title, 'job_description': 'Coffee', 'department': 'Dining', 'locations': 'Talley',
+        'hourly_pay': '12', 'benefits': 'Free coffee', 'review': text, 'rating': '4', 'recommendation': '8'
+    })
+
+
+def test_add_flags_near_duplicate_reviews(client):
+    """Test that a copy-pasted review of the same job is stored but flagged"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    post_review_text(client, 'Great team, flexible hours and the manager really cares.')
+    post_review_text(client, 'great team - flexible hours and the manager REALLY cares')
+    post_review_text(client, 'great team - flexible hours and the manager REALLY cares', job_title='Lifeguard')
+    post_review_text(client, 'Terrible pay and long shifts.')
+    with app.app_context():
+        reviews = Reviews.query.order_by(Reviews.id).all()
+    assert [review.duplicate_of for review in reviews] == [None, 1, None, None]
+
+    with client.session_transaction() as sess:
+        sess['type'] = 'admin'
+    assert 'Possible duplicate of #1' in client.get('/pageContent').get_data(as_text=True)
+
+
+def test_deleting_the_original_of_flagged_duplicates_moves_the_flags(client):
+    """Test that no review stays flagged as a duplicate of a deleted review"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    text = 'Great team, flexible hours and the manager really cares.'
+    for _ in range(3):
+        post_review_text(client, text)
+    client.post('/delete_review/1')
+    with app.app_context():
+        assert [(review.id, review.duplicate_of) for review in Reviews.query.order_by(Reviews.id)] == \
+            [(2, None), (3, 2)]
+    page = client.get('/pageContent').get_data(as_text=True)
+    assert 'Possible duplicate of #1' not in page
+    assert 'Possible duplicate of #2' in page
+
+
+def test_add_rejects_near_duplicates_when_configured(client):
+    """Test that the reject mode turns copies away and deleting the original frees the text again"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    app.config['DUPLICATE_REVIEW_ACTION'] = 'reject'
+    try:
+        post_review_text(client, 'Great team, flexible hours and the manager really cares.')
+        response = post_review_text(client, 'Great team, flexible hours and the manager really cares!')
+        assert response.location.endswith('/review')
+        assert 'nearly identical' in client.get('/review').get_data(as_text=True)
+        with app.app_context():
+            assert Reviews.query.count() == 1
+        client.post('/delete_review/1')
+        post_review_text(client, 'Great team, flexible hours and the manager really cares!')
+        with app.app_context():
+            assert Reviews.query.count() == 1
+
+        # messages flashed by other pages do not hide the rejection
+        client.post('/upvote/2')
+        post_review_text(client, 'Great team, flexible hours and the manager really cares.')
+        page = client.get('/review').get_data(as_text=True)
+        assert 'nearly identical' in page
+        assert 'Upvoted successfully!' not in page
+    finally:
+        app.config['DUPLICATE_REVIEW_ACTION'] = 'flag'
+
+
+def test_build_duplicate_index_command_flags_existing_copies(client):
+    """Test that the batch command indexes stored reviews and flags the later copies"""
+    add_review_texts(['Friendly staff and fair pay for students.', 'Unrelated text about shifts.',
+                      'Friendly staff and fair pay for students', 'friendly staff, fair pay for students.'])
+    result = app.test_cli_runner().invoke(args=['build-duplicate-index', '--chunk-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Indexed 4 reviews' in result.output
+    with app.app_context():
+        flags = [review.duplicate_of for review in Reviews.query.order_by(Reviews.id)]
+    assert flags[:3] == [None, None, 1]
+
+
+REVIEW_CSV_HEADER = 'job_title,department,locations,job_description,hourly_pay,benefits,review,rating,recommendation\n'
+
+
+def test_import_csv_command_imports_reviews_and_rejects_bad_rows(client, tmp_path):
+    """Test that the import command stores valid rows in batches and reports the invalid ones"""
+    from app.models import JobTitleSummary
+    csv_file = tmp_path / 'reviews.csv'
+    csv_file.write_text(REVIEW_CSV_HEADER
+                        + 'Barista,Dining,Talley,Coffee,12,Free coffee,Great bitch of a manager,4,8\n'
+                        + 'Barista,Dining,Talley,Coffee,14,Free coffee,"Busy, but fun",2,6\n'
+                        + 'Barista,Dining,Talley,Coffee,12,Free coffee,Bad rating,9,8\n'
+                        + 'Barista,,Talley,Coffee,12,Free coffee,No department,4,8\n'
+                        + 'Lifeguard,Recreation,Carmichael,Pool,11,Gym,Quiet shifts,5,10\n', encoding='utf-8')
+    result = app.test_cli_runner().invoke(args=['import-csv', 'reviews', str(csv_file), '--chunk-size', '2'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 reviews, rejected 2 rows' in result.output
+    assert 'rows/s' in result.output
+    assert 'Line 4: rating must be between 1 and 5' in result.output
+    assert 'Line 5: department is required' in result.output
+    with app.app_context():
+        reviews = Reviews.query.order_by(Reviews.id).all()
+        assert [review.review for review in reviews] == ['Great ***** of a manager', 'Busy, but fun', 'Quiet shifts']
+        summary = JobTitleSummary.query.get(('Barista', 'Dining'))
+        assert (summary.review_count, summary.rating_total, summary.hourly_pay_total) == (2, 6, 26)
+
+
+def test_import_csv_flags_duplicates_and_refreshes_title_indexes(client, tmp_path):
+    """Test that imported reviews reach the duplicate index, search and autocomplete"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+    post_review_text(client, 'Great team, flexible hours and the manager really cares.')
+    assert client.get('/autocomplete/job-titles?q=Life').get_json() == []
+    csv_file = tmp_path / 'reviews.csv'
+    csv_file.write_text(REVIEW_CSV_HEADER
+                        + 'Barista,Dining,Talley,Coffee,12,Free coffee,"great team, flexible hours and the manager really cares",4,8\n'
+                        + 'Lifeguard,Recreation,Carmichael,Pool,11,Gym,Quiet shifts,5,10\n', encoding='utf-8')
+    result = app.test_cli_runner().invoke(args=['import-csv', 'reviews', str(csv_file)])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert [review.duplicate_of for review in Reviews.query.order_by(Reviews.id)] == [None, 1, None]
+    assert client.get('/autocomplete/job-titles?q=Life').get_json() == ['Lifeguard']
+    assert 'Quiet shifts' in client.get('/pageContent?search_title=Lifeguard').get_data(as_text=True)
+
+
+def test_import_csv_command_imports_jobs_for_known_employers(client, tmp_path):
+    """Test that imported jobs need an existing employer and may leave the pay out"""
+    with app.app_context():
+        db.session.add(User(user_name='boss', name='Boss', email='boss@ncsu.edu', password='pw', type='employer'))
+        db.session.commit()
+    csv_file = tmp_path / 'jobs.csv'
+    csv_file.write_text('title,description,location,pay,employer_id\n'
+                        'Barista,Make coffee,Talley,12.5,\n'
+                        'Lifeguard,Watch the pool,Carmichael,,boss\n'
+                        'Tutor,Teach,Library,lots,boss\n'
+                        'Grader,Grade,EB2,10,nobody\n', encoding='utf-8')
+    result = app.test_cli_runner().invoke(args=['import-csv', 'jobs', str(csv_file), '--employer', 'boss'])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 2 jobs, rejected 2 rows' in result.output
+    assert "Line 4: pay is not a number: 'lots'" in result.output
+    assert "Line 5: employer_id 'nobody' is not an employer" in result.output
+    with app.app_context():
+        assert [(job.title, job.pay, job.employer_id) for job in Job.query.order_by(Job.job_id)] == \
+            [('Barista', 12.5, 'boss'), ('Lifeguard', None, 'boss')]
+
+
+    # jobs imported without pay are listed without a salary line
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    response = client.get('/view-jobs')
+    assert response.status_code == 200
+    page = response.get_data(as_text=True)
+    assert 'Lifeguard' in page and '$ 12.50' in page
+    assert page.count('card-subtitle text-success') == 1
+
+
+def test_import_route_is_admin_only_and_reports_the_upload(client):
+    """Test that admins can upload a CSV file and see what was imported"""
+    import io
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    assert client.get('/import').status_code == 302
+
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    assert 'Bulk Import' in client.get('/import').get_data(as_text=True)
+    upload = (REVIEW_CSV_HEADER + 'Barista,Dining,Talley,Coffee,12,Free coffee,"Nice,\r\nreally",4,8\r\n'
+              + 'Barista,Dining,Talley,Coffee,twelve,Free coffee,Nice,4,8\r\n').encode('utf-8-sig')
+    response = client.post('/import', data={'kind': 'reviews', 'file': (io.BytesIO(upload), 'reviews.csv')},
+                           content_type='multipart/form-data')
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'Imported 1 reviews, rejected 1 rows' in page
+    assert "Line 4: hourly_pay is not a whole number: &#39;twelve&#39;" in page
+    with app.app_context():
+        assert [review.review for review in Reviews.query] == ['Nice,\r\nreally']
+
+    missing = client.post('/import', data={'kind': 'reviews'}, content_type='multipart/form-data')
+    assert missing.status_code == 400
+
+
+def test_import_route_rejects_lines_that_are_not_utf8(client):
+    """Test that a Latin-1 line of an upload is reported as rejected instead of failing the import"""
+    import io
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    upload = (REVIEW_CSV_HEADER.encode() + 'Café,Dining,Talley,Coffee,12,Free coffee,Nice,4,8\n'.encode('latin-1')
+              + b'Barista,Dining,Talley,Coffee,12,Free coffee,Nice,4,8\n')
+    response = client.post('/import', data={'kind': 'reviews', 'file': (io.BytesIO(upload), 'reviews.csv')},
+                           content_type='multipart/form-data')
+    page = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert 'Imported 1 reviews, rejected 1 rows' in page
+    assert 'Line 2: the line is not valid UTF-8' in page
+    with app.app_context():
+        assert [review.job_title for review in Reviews.query] == ['Barista']
+
+
+def test_export_route_streams_csv_for_admins_only(client):
+    """Test that admins can download a table as CSV and others are sent home"""
+    import csv
+    import io
+    add_review_texts(['Great, "fun" team', 'Long shifts'])
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    assert client.get('/export/reviews').status_code == 302
+
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    response = client.get('/export/reviews')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=reviews.csv'
+    rows = list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+    assert [row['review'] for row in rows] == ['Great, "fun" team', 'Long shifts']
+    assert rows[0]['id'] == '1'
+    assert client.get('/export/users').status_code == 404
+    assert client.get('/export/jobs?format=xlsx').status_code == 404
+
+
+def test_export_command_writes_every_batch(client, tmp_path):
+    """Test that the export command writes all rows across several batches"""
+    import csv
+    add_reviews(7)
+    output = tmp_path / 'reviews.csv'
+    result = app.test_cli_runner(mix_stderr=False).invoke(
+        args=['export', 'reviews', str(output), '--batch-size', '3'])
+    assert result.exit_code == 0, result.output
+    assert 'Exported reviews as csv' in result.stderr
+    with open(output, newline='', encoding='utf-8') as exported:
+        rows = list(csv.reader(exported))
+    assert rows[0][:3] == ['id', 'department', 'locations']
+    assert [row[0] for row in rows[1:]] == [str(i) for i in range(1, 8)]
+
+
+def test_export_parquet_writes_one_row_group_per_batch(client, tmp_path):
+    """Test the Parquet export, when pyarrow is installed"""
+    parquet = pytest.importorskip('pyarrow.parquet')
+    from app.export import export_table
+    add_reviews(5)
+    output = tmp_path / 'reviews.parquet'
+    with app.app_context(), open(output, 'wb') as exported:
+        export_table('reviews', exported, fmt='parquet', batch_size=2)
+    data = parquet.ParquetFile(output)
+    assert data.metadata.num_row_groups == 3
+    assert data.read().column('id').to_pylist() == [1, 2, 3, 4, 5]
+
+
+def test_export_arrow_converts_values_stored_with_another_type(client, tmp_path):
+    """Test that numbers SQLite kept as text are converted instead of ending the export halfway"""
+    pytest.importorskip('pyarrow')
+    import pyarrow.ipc
+    from app.export import export_table
+    add_reviews(3)
+    with app.app_context():
+        db.session.execute(Reviews.__table__.update().where(Reviews.id == 2).values(hourly_pay='$15'))
+        db.session.execute(Reviews.__table__.update().where(Reviews.id == 3).values(hourly_pay='16'))
+        db.session.commit()
+        pays = [review.hourly_pay for review in Reviews.query.order_by(Reviews.id)]
+    output = tmp_path / 'reviews.arrows'
+    with app.app_context(), open(output, 'wb') as exported:
+        export_table('reviews', exported, fmt='arrow', batch_size=2)
+    table = pyarrow.ipc.open_stream(output.read_bytes()).read_all()
+    assert table.column('id').to_pylist() == [1, 2, 3]
+    assert table.column('hourly_pay').to_pylist() == [pays[0], None, 16]
+
+
+def test_view_jobs_filters_by_search_and_pay_on_the_server(client):
+    """Test that the search text and pay threshold are applied in the query and kept across pages"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        for title, location, pay in (('Library Assistant', 'DH Hill', 60000), ('Barista', 'Talley 100%', 80000),
+                                     ('Lifeguard', 'Carmichael', 90000), ('Library Page', 'Hunt', 40000),
+                                     ('Library Tech', 'Hunt', 120000)):
+            db.session.add(Job(title=title, description='Description', location=location, pay=pay,
+                               employer_id='employer'))
+        db.session.commit()
+    page = client.get('/view-jobs?q=library').get_data(as_text=True)
+    assert 'Library Assistant' in page and 'Library Page' in page and 'Library Tech' in page
+    assert 'Barista' not in page and 'Lifeguard' not in page
+    page = client.get('/view-jobs?q=HUNT&min_pay=75000').get_data(as_text=True)
+    assert 'Library Tech' in page and 'Library Page' not in page
+    assert '<option value="75000" selected>' in page
+    # LIKE wildcards in the search text are matched literally
+    page = client.get('/view-jobs?q=100%25').get_data(as_text=True)
+    assert 'Barista' in page and 'Library' not in page
+    assert 'No jobs match your search.' in client.get('/view-jobs?q=nothing').get_data(as_text=True)
+
+    first = client.get('/view-jobs?q=library&per_page=2').get_data(as_text=True)
+    assert 'Library Tech' in first and 'Library Page' in first and 'Library Assistant' not in first
+    next_link = first.split('class="btn btn-secondary">Next')[0].split('href="')[-1].split('"')[0].replace('&amp;', '&')
+    assert 'q=library' in next_link
+    second = client.get(next_link).get_data(as_text=True)
+    assert 'Library Assistant' in second and 'Barista' not in second
+
+
+def test_view_jobs_only_reads_the_start_of_descriptions(client):
+    """Test that job cards show a preview of long descriptions without loading the whole text"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        db.session.add(Job(title='Tutor', description='a' * 300 + 'TAIL' + 'b' * 5000, location='Hunt', pay=10,
+                           employer_id='employer'))
+        db.session.add(Job(title='Grader', description='Short one', location='EB2', pay=10, employer_id='employer'))
+        db.session.commit()
+    page = client.get('/view-jobs').get_data(as_text=True)
+    assert 'a' * 300 + '&hellip;' in page
+    assert 'TAIL' not in page
+    assert 'Short one</p>' in page
+
+
+def test_view_jobs_reads_applied_flags_from_the_application_index(client):
+    """Test that the applied flags come from a job id projection answered by the composite index"""
+    from sqlalchemy import text
+    from app.routes import applied_job_ids_of
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        jobs = [Job(title=f'Job {i}', description='Description', location='Raleigh', pay=10, employer_id='employer')
+                for i in range(3)]
+        db.session.add_all(jobs)
+        db.session.flush()
+        db.session.add(Application(job_id=jobs[1].job_id, user_name='testuser'))
+        db.session.add(Application(job_id=jobs[2].job_id, user_name='someone'))
+        db.session.commit()
+        assert applied_job_ids_of('testuser', [1, 2, 3]) == {2}
+        assert applied_job_ids_of('testuser', []) == set()
+        plan = ' '.join(str(row[-1]) for row in db.session.execute(text(
+            "EXPLAIN QUERY PLAN SELECT job_id FROM applications WHERE user_name = 'testuser' AND job_id IN (1, 2, 3)")))
+        assert 'COVERING INDEX ix_applications_user_name_job_id' in plan
+    page = client.get('/view-jobs').get_data(as_text=True)
+    assert page.count('Already Applied!!') == 1
+    assert page.count('Apply Now!') == 2
+
+
+def test_apply_is_idempotent_and_costs_one_insert(client):
+    """Test that applying twice keeps a single application and a retry issues no second row"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        job = Job(title='Test Job', description='Test Description', location='Raleigh', pay=20, employer_id='boss')
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.job_id
+    cards_before = client.get('/view-jobs').get_data(as_text=True)
+    assert 'Apply Now!' in cards_before
+
+    with QueryCounter() as counter:
+        first = client.post(f'/apply/{job_id}')
+    assert first.status_code == 302
+    inserts = [statement for statement in counter.statements if statement.startswith('INSERT INTO applications')]
+    assert len(inserts) == 1
+    client.post(f'/apply/{job_id}')
+    with client.session_transaction() as sess:
+        assert [message for _, message in sess['_flashes']] == [
+            'Application submitted successfully!', 'You have already applied for this job.']
+    with app.app_context():
+        assert Application.query.filter_by(job_id=job_id, user_name='testuser').count() == 1
+    # the new application reached the cached job cards
+    assert 'Already Applied!!' in client.get('/view-jobs').get_data(as_text=True)
+
+
+def test_applications_are_unique_per_user_and_job(client):
+    """Test that the database itself refuses a second application of the same user for a job"""
+    from sqlalchemy.exc import IntegrityError
+    with app.app_context():
+        db.session.add(Application(job_id=1, user_name='testuser'))
+        db.session.commit()
+        db.session.add(Application(job_id=1, user_name='testuser'))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+        db.session.add(Application(job_id=2, user_name='testuser'))
+        db.session.commit()
+        assert Application.query.count() == 2
+
+
+def add_searchable_jobs():
+    """Helper that posts a few jobs with distinctive titles, descriptions and locations"""
+    with app.app_context():
+        for title, description, location in (
+                ('Research Assistant', 'Help with <lab> experiments on robotics and data analysis.', 'EB2'),
+                ('Barista', 'Serve coffee. Experience with robotics clubs is a plus.', 'Talley'),
+                ('Robotics Tutor', 'Tutor students in intro robotics.', 'Hunt Library'),
+                ('Lifeguard', 'Watch the pool.', 'Carmichael')):
+            db.session.add(Job(title=title, description=description, location=location, pay=15,
+                               employer_id='employer'))
+        db.session.commit()
+
+
+def test_search_jobs_ranks_title_matches_first_and_highlights(client):
+    """Test that the job search ranks by bm25 and marks the matched words in escaped snippets"""
+    add_searchable_jobs()
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    response = client.get('/api/jobs/search?q=robotics')
+    assert response.status_code == 200
+    body = response.get_json()
+    titles = [item['title'] for item in body['items']]
+    assert titles[0] == 'Robotics Tutor' and set(titles[1:]) == {'Research Assistant', 'Barista'}
+    assert body['items'][0]['title_html'] == '<mark>Robotics</mark> Tutor'
+    research = body['items'][titles.index('Research Assistant')]
+    assert '&lt;lab&gt;' in research['snippet_html']
+    assert '<mark>robotics</mark>' in research['snippet_html']
+    assert 'description' not in body['items'][0]
+
+    first = client.get('/api/jobs/search?q=robotics&per_page=2').get_json()
+    assert len(first['items']) == 2 and first['next_cursor']
+    second = client.get(f"/api/jobs/search?q=robotics&per_page=2&after={first['next_cursor']}").get_json()
+    assert [item['title'] for item in second['items']] == titles[2:]
+
+    assert client.get('/api/jobs/search').status_code == 400
+    page = client.get('/search-jobs?q=pool').get_data(as_text=True)
+    assert 'Watch the <mark>pool</mark>.' in page
+    assert 'Apply Now!' in page
+
+
+def test_search_jobs_index_follows_posting_and_deleting(client):
+    """Test that jobs posted or deleted through the site are found or dropped right away"""
+    with client.session_transaction() as sess:
+        sess['username'] = 'boss'
+        sess['type'] = 'employer'
+    assert client.get('/api/jobs/search?q=greenhouse').status_code == 403
+    client.post('/add-job', data={'title': 'Gardener', 'description': 'Tend the greenhouse plants.',
+                                  'location': 'JC Raulston', 'pay': '14'})
+    with client.session_transaction() as sess:
+        sess['username'] = 'admin'
+        sess['type'] = 'admin'
+    items = client.get('/api/jobs/search?q=greenhouse').get_json()['items']
+    assert [item['title'] for item in items] == ['Gardener']
+    client.post(f"/delete-job/{items[0]['job_id']}")
+    assert client.get('/api/jobs/search?q=greenhouse').get_json()['items'] == []
+
+
+def test_view_jobs_sorted_by_pay_pages_through_jobs_without_pay(client):
+    """Test that jobs without pay are neither lost nor block the paid ones when paging by pay"""
+    import re
+    with client.session_transaction() as sess:
+        sess['username'] = 'testuser'
+        sess['type'] = 'applicant'
+    with app.app_context():
+        for i in range(6):
+            db.session.add(Job(title=f'J{i}', description='Description', location='Raleigh',
+                               pay=None if i % 2 else 10 + i, employer_id='employer'))
+        db.session.commit()
+
+    def walk(url):
+        titles = []
+        while url:
+            page = client.get(url).get_data(as_text=True)
+            titles += re.findall(r'<h5 class="card-title">(J\d)</h5>', page)
+            links = re.findall(r'href="([^"]*after=[^"]*)"', page)
+            url = links[0].replace('&amp;', '&') if links else None
+        return titles
+
+    descending = walk('/view-jobs?sort=pay&per_page=2')
+    assert descending[:3] == ['J4', 'J2', 'J0'] and sorted(descending[3:]) == ['J1', 'J3', 'J5']
+    ascending = walk('/view-jobs?sort=pay&order=asc&per_page=2')
+    assert sorted(ascending[:3]) == ['J1', 'J3', 'J5'] and ascending[3:] == ['J0', 'J2', 'J4']
+
+
+def test_pay_sort_uses_the_pay_rank_index(client):
+    """Test that sorting by pay rank is answered from its expression index"""
+    from sqlalchemy import text
+    with app.app_context():
+        statement = Job.query.order_by(Job.pay_rank.desc(), Job.job_id.desc()).limit(21).statement
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(str(row[-1]) for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}')))
+    assert 'ix_jobs_pay_rank_job_id' in plan
+    assert 'TEMP B-TREE' not in plan